@@ -0,0 +1,73 @@
+"""Helpers for the benchmarks"""
+import os
+import pathlib
+
+import afmformats
+import h5py
+import nanite.model
+
+from pyjibe.fd.fit_settings import FitSettings
+from pyjibe.head import convert_engine
+
+#: bundled test data
+data_dir = pathlib.Path(__file__).parents[1] / "tests" / "data"
+
+#: recommended preprocessing (same as in the "Preprocessing" tab)
+PREPROCESSING = ["compute_tip_position",
+                 "correct_force_offset",
+                 "correct_tip_offset",
+                 "correct_split_approach_retract"]
+PREPROCESSING_OPTIONS = {
+    "correct_tip_offset": {"method": "deviation_from_baseline"},
+}
+
+#: grid size of the synthetic QMap (override with PYJIBE_BENCH_MAP_SIZE)
+MAP_SIZE = int(os.environ.get("PYJIBE_BENCH_MAP_SIZE", 8))
+
+
+def make_synthetic_map(path, size=MAP_SIZE):
+    """Write a QMap with `size` x `size` curves to an HDF5 file
+
+    The curves of the bundled 2x2 map are replicated on a larger grid.
+    """
+    source = afmformats.load_data(data_dir / "map2x2_extracted.jpk-force-map")
+    with h5py.File(path, "w") as h5:
+        for iy in range(size):
+            for ix in range(size):
+                enum = iy * size + ix
+                fdist = source[enum % len(source)]
+                meta = {key: fdist.metadata[key] for key in fdist.metadata}
+                meta.update({
+                    "enum": enum,
+                    "curve id": "{}:{}".format(meta["curve id"], enum),
+                    "grid index x": ix,
+                    "grid index y": iy,
+                    "grid shape x": size,
+                    "grid shape y": size,
+                    "grid size x": meta["grid size x"] / 10 * size,
+                    "grid size y": meta["grid size y"] / 10 * size,
+                })
+                data = {col: fdist[col] for col in fdist.columns_innate}
+                curve = afmformats.AFMForceDistance(data=data, metadata=meta)
+                keys = [key for key in meta if key != "path"]
+                convert_engine.write_hdf5(h5, curve, keys, compression=None)
+    return path
+
+
+def get_fit_settings():
+    """Default fit settings of the GUI (Hertz model)"""
+    params = nanite.model.models_available["hertz_para"] \
+        .get_parameter_defaults()
+    return FitSettings.from_kwargs({
+        "model_key": "hertz_para", "params_initial": params,
+        "range_x": (0, 0), "range_type": "absolute",
+        "x_axis": "tip position", "y_axis": "force", "weight_cp": 1e-6,
+        "segment": "approach", "optimal_fit_edelta": False,
+        "optimal_fit_num_samples": 100, "gcf_k": 1.0})
+
+
+def report_throughput(benchmark, num_curves):
+    """Store the number of curves processed per second"""
+    mean = benchmark.stats.stats.mean
+    benchmark.extra_info["curves"] = num_curves
+    benchmark.extra_info["curves per second"] = num_curves / mean
@@ -0,0 +1,34 @@
+import pathlib
+import shutil
+import tempfile
+import time
+
+import pytest
+from PyQt6 import QtCore
+
+from bench_helpers import make_synthetic_map
+
+TMPDIR = tempfile.mkdtemp(prefix=time.strftime("pyjibe_bench_%H.%M_"))
+
+
+def pytest_configure(config):
+    # disable update checking (same as in tests/conftest.py)
+    QtCore.QCoreApplication.setOrganizationName("AFM-Analysis")
+    QtCore.QCoreApplication.setOrganizationDomain("pyjibe.mpl.mpg.de")
+    QtCore.QCoreApplication.setApplicationName("PyJibe")
+    QtCore.QSettings.setDefaultFormat(QtCore.QSettings.Format.IniFormat)
+    settings = QtCore.QSettings()
+    settings.setValue("check for updates", 0)
+    settings.sync()
+    tempfile.tempdir = TMPDIR
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(TMPDIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def synthetic_map():
+    """Path to a synthetic QMap with MAP_SIZE x MAP_SIZE curves"""
+    tdir = pathlib.Path(tempfile.mkdtemp(prefix="synthetic_map_"))
+    return make_synthetic_map(tdir / "synthetic_map.h5")
@@ -0,0 +1,62 @@
+"""Throughput of the force-distance analysis user interface"""
+import shutil
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import pyjibe.head  # noqa: E402
+
+from bench_helpers import report_throughput  # noqa: E402
+
+
+@pytest.fixture
+def analysis(qtbot, synthetic_map, tmp_path):
+    # autosave writes results next to the data file
+    path = shutil.copy2(synthetic_map, tmp_path)
+    mw = pyjibe.head.PyJibe()
+    mw.load_data(files=[path])
+    war = mw.subwindows[0].widget()
+    war.cb_autosave.setChecked(0)
+    yield war
+    war.prefetcher.cancel()
+    war.prefetcher.wait()
+    mw.close()
+
+
+def test_bench_fit_approach_retract(benchmark, analysis):
+    curves = list(analysis.data_set)
+    analysis.prefetcher.cancel()
+    analysis.prefetcher.wait()
+    for fdist in curves:
+        analysis.prefetcher.claim(fdist)
+        analysis.tab_preprocess.apply_preprocessing(fdist)
+
+    def setup():
+        for fdist in curves:
+            fdist.fit_properties.pop("hash", None)
+
+    def fit():
+        for fdist in curves:
+            analysis.tab_fit.fit_approach_retract(fdist, update_ui=False)
+
+    benchmark.pedantic(fit, setup=setup, rounds=3)
+    report_throughput(benchmark, len(curves))
+
+
+def test_bench_fit_all(benchmark, analysis):
+    curves = list(analysis.data_set)
+
+    def setup():
+        for fdist in curves:
+            fdist.fit_properties.pop("hash", None)
+
+    benchmark.pedantic(analysis.on_fit_all, setup=setup, rounds=3)
+    report_throughput(benchmark, len(curves))
+
+
+def test_bench_qmap_update(benchmark, analysis):
+    analysis.on_fit_all()
+    analysis.tabs.setCurrentWidget(analysis.tab_qmap)
+    benchmark(analysis.tab_qmap.mpl_qmap_update)
+    report_throughput(benchmark, len(analysis.data_set))
@@ -0,0 +1,121 @@
+"""Throughput of the analysis steps applied to each curve"""
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+import nanite  # noqa: E402
+
+from pyjibe.fd import batch_fit, export, rating_base  # noqa: E402
+from pyjibe.fd.warm_start import WarmStart  # noqa: E402
+
+from bench_helpers import (  # noqa: E402
+    PREPROCESSING, PREPROCESSING_OPTIONS, get_fit_settings,
+    report_throughput)
+
+
+@pytest.fixture
+def group(synthetic_map):
+    return nanite.IndentationGroup(synthetic_map)
+
+
+@pytest.fixture
+def fitted_group(group):
+    for fdist in group:
+        fdist.apply_preprocessing(PREPROCESSING, PREPROCESSING_OPTIONS)
+        fdist.fit_model(model_key="hertz_para")
+    return group
+
+
+def test_bench_load(benchmark, synthetic_map):
+    group = benchmark(nanite.IndentationGroup, synthetic_map)
+    report_throughput(benchmark, len(group))
+
+
+def test_bench_preprocess(benchmark, group):
+    def setup():
+        for fdist in group:
+            # preprocessing is skipped if it did not change
+            fdist.fit_properties.pop("preprocessing", None)
+
+    def preprocess():
+        for fdist in group:
+            fdist.apply_preprocessing(PREPROCESSING, PREPROCESSING_OPTIONS)
+
+    benchmark.pedantic(preprocess, setup=setup, rounds=5)
+    report_throughput(benchmark, len(group))
+
+
+def test_bench_fit(benchmark, fitted_group):
+    def setup():
+        for fdist in fitted_group:
+            # a fit is skipped if the fit parameters did not change
+            fdist.fit_properties.pop("hash", None)
+
+    def fit():
+        for fdist in fitted_group:
+            fdist.fit_model(model_key="hertz_para")
+
+    benchmark.pedantic(fit, setup=setup, rounds=5)
+    assert all(fdist.fit_properties["success"] for fdist in fitted_group)
+    report_throughput(benchmark, len(fitted_group))
+
+
+def test_bench_fit_batch(benchmark, fitted_group):
+    fit_settings = get_fit_settings()
+
+    def setup():
+        for fdist in fitted_group:
+            fdist.fit_properties.pop("hash", None)
+
+    def fit():
+        batch_fit.fit_curves(list(fitted_group), fit_settings)
+
+    benchmark.pedantic(fit, setup=setup, rounds=5)
+    assert all(fdist.fit_properties["success"] for fdist in fitted_group)
+    report_throughput(benchmark, len(fitted_group))
+
+
+@pytest.mark.parametrize("warm", [False, True])
+def test_bench_fit_warm_start(benchmark, fitted_group, warm):
+    fit_settings = get_fit_settings()
+    reports = []
+
+    def setup():
+        for fdist in fitted_group:
+            fdist.fit_properties.pop("hash", None)
+
+    def fit():
+        warm_start = WarmStart(fitted_group,
+                               parameters=("E",) if warm else ())
+        for fdist in warm_start.get_fit_order():
+            warm_start.fit(fdist, fit_settings)
+        reports.append(warm_start.report.to_dict())
+
+    benchmark.pedantic(fit, setup=setup, rounds=5)
+    assert all(fdist.fit_properties["success"] for fdist in fitted_group)
+    report_throughput(benchmark, len(fitted_group))
+    benchmark.extra_info["residual evaluations"] = (
+        reports[-1]["evaluations warm"] + reports[-1]["evaluations cold"])
+
+
+def test_bench_rate(benchmark, fitted_group):
+    # load the rating scheme outside of the benchmark
+    rating_base.rate_fdist(fitted_group[0], scheme_id=0, rate_ts_path="")
+
+    def setup():
+        for fdist in fitted_group:
+            # the rating is cached
+            fdist._rating = None
+
+    def rate():
+        rating_base.rate_fdist(list(fitted_group), scheme_id=0,
+                               rate_ts_path="")
+
+    benchmark.pedantic(rate, setup=setup, rounds=5)
+    report_throughput(benchmark, len(fitted_group))
+
+
+def test_bench_export(benchmark, fitted_group, tmp_path):
+    path = tmp_path / "results.tsv"
+    benchmark(export.save_tsv_metadata_results, path, fitted_group)
+    report_throughput(benchmark, len(fitted_group))
@@ -1,4 +1,8 @@
+import multiprocessing
+
 from pyjibe.__main__ import main
 
 if __name__ == "__main__":
+    # required for the process pool of the data converter
+    multiprocessing.freeze_support()
     main()
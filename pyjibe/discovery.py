@@ -0,0 +1,73 @@
+"""Discovery of AFM data files in large directory trees"""
+import logging
+import os
+import pathlib
+
+
+logger = logging.getLogger(__name__)
+
+
+def iter_data_files(paths, modality=None, detect=True):
+    """Yield AFM data files found in files or directory trees
+
+    Directory trees are walked only once with :func:`os.scandir`.
+    Candidates are preselected by their file suffix. Files are
+    yielded while the tree is walked (depth-first, for each path
+    of the sorted `paths`), with the entries of each directory
+    sorted by name. Thus, the files in a directory "a" come before
+    a file "a.jpk-force" next to it, which is not necessarily the
+    order of ``sorted(afmformats.find_data(path))``. Duplicates
+    are skipped.
+
+    Parameters
+    ----------
+    paths: list of str or pathlib.Path
+        files or directories
+    modality: str
+        modality of the measurement ("force-distance")
+    detect: bool
+        whether to verify the file format with the afmformats
+        recipe detection (otherwise only the suffix is checked)
+    """
+    seen = set()
+    for path in sorted(pathlib.Path(pp) for pp in paths):
+        for pp in _walk(path):
+            if pp in seen:
+                continue
+            seen.add(pp)
+            if not detect or _is_supported(pp, modality):
+                yield pp
+
+
+def _is_supported(path, modality=None):
+    import afmformats.errors
+    from afmformats.formats import get_recipe
+    try:
+        get_recipe(path=path, modality=modality)
+    except afmformats.errors.FileFormatNotSupportedError:
+        logger.debug("Skipping unsupported file '%s'", path)
+        return False
+    else:
+        return True
+
+
+def _walk(path):
+    """Yield files with supported suffixes in sorted order"""
+    import afmformats
+    suffixes = set(afmformats.supported_extensions)
+    if not path.is_dir():
+        if path.suffix in suffixes:
+            yield path
+        return
+    try:
+        with os.scandir(path) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except OSError:
+        logger.warning("Cannot access directory '%s'", path)
+        return
+    for entry in entries:
+        if entry.is_dir(follow_symlinks=False):
+            yield from _walk(pathlib.Path(entry.path))
+        elif (os.path.splitext(entry.name)[1] in suffixes
+              and entry.is_file()):
+            yield pathlib.Path(entry.path)
@@ -3,8 +3,6 @@ import functools
 import pathlib
 import shutil
 
-from nanite import model as nmodel
-
 from .util import hashfile
 
 
@@ -214,6 +212,7 @@ class Extension:
             return
         try:
             # import the file and register it
+            from nanite import model as nmodel
             mod = nmodel.load_model_from_file(self.path, register=True)
             self.data["model"] = mod
         except BaseException:
@@ -225,6 +224,7 @@ class Extension:
     def unload(self):
         """Unload the extension"""
         if "model" in self.data:
+            from nanite import model as nmodel
             nmodel.deregister_model(self.data.pop("model"))
 
     def destroy(self):
@@ -0,0 +1,237 @@
+"""Cached computation of ancillary parameters
+
+nanite computes the ancillary parameters of a curve (e.g. the
+maximum indentation or contact point estimates of imported models)
+in `nanite.Indentation.get_ancillary_parameters`. Its cache is only
+used after a successful fit and is not reset when the preprocessing
+changes. The parameter table of the fit tab, the info tab, and the
+export of the fit results all require the ancillary parameters, so
+here they are cached for each curve together with everything they
+depend on (see :func:`get_anc_key`). Before exporting many curves,
+the missing ancillary parameters are computed by the workers of the
+scheduler with :func:`compute_ancillary_parameters`.
+
+Ancillary parameters that are also fit parameters may replace the
+initial fit parameters (see :func:`apply_to_initial_parameters`).
+"""
+import collections
+import concurrent.futures
+import copy
+import json
+import threading
+import weakref
+
+from nanite import model as nmodel
+from nanite.fit import FP_DEFAULT
+
+from .. import units
+
+
+#: minimum number of curves for using the workers of the scheduler
+POOL_MIN_CURVES = 20
+#: number of curves per job submitted to the scheduler
+POOL_JOB_SIZE = 10
+
+#: cache key and ancillary parameters of each curve
+_anc_cache = weakref.WeakKeyDictionary()
+_anc_cache_lock = threading.Lock()
+
+
+def get_model_key(fdist, model_key=None):
+    """Return the model key nanite uses for ancillary parameters"""
+    if model_key is None:
+        model_key = fdist.fit_properties.get("model_key",
+                                             FP_DEFAULT["model_key"])
+    return model_key
+
+
+def get_anc_key(fdist, model_key):
+    """Return the cache key of the ancillary parameters of `fdist`
+
+    The ancillary parameters depend on the model, the preprocessing,
+    the initial parameters, and the fit. The hash of the fit
+    properties covers the initial parameters of a fitted curve.
+    """
+    fp = fdist.fit_properties
+    fit_hash = fp.get("hash")
+    if fit_hash is None and fp.get("params_initial"):
+        # (`lmfit.Parameters.dumps` is slower than computing the
+        # ancillary parameters of the built-in models)
+        params = tuple((p.name, p.value, p.vary, p.min, p.max, p.expr)
+                       for p in fp["params_initial"].values())
+    else:
+        params = None
+    return (model_key,
+            json.dumps([fdist.preprocessing, fdist.preprocessing_options],
+                       sort_keys=True, default=str),
+            fit_hash,
+            params)
+
+
+def get_ancillary_parameters(fdist, model_key=None):
+    """Return the (cached) ancillary parameters of a curve
+
+    Same as `nanite.Indentation.get_ancillary_parameters`, but the
+    result is cached until the preprocessing, the initial
+    parameters, or the fit of the curve change.
+
+    Parameters
+    ----------
+    fdist: nanite.Indentation
+        preprocessed curve; curves restored from a session
+        file are preprocessed first if necessary
+        (see :func:`pyjibe.fd.session.reattach`)
+    model_key: str
+        model for which to compute the ancillary parameters;
+        if None, the model of the fit properties is used
+
+    Returns
+    -------
+    anc: collections.OrderedDict
+        ancillary parameters
+    """
+    from . import session  # circular import
+    model_key = get_model_key(fdist, model_key)
+    key = get_anc_key(fdist, model_key)
+    with _anc_cache_lock:
+        cached = _anc_cache.get(fdist)
+    if cached is not None and cached[0] == key:
+        return collections.OrderedDict(cached[1])
+    if session.is_detached(fdist):
+        # The data of a restored curve are not preprocessed yet;
+        # the parameters would be computed from the raw data.
+        session.reattach(fdist)
+        key = get_anc_key(fdist, model_key)
+    anc = nmodel.compute_anc_parms(idnt=fdist, model_key=model_key)
+    if get_anc_key(fdist, model_key) == key:
+        # the curve did not change in the meantime
+        with _anc_cache_lock:
+            _anc_cache[fdist] = (key, collections.OrderedDict(anc))
+    return anc
+
+
+def set_ancillary_parameters(fdist, anc, model_key=None):
+    """Cache known ancillary parameters of a curve
+
+    This is used for restoring curves from session files
+    (see :mod:`pyjibe.fd.session`), whose data are not
+    preprocessed yet.
+    """
+    model_key = get_model_key(fdist, model_key)
+    key = get_anc_key(fdist, model_key)
+    with _anc_cache_lock:
+        _anc_cache[fdist] = (key, collections.OrderedDict(anc))
+
+
+def is_cached(fdist, model_key=None):
+    """Whether the ancillary parameters of `fdist` are cached"""
+    model_key = get_model_key(fdist, model_key)
+    with _anc_cache_lock:
+        cached = _anc_cache.get(fdist)
+    return cached is not None and cached[0] == get_anc_key(fdist, model_key)
+
+
+def invalidate(fdist):
+    """Discard the cached ancillary parameters of `fdist`"""
+    with _anc_cache_lock:
+        _anc_cache.pop(fdist, None)
+
+
+def _compute_chunk(fdists, model_key):
+    for fdist in fdists:
+        get_ancillary_parameters(fdist, model_key=model_key)
+
+
+def apply_to_initial_parameters(fdist, model_key, params, anc_checked):
+    """Replace initial parameters with ancillary parameters in-place
+
+    This is used for the ancillary parameter table of the fit tab
+    (see :func:`pyjibe.fd.tab_fit.TabFit.anc_update_parameters`)
+    and for processing curves in the background (see
+    :func:`pyjibe.fd.prefetch.process_curve`). The values are
+    rounded to the precision shown in the parameter tables, so
+    that both yield the same initial parameters.
+
+    Parameters
+    ----------
+    fdist: nanite.Indentation
+        preprocessed curve
+    model_key: str
+        fit model
+    params: lmfit.Parameters
+        initial parameters, modified in-place
+    anc_checked: list of bool
+        "use" state of each ancillary parameter of the model (rows
+        of the table); if the number of states does not match
+        (e.g. for a new table), all ancillary parameters are used
+
+    Returns
+    -------
+    rows: list of tuple
+        (label, value text, used) for each ancillary parameter of
+        the model; the label is the human-readable name with unit
+        and the value text is the value in that unit
+    """
+    model = nmodel.models_available[model_key]
+    # some ancillary parameters depend on the initial parameters
+    fdist.fit_properties["model_key"] = model_key
+    fdist.fit_properties["params_initial"] = copy.deepcopy(params)
+    anc = get_ancillary_parameters(fdist, model_key=model_key)
+    anc_used = [ak for ak in model.get_anc_parm_keys()
+                if ak in anc and ak in model.parameter_keys]
+    if len(anc_checked) != len(anc_used):
+        anc_checked = [True] * len(anc_used)
+    rows = []
+    for ak, used in zip(anc_used, anc_checked):
+        hrname = model.get_parm_name(ak)
+        si_unit = model.get_parm_unit(ak)
+        # Determine unit scale, e.g. 1e6 [sic] for µm
+        scale = units.hrscale(hrname, si_unit=si_unit)
+        label = units.hrscname(hrname, si_unit=si_unit)
+        # same precision as in the initial parameter table
+        value_text = "{:.5g}".format(anc[ak] * scale)
+        if used and value_text != "nan" and not params[ak].expr:
+            params[ak].set(float(value_text) / scale)
+        rows.append((label, value_text, used))
+    return rows
+
+
+def compute_ancillary_parameters(fdists, model_key=None, scheduler=None,
+                                 owner=None):
+    """Return the ancillary parameters of many curves
+
+    Curves with cached ancillary parameters are skipped. If
+    a scheduler is given and at least :data:`POOL_MIN_CURVES`
+    curves are not cached, the ancillary parameters are computed
+    by the workers of the scheduler.
+
+    Parameters
+    ----------
+    fdists: list of nanite.Indentation
+        preprocessed curves
+    model_key: str
+        model for which to compute the ancillary parameters;
+        if None, the model of the fit properties of each curve
+        is used
+    scheduler: pyjibe.head.scheduler.ComputeScheduler
+        scheduler for large datasets
+    owner: object
+        owner of the jobs submitted to `scheduler`
+
+    Returns
+    -------
+    anc_list: list of collections.OrderedDict
+        ancillary parameters of each curve in `fdists`
+    """
+    missing = [fd for fd in fdists if not is_cached(fd, model_key)]
+    if scheduler is not None and len(missing) >= POOL_MIN_CURVES:
+        futures = [scheduler.submit(owner, _compute_chunk,
+                                    missing[start:start + POOL_JOB_SIZE],
+                                    model_key)
+                   for start in range(0, len(missing), POOL_JOB_SIZE)]
+        concurrent.futures.wait(futures)
+        for future in futures:
+            # raise errors of the workers
+            future.result()
+    return [get_ancillary_parameters(fd, model_key=model_key)
+            for fd in fdists]
@@ -0,0 +1,312 @@
+"""Append-only journal for the autosaved fit results
+
+The autosaved results file ("pyjibe_fit_results_leaf.tsv") contains
+the results of all curves of a directory that were fitted with the
+same model. Instead of writing this file again after every fit, the
+results of each fitted curve are appended as one line to a journal
+file next to it (the results file with the suffix
+:data:`JOURNAL_SUFFIX`). The journal is compacted into the results
+file on demand and when the analysis is closed
+(see :func:`AutosaveJournal.close`). Every journal has a unique
+name (see :func:`get_journal_path`), such that several analysis
+windows or PyJibe instances autosaving to the same directory do not
+write to the same journal.
+
+Every line of the journal is a JSON record holding the curve
+identifier (see :mod:`pyjibe.fd.curve_id`), the position of the
+curve in the data set and the formatted cells of its row in the
+results file (or null if the curve was removed from the results).
+The last record of a curve is valid. The first line is a header with
+the name of the results file and the host name and process ID of
+the writer, so that the journal of an analysis that was not closed
+properly (e.g. after a crash) can be compacted later with
+:func:`recover_journal` once its writer is not running anymore.
+"""
+import collections
+import itertools
+import json
+import os
+import pathlib
+import socket
+import threading
+import time
+
+from . import curve_id
+from . import export
+
+
+#: suffix of the journal file (appended to the results file name)
+JOURNAL_SUFFIX = ".journal"
+#: export choices of the autosaved results
+#: (see :func:`pyjibe.fd.export.save_tsv_metadata_results`)
+AUTOSAVE_CHOICES = ["params_fitted", "params_ancillary", "rating"]
+#: time after which the writer of a journal written on another
+#: host is considered not running anymore [s]
+STALE_TIME = 24 * 60 * 60
+
+_journal_counter = itertools.count()
+
+
+def get_journal_path(filename):
+    """Return a new journal path for a results file
+
+    The name contains the process ID and a counter, e.g.
+    "pyjibe_fit_results_leaf.tsv.1234-0.journal".
+    """
+    filename = pathlib.Path(filename)
+    return filename.with_name("{}.{}-{}{}".format(filename.name,
+                                                  os.getpid(),
+                                                  next(_journal_counter),
+                                                  JOURNAL_SUFFIX))
+
+
+def is_process_running(pid):
+    """Whether a process with the ID `pid` is running on this host"""
+    if os.name == "nt":
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        # PROCESS_QUERY_LIMITED_INFORMATION
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        exit_code = ctypes.c_ulong()
+        try:
+            kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code))
+        finally:
+            kernel32.CloseHandle(handle)
+        # STILL_ACTIVE
+        return exit_code.value == 259
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # process of another user
+        return True
+    return True
+
+
+def is_writer_running(path, header):
+    """Whether the writer of a journal may still be appending to it
+
+    The process ID in the journal header is checked for journals
+    written on this host. For journals written on other hosts (e.g.
+    on a network share), the writer is considered running until the
+    journal was not modified for :data:`STALE_TIME`.
+    """
+    if header.get("host") == socket.gethostname():
+        return is_process_running(header["pid"])
+    return time.time() - os.stat(path).st_mtime < STALE_TIME
+
+
+def get_rows(fdist_list):
+    """Return the formatted cells of the results rows of curves
+
+    Returns
+    -------
+    rows: list
+        [[column label, formatted value], ...] for each curve
+    """
+    columns = export.get_tsv_columns(fdist_list, which=AUTOSAVE_CHOICES)
+    rows = []
+    for ii in range(len(fdist_list)):
+        rows.append([[label, export.format_content(values[ii])]
+                     for label, values in columns.items()])
+    return rows
+
+
+def save_rows(filename, rows):
+    """Write results rows (see :func:`get_rows`) to a .tsv file
+
+    The file is the same as written by
+    :func:`pyjibe.fd.export.save_tsv_metadata_results`.
+    """
+    columns = collections.OrderedDict()
+    for ii, row in enumerate(rows):
+        for label, text in row:
+            export.set_odict_list_value(columns, label, len(rows), ii, text)
+    export.save_tsv(filename, columns)
+
+
+def read_journal(path):
+    """Read a journal file
+
+    Returns
+    -------
+    header: dict
+        journal header
+    records: collections.OrderedDict
+        last record of each key
+    """
+    records = collections.OrderedDict()
+    with open(path, encoding="utf-8") as fd:
+        header = json.loads(fd.readline())
+        for line in fd:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # incomplete last line
+                break
+            records[record["key"]] = record
+    return header, records
+
+
+def recover_journal(path):
+    """Compact a journal that was not closed properly
+
+    Journals whose writer is still running (including this
+    process) are ignored (see :func:`is_writer_running`). The
+    results file is written and the journal is removed.
+
+    Returns
+    -------
+    recovered: bool
+        whether the journal was compacted
+    """
+    path = pathlib.Path(path)
+    try:
+        header, records = read_journal(path)
+        if is_writer_running(path, header):
+            return False
+    except (OSError, ValueError):
+        # removed or not a journal
+        return False
+    rows = _get_sorted_rows(records)
+    if rows:
+        save_rows(path.with_name(header["target"]), rows)
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        # recovered by another process at the same time
+        pass
+    return True
+
+
+def recover_journals(directory):
+    """Compact all journals in `directory` whose writer is not running
+
+    See :func:`recover_journal`.
+    """
+    for path in sorted(pathlib.Path(directory).glob(
+            "pyjibe_fit_results_leaf*.tsv.*" + JOURNAL_SUFFIX)):
+        recover_journal(path)
+
+
+def _get_sorted_rows(records):
+    """Return the rows of the records in the order of the data set"""
+    valid = [rec for rec in records.values() if rec["row"] is not None]
+    valid.sort(key=lambda rec: rec["index"])
+    return [rec["row"] for rec in valid]
+
+
+class AutosaveJournal:
+    def __init__(self, filename, model_key, curves, indices):
+        """Journal of an autosaved results file
+
+        Parameters
+        ----------
+        filename: str or pathlib.Path
+            results file that was just written with `curves`
+        model_key: str
+            fit model of all curves in the results file
+        curves: list of nanite.Indentation
+            curves in the results file
+        indices: list of int
+            position of each curve in the data set
+
+        Notes
+        -----
+        The journal file is only created when the first record is
+        appended. Until then, the results file is up-to-date.
+        """
+        self.filename = pathlib.Path(filename)
+        self.path = get_journal_path(filename)
+        self.model_key = model_key
+        self._lock = threading.Lock()
+        self._fd = None
+        #: last record of each curve
+        self._records = collections.OrderedDict()
+        #: curves in the results file (before the journal is created)
+        self._initial = list(zip(curves, indices))
+
+    def _open(self):
+        """Create the journal and write the records of the results file"""
+        self._write_records(self.path)
+        self._fd = open(self.path, "a", encoding="utf-8")
+        if self._initial:
+            curves, indices = zip(*self._initial)
+            for fdist, index, row in zip(curves, indices, get_rows(curves)):
+                self._add(fdist, index, row)
+        self._initial = []
+
+    def _add(self, fdist, index, row):
+        key = curve_id.get_curve_id(fdist)
+        record = {"key": key, "index": index, "row": row}
+        if self._records.get(key) != record:
+            self._records[key] = record
+            self._write(record)
+
+    def _write(self, data):
+        # one line per record, written at once
+        self._fd.write(json.dumps(data) + "\n")
+        self._fd.flush()
+
+    def _write_records(self, path):
+        """Write the header and the last record of each curve to `path`"""
+        with open(path, "w", encoding="utf-8") as fd:
+            fd.write(json.dumps({"target": self.filename.name,
+                                 "model_key": self.model_key,
+                                 "host": socket.gethostname(),
+                                 "pid": os.getpid()}) + "\n")
+            for record in self._records.values():
+                fd.write(json.dumps(record) + "\n")
+
+    def append(self, fdist, index, use=True):
+        """Append the results of a curve to the journal
+
+        Parameters
+        ----------
+        fdist: nanite.Indentation
+            curve (fitted with `self.model_key`)
+        index: int
+            position of the curve in the data set
+        use: bool
+            whether the curve is part of the results; if False,
+            the curve is removed from the results file
+        """
+        with self._lock:
+            if self._fd is None:
+                self._open()
+            row = get_rows([fdist])[0] if use else None
+            self._add(fdist, index, row)
+
+    def compact(self):
+        """Write the results file from the journal
+
+        The journal is rewritten with only the last record of
+        each curve.
+        """
+        with self._lock:
+            if self._fd is None:
+                # the results file is up-to-date
+                return
+            rows = _get_sorted_rows(self._records)
+            if rows:
+                save_rows(self.filename, rows)
+            self._fd.close()
+            tmp = self.path.with_name(self.path.name + ".tmp")
+            self._write_records(tmp)
+            os.replace(tmp, self.path)
+            self._fd = open(self.path, "a", encoding="utf-8")
+
+    def close(self):
+        """Compact the journal and remove it"""
+        self.compact()
+        with self._lock:
+            if self._fd is not None:
+                self._fd.close()
+                self._fd = None
+                try:
+                    self.path.unlink()
+                except OSError:
+                    pass
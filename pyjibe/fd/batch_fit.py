@@ -0,0 +1,394 @@
+"""Vectorized fitting of many curves with identical fit settings
+
+Fitting curves one at a time with lmfit is dominated by Python
+overhead for simple closed-form models. For the models in
+:data:`batch_models`, :func:`fit_curves` packs the fitted data of
+all curves into padded arrays and solves all curves simultaneously
+with a Levenberg-Marquardt iteration (analytical Jacobian, scaled
+damping, parameter bounds are enforced by clipping). The fitting
+range, the contact point weights and the geometrical correction
+factor are the same as in :class:`nanite.fit.IndentationFitter` and
+the results are written to the same fit properties (including the
+fit hash, so nanite does not fit these curves again).
+
+Other models and settings (relative fitting range, optimal
+indentation depth, minimizer other than the default) are fitted
+with `nanite.Indentation.fit_model`. Curves for which the
+iteration does not converge are fitted with lmfit as well.
+"""
+import copy
+
+import nanite.fit as nfit
+import nanite.model as nmodel
+import numpy as np
+
+
+class HertzParaboloidal:
+    """Vectorized Hertz model for a paraboloidal indenter"""
+    model_key = "hertz_para"
+    parameter_keys = ["E", "R", "nu", "contact_point", "baseline"]
+
+    @staticmethod
+    def evaluate(values, x, mask, varied=None):
+        """Evaluate the model and its Jacobian
+
+        Parameters
+        ----------
+        values: 2d ndarray of shape (C, P)
+            parameters of C curves in the order of `parameter_keys`
+        x: 2d ndarray of shape (C, N)
+            indentation (padded)
+        mask: 2d boolean ndarray of shape (C, N)
+            valid (not padded) data points
+        varied: list of int
+            indices of the parameters for which the Jacobian
+            is computed; set to None to compute only the model
+
+        Returns
+        -------
+        force: 2d ndarray of shape (C, N)
+            model force
+        jac: 3d ndarray of shape (C, len(varied), N) or None
+            derivatives of the model force with respect to
+            the `varied` parameters
+        """
+        E, R, nu, cp, baseline = [v[:, np.newaxis] for v in values.T]
+        root = np.maximum(cp - x, 0)
+        root *= mask
+        sqrt_root = np.sqrt(root)
+        bb = root * sqrt_root
+        # 4/3 * sqrt(R) / (1-nu^2)
+        prefactor = 4 / 3 * np.sqrt(R) / (1 - nu**2)
+        force = (E * prefactor) * bb
+        force += baseline
+        if varied is None:
+            return force, None
+        jac = np.empty((x.shape[0], len(varied), x.shape[1]))
+        for ii, pid in enumerate(varied):
+            if pid == 0:  # E
+                np.multiply(prefactor, bb, out=jac[:, ii])
+            elif pid == 1:  # R
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    factor = np.where(R > 0, E * prefactor / (2 * R), 0)
+                np.multiply(factor, bb, out=jac[:, ii])
+            elif pid == 2:  # nu
+                np.multiply(E * prefactor * 2 * nu / (1 - nu**2), bb,
+                            out=jac[:, ii])
+            elif pid == 3:  # contact_point
+                np.multiply(E * prefactor * 1.5, sqrt_root, out=jac[:, ii])
+            else:  # baseline
+                jac[:, ii] = 1
+        return force, jac
+
+
+#: maximum number of data points (all curves) fitted at once
+CHUNK_POINTS = 2**18
+
+#: models that can be fitted with :func:`fit_curves` in batches
+batch_models = {HertzParaboloidal.model_key: HertzParaboloidal}
+
+
+def is_supported(fit_settings):
+    """Whether :func:`fit_curves` fits these settings in batches
+
+    Parameters
+    ----------
+    fit_settings: pyjibe.fd.fit_settings.FitSettings
+        fit settings
+    """
+    return (fit_settings.model_key in batch_models
+            and fit_settings.range_type == "absolute"
+            and not fit_settings.optimal_fit_edelta
+            and fit_settings.method in [None, "leastsq"]
+            and not fit_settings.method_kws
+            and fit_settings.x_axis == "tip position"
+            and fit_settings.y_axis == "force"
+            # expressions are not supported
+            and all(item[5] is None for item in fit_settings.params_initial)
+            )
+
+
+def fit_curves(fdists, fit_settings, max_iter=200, ftol=1e-9, xtol=1e-9):
+    """Fit curves with identical fit settings
+
+    Parameters
+    ----------
+    fdists: list of nanite.Indentation
+        curves to fit (must be preprocessed)
+    fit_settings: pyjibe.fd.fit_settings.FitSettings
+        fit settings
+    max_iter: int
+        maximum number of Levenberg-Marquardt iterations
+    ftol: float
+        relative reduction of the sum of squares below which
+        the iteration is considered converged
+    xtol: float
+        relative change of the (scaled) parameters below which
+        the iteration is considered converged
+
+    Returns
+    -------
+    num_batched: int
+        number of curves fitted in the batch (the other curves were
+        already fitted or were fitted with lmfit)
+    """
+    if not is_supported(fit_settings):
+        for fdist in fdists:
+            fdist.fit_model(**fit_settings.to_kwargs())
+        return 0
+    model = batch_models[fit_settings.model_key]
+    fitters = []
+    for fdist in fdists:
+        # same as in `nanite.Indentation.fit_model`
+        kwargs = fit_settings.to_kwargs()
+        for arg in sorted(kwargs.keys()):
+            fdist.fit_properties[arg] = kwargs[arg]
+        if "hash" in fdist.fit_properties:
+            # already fitted with these settings
+            continue
+        fdist._anc_cache = None
+        fitters.append((fdist, nfit.IndentationFitter(fdist)))
+    if not fitters:
+        return 0
+
+    gcf_k = fit_settings.gcf_k
+    weight_cp = fit_settings.weight_cp
+    params = fit_settings.get_params()
+    keys = model.parameter_keys
+    varied = [ii for ii, key in enumerate(keys) if params[key].vary]
+    pmin = np.array([params[key].min for key in keys])
+    pmax = np.array([params[key].max for key in keys])
+    initial = np.array([params[key].value for key in keys])
+    # contact point correction with gcf_k
+    initial[keys.index("contact_point")] *= gcf_k
+
+    # pack the fitted data into padded arrays
+    xs = []
+    ys = []
+    batch = []
+    for fdist, fitter in fitters:
+        fitter.fp["success"] = False
+        set_fit_range(fitter)
+        x = fitter.x_axis[fitter.fit_range] * gcf_k
+        if len(varied) < x.shape[0] - 1:
+            xs.append(x)
+            ys.append(fitter.y_axis[fitter.fit_range])
+            batch.append((fdist, fitter))
+        else:
+            # not enough data points (same as in nanite)
+            fitter.fit_curve[:] = np.nan
+            fitter.fit_residuals[:] = np.nan
+            store_results(fdist, fitter)
+    num_batched = 0
+    # Curves are fitted in chunks whose working arrays fit into
+    # the CPU cache (sorted by size to reduce padding).
+    order = sorted(range(len(batch)), key=lambda ii: len(xs[ii]))
+    start = 0
+    while start < len(order):
+        stop = start + 1
+        while (stop < len(order)
+               and (stop - start + 1) * len(xs[order[stop]])
+               <= CHUNK_POINTS):
+            stop += 1
+        chunk = order[start:stop]
+        start = stop
+        size = len(xs[chunk[-1]])
+        x = np.zeros((len(chunk), size))
+        y = np.zeros((len(chunk), size))
+        mask = np.zeros((len(chunk), size), dtype=bool)
+        for jj, ii in enumerate(chunk):
+            x[jj, :len(xs[ii])] = xs[ii]
+            y[jj, :len(ys[ii])] = ys[ii]
+            mask[jj, :len(xs[ii])] = True
+
+        values, chi_sqr, converged = levenberg_marquardt(
+            model, initial, x, y, mask, weight_cp, varied, pmin, pmax,
+            max_iter=max_iter, ftol=ftol, xtol=xtol)
+
+        for jj, ii in enumerate(chunk):
+            fdist, fitter = batch[ii]
+            if converged[jj] and np.all(np.isfinite(values[jj])):
+                write_results(fitter, model, values[jj], chi_sqr[jj],
+                              xs[ii])
+                num_batched += 1
+            else:
+                # fall back to lmfit
+                fitter.fit()
+            store_results(fdist, fitter)
+    return num_batched
+
+
+def levenberg_marquardt(model, initial, x, y, mask, weight_cp, varied,
+                        pmin, pmax, max_iter=200, ftol=1e-9, xtol=1e-9):
+    """Minimize the residuals of all curves simultaneously
+
+    The residuals are those of :func:`nanite.model.residuals.residual`
+    (including the contact point weights). The columns of the
+    Jacobian are normalized, which makes the damping invariant to
+    the very different scales of the parameters. Curves that
+    converged are removed from the working arrays.
+
+    Returns
+    -------
+    values: 2d ndarray of shape (C, P)
+        fitted parameters
+    chi_sqr: 1d ndarray of length C
+        sum of squared residuals
+    converged: 1d boolean ndarray of length C
+        whether the iteration converged
+    """
+    num = x.shape[0]
+    values = np.tile(initial, (num, 1))
+    chi_sqr = np.zeros(num)
+    converged = np.zeros(num, dtype=bool)
+    eye = np.eye(len(varied))
+    # working arrays of the active curves
+    act = np.arange(num)
+    val_a = values.copy()
+    damp_a = np.full(num, 1e-3)
+    resid_a, jac_a = get_residuals(model, val_a, x, y, mask, weight_cp,
+                                   varied)
+    chi_a = np.einsum("cn,cn->c", resid_a, resid_a)
+    for _ in range(max_iter):
+        # normalize the columns of the Jacobian
+        scale = np.sqrt(np.einsum("cpn,cpn->cp", jac_a, jac_a))
+        scale[scale == 0] = 1
+        jac_a /= scale[:, :, np.newaxis]
+        jtj = jac_a @ jac_a.transpose(0, 2, 1)
+        grad = (jac_a @ resid_a[:, :, np.newaxis])[:, :, 0]
+        lhs = jtj + damp_a[:, np.newaxis, np.newaxis] * eye
+        try:
+            step = -np.linalg.solve(lhs, grad[:, :, np.newaxis])[:, :, 0]
+        except np.linalg.LinAlgError:
+            # singular for one of the curves, give up on all active
+            # curves (they are fitted with lmfit)
+            break
+        trial = val_a.copy()
+        trial[:, varied] += step / scale
+        np.clip(trial, pmin, pmax, out=trial)
+        resid_t, jac_t = get_residuals(model, trial, x, y, mask, weight_cp,
+                                       varied)
+        chi_t = np.einsum("cn,cn->c", resid_t, resid_t)
+        better = chi_t < chi_a
+        # relative change of the scaled parameters
+        dval = np.abs(trial[:, varied] - val_a[:, varied]) * scale
+        rval = np.abs(val_a[:, varied]) * scale
+        small_step = np.all(dval <= xtol * (rval + xtol), axis=1)
+        small_reduction = (chi_a - chi_t <= ftol * chi_a) & better
+        # accept the improved curves
+        val_a[better] = trial[better]
+        chi_a[better] = chi_t[better]
+        if np.all(better):
+            resid_a, jac_a = resid_t, jac_t
+        else:
+            resid_a[better] = resid_t[better]
+            jac_a[better] = jac_t[better]
+            # the Jacobian of the rejected curves was normalized
+            jac_a[~better] *= scale[~better, :, np.newaxis]
+        damp_a = np.where(better, np.maximum(damp_a / 10, 1e-12),
+                          damp_a * 10)
+        done = small_step | small_reduction | (damp_a > 1e12)
+        if np.any(done):
+            values[act[done]] = val_a[done]
+            chi_sqr[act[done]] = chi_a[done]
+            converged[act[done]] = True
+            keep = ~done
+            if not np.any(keep):
+                break
+            act = act[keep]
+            val_a = val_a[keep]
+            damp_a = damp_a[keep]
+            chi_a = chi_a[keep]
+            resid_a = resid_a[keep]
+            jac_a = jac_a[keep]
+            x = x[keep]
+            y = y[keep]
+            mask = mask[keep]
+    return values, chi_sqr, converged
+
+
+def get_residuals(model, values, x, y, mask, weight_cp, varied):
+    """Weighted residuals and their Jacobian (padded with zeros)
+
+    The Jacobian (shape (C, len(varied), N)) is computed for
+    the `varied` parameters only.
+    """
+    force, jac = model.evaluate(values, x, mask, varied)
+    resid = np.subtract(y, force, out=force)
+    resid *= mask
+    np.negative(jac, out=jac)
+    if weight_cp:
+        cpid = model.parameter_keys.index("contact_point")
+        cp = values[:, cpid, np.newaxis]
+        delta = x - cp
+        weights = np.abs(delta)
+        weights /= weight_cp
+        inner = weights < 1
+        np.minimum(weights, 1, out=weights)
+        if cpid in varied:
+            # the weights depend on the contact point
+            dweights = np.sign(delta, out=delta)
+            dweights *= inner
+            dweights *= resid
+            dweights /= weight_cp
+        jac *= weights[:, np.newaxis, :]
+        if cpid in varied:
+            jac[:, varied.index(cpid)] -= dweights
+        resid *= weights
+    jac *= mask[:, np.newaxis, :]
+    return resid, jac
+
+
+def set_fit_range(fitter):
+    """Set the fitting range of an absolute range (same as nanite)"""
+    range_x = fitter.range_x
+    if range_x[0] != range_x[1]:
+        range_bool = fitter.segment.copy()
+        rmin, rmax = np.min(range_x), np.max(range_x)
+        range_bool[fitter.x_axis < rmin] = False
+        range_bool[fitter.x_axis > rmax] = False
+    else:
+        range_bool = fitter.segment
+    fitter.fit_range[:] = range_bool
+
+
+def store_results(fdist, fitter):
+    """Store the results of a fitter (same as `Indentation.fit_model`)"""
+    fdist["fit"] = fitter.fit_curve
+    fdist["fit residuals"] = fitter.fit_residuals
+    fdist["fit range"] = fitter.fit_range
+    fdist.fit_properties = fitter.fp
+
+
+def write_results(fitter, model, values, chi_sqr, x):
+    """Write the fitted values to the fit properties of a fitter
+
+    This mimics :func:`nanite.fit.IndentationFitter._fit`.
+    """
+    fp = fitter.fp
+    gcf_k = fp["gcf_k"]
+    params_initial = fp["params_initial"]
+    # nanite modifies the initial contact point in-place
+    cpi = params_initial["contact_point"].value
+    params_initial["contact_point"].set(value=cpi * gcf_k)
+    params = copy.deepcopy(params_initial)
+    for key, value in zip(model.parameter_keys, values):
+        params[key].set(value=value)
+    md = nmodel.models_available[fp["model_key"]]
+    segid = fitter.segment
+    xseg = fitter.x_axis[segid] * gcf_k
+    yseg = fitter.y_axis[segid]
+    fitter.fit_curve[:] = np.nan
+    fitter.fit_residuals[:] = np.nan
+    fitter.fit_curve[segid] = md.model(params, xseg)
+    fitter.fit_residuals[segid] = md.residual(params, xseg, yseg,
+                                              fp["weight_cp"])
+    # inverse contact point correction with gcf_k
+    params["contact_point"].set(
+        value=params["contact_point"].value / gcf_k)
+    fp.update({"params_fitted": params,
+               "chi_sqr": chi_sqr,
+               "xmin": x.min() / gcf_k,
+               "xmax": x.max() / gcf_k,
+               "success": True,
+               })
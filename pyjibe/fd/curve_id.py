@@ -0,0 +1,112 @@
+"""Stable identifiers of curves
+
+Curves are identified by the content of their data file, their
+index in the file (enum), and their segment layout (number of
+segments and data points). Unlike the curve objects, the identifier
+of a curve does not change when its data file is loaded again, so
+it can be used to store per-curve settings (e.g. the individual
+indentation depths of :class:`pyjibe.fd.tab_fit.TabFit`) and to
+relate persisted results to the curves of a data set.
+
+Only the beginning of a data file is hashed (together with its
+size), so that the identifiers of large QMaps are computed quickly
+when the files are loaded. The identifiers only depend on metadata,
+so the data of lazily-opened curves are not parsed.
+"""
+import hashlib
+import pathlib
+import threading
+import weakref
+
+from ..util import hashfile
+
+
+#: size of the blocks of a data file that are hashed
+HASH_BLOCKSIZE = 65536
+#: number of blocks hashed at the beginning of a data file
+HASH_COUNT = 4
+
+#: identifier of each curve
+_curve_ids = weakref.WeakKeyDictionary()
+_curve_ids_lock = threading.Lock()
+
+
+def get_file_key(path):
+    """Return the partial hash and the size of a data file
+
+    If `path` is not a file (e.g. for curves created in memory),
+    the hash of `path` is returned.
+    """
+    path = pathlib.Path(path)
+    try:
+        size = path.stat().st_size
+        digest = hashfile(path, blocksize=HASH_BLOCKSIZE, count=HASH_COUNT)
+    except OSError:
+        return hashlib.md5(str(path).encode("utf-8")).hexdigest()
+    return "{}-{}".format(digest, size)
+
+
+def compute_curve_id(fdist):
+    """Compute the identifier of a curve (see module docstring)"""
+    meta = fdist.metadata
+    return "{}:{}:{}x{}".format(get_file_key(fdist.path),
+                                meta.get("enum", -1),
+                                meta.get("segment count", 0),
+                                meta.get("point count", 0))
+
+
+def get_curve_id(fdist):
+    """Return the identifier of a curve
+
+    The identifier is computed only once for each curve.
+
+    Parameters
+    ----------
+    fdist: nanite.Indentation
+        curve
+
+    Returns
+    -------
+    curve_id: str
+        identifier of the form "hash-size:enum:segmentsxpoints"
+        (made unique by :func:`assign_curve_ids`)
+    """
+    with _curve_ids_lock:
+        cid = _curve_ids.get(fdist)
+    if cid is None:
+        cid = compute_curve_id(fdist)
+        with _curve_ids_lock:
+            _curve_ids[fdist] = cid
+    return cid
+
+
+def assign_curve_ids(group, taken=None):
+    """Compute the identifiers of all curves of a group
+
+    This is done when the curves are loaded; each data file is
+    hashed only once. Curves of byte-identical copies of a data
+    file have the same content; the identifiers of the repeats are
+    made unique by appending the ordinal of the repeat ("#1", "#2",
+    ...), which is stable as long as the files are loaded in the
+    same order.
+
+    Parameters
+    ----------
+    group: nanite.IndentationGroup or list of nanite.Indentation
+        curves
+    taken: set of str
+        identifiers of the curves already in the data set;
+        updated in-place with the identifiers of `group`
+    """
+    if taken is None:
+        taken = set()
+    for fdist in group:
+        cid = base = get_curve_id(fdist)
+        num = 1
+        while cid in taken:
+            cid = "{}#{}".format(base, num)
+            num += 1
+        if cid != base:
+            with _curve_ids_lock:
+                _curve_ids[fdist] = cid
+        taken.add(cid)
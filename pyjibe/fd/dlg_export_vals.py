@@ -1,23 +1,22 @@
-import importlib.resources
-
-from PyQt6 import uic, QtWidgets
+from PyQt6 import QtWidgets
 
+from .. import uicache
 from . import export
 
 
 class ExportDialog(QtWidgets.QDialog):
     _instance_counter = 0
 
-    def __init__(self, parent, fdist_list, identifier, *args, **kwargs):
+    def __init__(self, parent, fdist_list, identifier, scheduler=None,
+                 *args, **kwargs):
         """Base class for force-indentation analysis"""
         super(ExportDialog, self).__init__(parent=parent, *args, **kwargs)
 
-        ref = importlib.resources.files("pyjibe.fd") / "dlg_export_vals.ui"
-        with importlib.resources.as_file(ref) as path_ui:
-            uic.loadUi(path_ui, self)
+        uicache.setup_ui(self, "pyjibe.fd", "dlg_export_vals.ui")
 
         self.fdist_list = fdist_list
         self.identifier = identifier
+        self.scheduler = scheduler
 
     def done(self, r):
         if r:
@@ -49,5 +48,7 @@ class ExportDialog(QtWidgets.QDialog):
 
                 export.save_tsv_metadata_results(filename=fname,
                                                  fdist_list=self.fdist_list,
-                                                 which=which)
+                                                 which=which,
+                                                 scheduler=self.scheduler,
+                                                 owner=self.parent())
         super(ExportDialog, self).done(r)
@@ -0,0 +1,297 @@
+"""Computation of the optimal indentation depth with fewer fits
+
+nanite determines the optimal indentation depth by fitting the
+model for `optimal_fit_num_samples` minimal indentation depths
+(see `nanite.fit.IndentationFitter.compute_emodulus_vs_mindelta`)
+and by searching for a plateau in the resulting E(δ) curve
+(`IndentationFitter.compute_opt_mindelta`).
+
+The plateau criterion smooths the complete E(δ) curve with a
+forward-backward filter and bins it between its extremes, so every
+sample may change the chosen depth. Skipping samples (interpolation
+between the samples of a coarse grid) and starting the fits from the
+result of the previous sample both changed the chosen depth for
+noisy curves. To obtain the same depth as nanite, fits are saved
+where the result is known to be identical instead:
+
+- Samples whose fitting ranges contain the same data points are
+  fitted only once (common for curves with few data points).
+- nanite discards the E(δ) curve whenever the fit settings change,
+  e.g. when the E(δ) plot was computed with a fixed indentation
+  depth and the user then selects the optimal indentation depth.
+  The E(δ) curve of each curve is cached for the fit settings
+  without the fitting range on the left (see
+  :func:`pyjibe.fd.fit_settings.FitSettings.edelta_key`) and the
+  preprocessing, so only the final fit is performed in this case.
+"""
+import json
+import logging
+import threading
+import time
+import weakref
+
+import nanite.fit as nfit
+import numpy as np
+
+from .batch_fit import store_results
+
+
+logger = logging.getLogger(__name__)
+
+#: cache key, E(δ) and δ of the last E(δ) curve of each curve
+_edelta_cache = weakref.WeakKeyDictionary()
+_edelta_cache_lock = threading.Lock()
+
+
+class EDeltaReport:
+    def __init__(self):
+        """Statistics of the computation of E(δ) curves"""
+        #: number of E(δ) samples
+        self.num_samples = 0
+        #: number of fits performed
+        self.num_fits = 0
+        #: number of E(δ) curves taken from the cache
+        self.num_cached = 0
+        #: wall time [s]
+        self.duration = 0
+
+    @property
+    def num_saved(self):
+        """Number of fits saved compared to nanite"""
+        return self.num_samples - self.num_fits
+
+    def summary(self):
+        """Return a one-line summary for logging"""
+        return ("E(δ): {} samples in {:.2f}s with {} fits ({} cached "
+                "curves); saved {} fits"
+                ).format(self.num_samples, self.duration, self.num_fits,
+                         self.num_cached, self.num_saved)
+
+    def to_dict(self):
+        return {"samples": self.num_samples,
+                "fits": self.num_fits,
+                "cached curves": self.num_cached,
+                "fits saved": self.num_saved,
+                "time [s]": self.duration,
+                }
+
+
+def get_edelta_key(fdist, fit_settings):
+    """Return the cache key of the E(δ) curve of `fdist`"""
+    return (fit_settings.edelta_key(),
+            json.dumps([fdist.preprocessing, fdist.preprocessing_options],
+                       sort_keys=True, default=str))
+
+
+def get_cached_edelta(fdist, key):
+    """Return the cached E(δ) curve of `fdist` for `key` or None
+
+    Returns
+    -------
+    emoduli, indentations: 1d ndarrays or None
+    """
+    with _edelta_cache_lock:
+        cached = _edelta_cache.get(fdist)
+    if cached is not None and cached[0] == key:
+        return cached[1], cached[2]
+    return None
+
+
+def set_cached_edelta(fdist, key, emoduli, indentations):
+    """Remember the E(δ) curve of `fdist` for `key`"""
+    with _edelta_cache_lock:
+        _edelta_cache[fdist] = (key, emoduli, indentations)
+
+
+def check_segment(fitter):
+    """Perform the sanity checks of nanite for E(δ) curves
+
+    See `nanite.fit.IndentationFitter.compute_emodulus_vs_mindelta`.
+    """
+    xseg = fitter.x_axis[fitter.segment]
+    yseg = fitter.y_axis[fitter.segment]
+    # `xseg` should start at the baseline.
+    seems_approach = np.average(yseg[:10]) < np.average(yseg[-10:])
+    if seems_approach and fitter.fp["segment"] == 0:
+        if xseg[0] < xseg[-1]:
+            raise nfit.FitDataError("Unexpected trend in approach x data!")
+    elif seems_approach:
+        raise nfit.FitDataError(
+            "Data appears to be 'approach', but is 'retract'!")
+    elif not seems_approach and fitter.fp["segment"] > 0:
+        if xseg[0] > xseg[-1]:
+            raise nfit.FitDataError("Unexpected trend in retract x data!")
+        raise nfit.FitDataError("Unexpected trend in retract curve!")
+    elif not seems_approach:
+        raise nfit.FitDataError(
+            "Data appears to be 'retract', but is 'approach'!")
+    if xseg.min() >= 0:
+        raise nfit.FitKeyError("No negative values (indentation) found! "
+                               + "Did you correct for tip offset?")
+
+
+def compute_emodulus_vs_mindelta(fitter, callback=None, report=None):
+    """Compute the elastic modulus vs. minimal indentation curve
+
+    Same as `nanite.fit.IndentationFitter.compute_emodulus_vs_mindelta`,
+    but samples with identical fitting ranges are fitted only once.
+
+    Parameters
+    ----------
+    fitter: nanite.fit.IndentationFitter
+        fitter of the curve
+    callback: callable
+        called with the `emoduli` and `indentations` every
+        five samples
+    report: EDeltaReport
+        if given, the statistics are added to this report
+    """
+    if report is None:
+        report = EDeltaReport()
+    tic = time.perf_counter()
+    check_segment(fitter)
+    fp = fitter.fp
+    xseg = fitter.x_axis[fitter.segment]
+    xmax = np.max(fp["range_x"])
+    if np.isinf(xmax):
+        xmax = np.max(xseg)
+    xmin = xseg.min()
+    num_samp = fp["optimal_fit_num_samples"]
+    indentations = np.linspace(xmin, xmin*.05, num_samp)
+    emoduli = np.zeros_like(indentations)
+    # The fitting ranges are nested; the same number of data
+    # points means the same fitting range.
+    num_points = [np.count_nonzero((xseg >= x0) & (xseg <= xmax))
+                  for x0 in indentations]
+
+    optimal_fit_edelta = fitter.optimal_fit_edelta
+    range_x = fitter.range_x
+    fitter.optimal_fit_edelta = False
+    try:
+        for ii, x0 in enumerate(indentations):
+            if ii and num_points[ii] == num_points[ii-1]:
+                emoduli[ii] = emoduli[ii-1]
+            else:
+                fitter.range_x = [x0, xmax]
+                fitter.fit()
+                report.num_fits += 1
+                emoduli[ii] = fp["params_fitted"]["E"].value
+            if callback and ii % 5 == 0:
+                callback(emoduli, indentations)
+    finally:
+        fitter.optimal_fit_edelta = optimal_fit_edelta
+        fitter.range_x = range_x
+    report.num_samples += num_samp
+    report.duration += time.perf_counter() - tic
+    return emoduli, indentations
+
+
+def compute_emodulus_mindelta(fdist, callback=None, key=None, report=None):
+    """Elastic modulus in dependency of the minimal indentation depth
+
+    Same as `nanite.Indentation.compute_emodulus_mindelta`, but
+    with fewer fits (see module docstring).
+
+    Parameters
+    ----------
+    fdist: nanite.Indentation
+        curve (with the fit settings in `fdist.fit_properties`)
+    callback: callable
+        called with the `emoduli` and `indentations` every
+        five samples
+    key: hashable
+        if given, the E(δ) curve is cached for this key
+        (see :func:`get_edelta_key`)
+    report: EDeltaReport
+        if given, the statistics are added to this report
+    """
+    if report is None:
+        report = EDeltaReport()
+    cached = get_cached_edelta(fdist, key) if key is not None else None
+    if cached is not None:
+        emoduli, indentations = cached
+        report.num_cached += 1
+        report.num_samples += emoduli.size
+    elif "optimal_fit_E_array" in fdist.fit_properties:
+        emoduli = fdist.fit_properties["optimal_fit_E_array"]
+        indentations = fdist.fit_properties["optimal_fit_delta_array"]
+    else:
+        fitter = nfit.IndentationFitter(fdist)
+        emoduli, indentations = compute_emodulus_vs_mindelta(
+            fitter, callback=callback, report=report)
+        fdist.fit_properties["optimal_fit_E_array"] = emoduli
+        fdist.fit_properties["optimal_fit_delta_array"] = indentations
+        logger.debug(report.summary())
+    if key is not None:
+        set_cached_edelta(fdist, key, emoduli, indentations)
+    return emoduli, indentations
+
+
+def estimate_optimal_mindelta(fdist, key=None, report=None):
+    """Estimate the optimal indentation depth
+
+    Same as `nanite.Indentation.estimate_optimal_mindelta`, but
+    with fewer fits (see :func:`compute_emodulus_mindelta`).
+    """
+    emoduli, indentations = compute_emodulus_mindelta(fdist, key=key,
+                                                      report=report)
+    return nfit.IndentationFitter.compute_opt_mindelta(
+        emoduli=emoduli, indentations=indentations)
+
+
+def fit_curve(fdist, fit_settings, report=None):
+    """Fit a curve, searching for the optimal depth if requested
+
+    Same as `nanite.Indentation.fit_model`; for fit settings with
+    `optimal_fit_edelta`, the E(δ) curve is computed with
+    :func:`compute_emodulus_vs_mindelta` or taken from the cache.
+
+    Parameters
+    ----------
+    fdist: nanite.Indentation
+        curve to fit (must be preprocessed)
+    fit_settings: pyjibe.fd.fit_settings.FitSettings
+        fit settings
+    report: EDeltaReport
+        if given, the statistics are added to this report
+    """
+    kwargs = fit_settings.to_kwargs()
+    if not fit_settings.optimal_fit_edelta:
+        fdist.fit_model(**kwargs)
+        return
+    # same as in `nanite.Indentation.fit_model`
+    for arg in sorted(kwargs.keys()):
+        fdist.fit_properties[arg] = kwargs[arg]
+    if "hash" in fdist.fit_properties:
+        # already fitted with these settings
+        return
+    if report is None:
+        report = EDeltaReport()
+    fdist._anc_cache = None
+    fitter = nfit.IndentationFitter(fdist)
+    # same as in `nanite.fit.IndentationFitter.fit`
+    fitter.fp["success"] = False
+    key = get_edelta_key(fdist, fit_settings)
+    cached = get_cached_edelta(fdist, key)
+    if cached is None:
+        emoduli, indentations = compute_emodulus_vs_mindelta(fitter,
+                                                             report=report)
+        set_cached_edelta(fdist, key, emoduli, indentations)
+    else:
+        emoduli, indentations = cached
+        report.num_cached += 1
+        report.num_samples += emoduli.size
+        # nanite performs these checks before fitting
+        check_segment(fitter)
+    dopt = nfit.IndentationFitter.compute_opt_mindelta(emoduli, indentations)
+    fitter.fp["optimal_fit_E_array"] = emoduli
+    fitter.fp["optimal_fit_delta_array"] = indentations
+    fitter.fp["optimal_fit_delta"] = dopt
+    range_x = fitter.range_x
+    fitter.range_x = [dopt, np.max(fitter.fp["range_x"])]
+    fitter.optimal_fit_edelta = False
+    fitter.fit()
+    fitter.optimal_fit_edelta = True
+    fitter.range_x = range_x
+    store_results(fdist, fitter)
+    logger.debug(report.summary())
@@ -6,10 +6,12 @@ import numpy as np
 
 from afmformats import meta
 import nanite.model as nmodel
-from PyQt6 import QtCore
 
+from ..settings import get_settings
 from .. import units
 
+from . import ancillaries
+
 #: Valid export choices in `save_tsv_metadata_results`
 EXPORT_CHOICES = list(meta.META_FIELDS.keys()) + [
     "params_ancillary",
@@ -18,7 +20,8 @@ EXPORT_CHOICES = list(meta.META_FIELDS.keys()) + [
     "rating"]
 
 
-def save_tsv_metadata_results(filename, fdist_list, which=EXPORT_CHOICES):
+def save_tsv_metadata_results(filename, fdist_list, which=EXPORT_CHOICES,
+                              scheduler=None, owner=None):
     """Export metadata and fitting parameters
 
     Parameters
@@ -29,24 +32,56 @@ def save_tsv_metadata_results(filename, fdist_list, which=EXPORT_CHOICES):
         List of :class:`nanite.Indentation` instances
     which: list of str
         Valid for choices to export (see :data:`EXPORT_CHOICES`)
+    scheduler: pyjibe.head.scheduler.ComputeScheduler
+        if given, the ancillary parameters of many curves are
+        computed by the workers of the scheduler
+        (see :func:`pyjibe.fd.ancillaries.compute_ancillary_parameters`)
+    owner: object
+        owner of the jobs submitted to `scheduler`
+    """
+    columns = get_tsv_columns(fdist_list, which=which, scheduler=scheduler,
+                              owner=owner)
+    save_tsv(filename, columns)
+
+
+def get_tsv_columns(fdist_list, which=EXPORT_CHOICES, scheduler=None,
+                    owner=None):
+    """Return the columns of :func:`save_tsv_metadata_results`
+
+    The parameters are the same as in :func:`save_tsv_metadata_results`.
+
+    Returns
+    -------
+    columns: collections.OrderedDict
+        column labels and lists of values in human-readable
+        units (one value for each curve)
     """
     if np.sum([k not in EXPORT_CHOICES for k in which]):
         raise ValueError("Found invalid export choices.")
 
-    settings = QtCore.QSettings()
+    settings = get_settings()
     dev_mode = bool(int(settings.value("advanced/developer mode", "0")))
 
     size = len(fdist_list)
     columns = OrderedDict()
+    # name and SI unit of the columns that are converted to
+    # human-readable units after all values are collected
+    column_units = {}
+    anc_dicts = {}
+    if "params_ancillary" in which:
+        fitted = [fd for fd in fdist_list if "model_key" in fd.fit_properties]
+        anc_dicts = dict(zip(fitted, ancillaries.compute_ancillary_parameters(
+            fitted, scheduler=scheduler, owner=owner)))
     # Metadata
     for ii, fdist in enumerate(fdist_list):
         meta = fdist.metadata.get_summary()
         for topic in meta:
             if topic in which:
                 for kk in meta[topic]:
-                    label, hrvalue = get_unitname_value_meta(
+                    name, value, unit = get_name_value_unit_meta(
                         key=kk, value=meta[topic][kk])
-                    set_odict_list_value(columns, label, size, ii, hrvalue)
+                    set_odict_list_si_value(columns, column_units, size, ii,
+                                            name, value, unit)
 
         # Parameters
         if "model_key" in fdist.fit_properties:
@@ -54,13 +89,13 @@ def save_tsv_metadata_results(filename, fdist_list, which=EXPORT_CHOICES):
 
             # Ancillary
             if "params_ancillary" in which:
-                anc_dict = fdist.get_ancillary_parameters()
+                anc_dict = anc_dicts[fdist]
                 for kk in anc_dict:
-                    label, hrvalue = get_unitname_value(
+                    set_odict_list_si_value(
+                        columns, column_units, size, ii,
                         name=nmodel.get_parm_name(model_key, kk),
                         value=anc_dict[kk],
                         unit=nmodel.get_parm_unit(model_key, kk))
-                    set_odict_list_value(columns, label, size, ii, hrvalue)
 
             # Initial
             if "params_initial" in which:
@@ -71,12 +106,11 @@ def save_tsv_metadata_results(filename, fdist_list, which=EXPORT_CHOICES):
                             # ignore hidden parameters in normal mode
                             continue
                         if not (fp[ki].vary or fp[ki].expr):
-                            label, hrvalue = get_unitname_value(
+                            set_odict_list_si_value(
+                                columns, column_units, size, ii,
                                 name=nmodel.get_parm_name(model_key, ki),
                                 value=fp[ki].value,
                                 unit=nmodel.get_parm_unit(model_key, ki))
-                            set_odict_list_value(
-                                columns, label, size, ii, hrvalue)
 
             # Fitted
             if "params_fitted" in which:
@@ -87,12 +121,11 @@ def save_tsv_metadata_results(filename, fdist_list, which=EXPORT_CHOICES):
                             # ignore hidden parameters in normal mode
                             continue
                         if fp[ki].vary or fp[ki].expr:
-                            label, hrvalue = get_unitname_value(
+                            set_odict_list_si_value(
+                                columns, column_units, size, ii,
                                 name=nmodel.get_parm_name(model_key, ki),
                                 value=fp[ki].value,
                                 unit=nmodel.get_parm_unit(model_key, ki))
-                            set_odict_list_value(
-                                columns, label, size, ii, hrvalue)
 
                     # Additional fit parameters
                     props = {"xmin": ("Fit interval minimum", "m"),
@@ -105,11 +138,11 @@ def save_tsv_metadata_results(filename, fdist_list, which=EXPORT_CHOICES):
                              "method_kws": ("Fit method kwargs", ""),
                              }
                     for prop in props:
-                        label, hrvalue = get_unitname_value(
+                        set_odict_list_si_value(
+                            columns, column_units, size, ii,
                             name=props[prop][0],
                             value=fdist.fit_properties[prop],
                             unit=props[prop][1])
-                        set_odict_list_value(columns, label, size, ii, hrvalue)
 
             if "rating" in which:
                 rdict = fdist.get_rating_parameters()
@@ -117,7 +150,10 @@ def save_tsv_metadata_results(filename, fdist_list, which=EXPORT_CHOICES):
                     set_odict_list_value(
                         columns, label, size, ii, rdict[label])
 
-    save_tsv(filename, columns)
+    for label, (name, unit) in column_units.items():
+        columns[label], _ = units.si2hr_array(name, columns[label], unit)
+
+    return columns
 
 
 def save_tsv(filename, column_dict):
@@ -157,15 +193,20 @@ def format_content(value):
         return "{}".format(value)
 
 
-def get_unitname_value_meta(key, value):
-    """Return header / value pair for tsv export of Indentation metadata"""
+def get_name_value_unit_meta(key, value):
+    """Return name, validated value, and SI unit of Indentation metadata"""
     name, unit, validator = meta.DEF_ALL[key]
     if isinstance(value, numbers.Number):
         if not np.isnan(value):
             value = validator(value)
     else:
         value = validator(value)
-    return get_unitname_value(name, value, unit)
+    return name, value, unit
+
+
+def get_unitname_value_meta(key, value):
+    """Return header / value pair for tsv export of Indentation metadata"""
+    return get_unitname_value(*get_name_value_unit_meta(key, value))
 
 
 def get_unitname_value(name, value, unit):
@@ -187,6 +228,26 @@ def set_odict_list_value(odict, label, size, index, value):
     odict[label][index] = value
 
 
+def set_odict_list_si_value(odict, column_units, size, index, name, value,
+                            unit):
+    """Set list-values in a dictionary, converting units later
+
+    Numeric values are stored in SI units. The name and SI unit of
+    columns that need conversion are stored in `column_units`, so
+    that each column can be converted at once with
+    :func:`pyjibe.units.si2hr_array`. The column labels are the
+    same as those of :func:`get_unitname_value`.
+    """
+    if isinstance(value, numbers.Number):
+        info = units.get_unit_info(name, unit)
+        label = info.label
+        if info.factor != 1:
+            column_units[label] = (name, unit)
+    else:
+        label = name
+    set_odict_list_value(odict, label, size, index, value)
+
+
 def transpose_list(m):
     height = len(m)
     width = len(m[0])
@@ -0,0 +1,190 @@
+"""Immutable snapshot of the fit settings
+
+The fit settings shown in :class:`pyjibe.fd.tab_fit.TabFit` are
+read from the widgets once (see `TabFit.get_fit_settings`) and
+stored in a :class:`FitSettings` instance. It is hashable (usable
+as a cache key), picklable (it can be sent to worker processes),
+and can be converted to the keyword arguments of
+:func:`nanite.Indentation.fit_model`.
+"""
+import dataclasses
+import json
+import threading
+import weakref
+
+import lmfit
+
+
+def params_to_tuple(params):
+    """Convert `lmfit.Parameters` to a hashable tuple"""
+    return tuple((p.name, p.value, p.vary, p.min, p.max, p.expr)
+                 for p in params.values())
+
+
+def tuple_to_params(items):
+    """Convert the output of :func:`params_to_tuple` to `lmfit.Parameters`"""
+    params = lmfit.Parameters()
+    for name, value, vary, pmin, pmax, expr in items:
+        params.add(name, value=value, vary=vary, min=pmin, max=pmax,
+                   expr=expr)
+    return params
+
+
+@dataclasses.dataclass(frozen=True)
+class FitSettings:
+    #: model key (see `nanite.model.models_available`)
+    model_key: str
+    #: initial parameters (see :func:`params_to_tuple`)
+    params_initial: tuple
+    #: fitting range [m]
+    range_x: tuple
+    #: "absolute" or "relative cp"
+    range_type: str
+    x_axis: str
+    y_axis: str
+    #: contact point weighting [m] or False
+    weight_cp: object
+    #: "approach" or "retract"
+    segment: str
+    optimal_fit_edelta: bool
+    optimal_fit_num_samples: int
+    #: geometrical correction factor
+    gcf_k: float
+    #: minimizer method (developer or expert mode)
+    method: str = None
+    #: sorted minimizer keyword arguments (developer or expert mode)
+    method_kws: tuple = None
+
+    @classmethod
+    def from_kwargs(cls, kwargs):
+        """Create an instance from keyword arguments for `fit_model`"""
+        kwargs = dict(kwargs)
+        kwargs["params_initial"] = params_to_tuple(kwargs["params_initial"])
+        kwargs["range_x"] = tuple(kwargs["range_x"])
+        if kwargs.get("method_kws") is not None:
+            kwargs["method_kws"] = tuple(sorted(kwargs["method_kws"].items()))
+        return cls(**kwargs)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Create an instance from the output of :func:`to_dict`"""
+        data = dict(data)
+        data["params_initial"] = tuple(tuple(p)
+                                       for p in data["params_initial"])
+        data["range_x"] = tuple(data["range_x"])
+        if data.get("method_kws") is not None:
+            data["method_kws"] = tuple(tuple(kv)
+                                       for kv in data["method_kws"])
+        return cls(**data)
+
+    def edelta_key(self):
+        """Return a cache key for the E(δ) curve
+
+        The E(δ) curve does not depend on the minimal indentation
+        depth (left fitting range).
+        """
+        return dataclasses.replace(self,
+                                   range_x=(None, self.range_x[1]),
+                                   optimal_fit_edelta=False)
+
+    def get_params(self):
+        """Return a new copy of the initial parameters"""
+        return tuple_to_params(self.params_initial)
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary"""
+        return json.loads(json.dumps(dataclasses.asdict(self)))
+
+    def to_kwargs(self):
+        """Return the keyword arguments for `Indentation.fit_model`"""
+        kwargs = {"model_key": self.model_key,
+                  "params_initial": self.get_params(),
+                  "range_x": list(self.range_x),
+                  "range_type": self.range_type,
+                  "x_axis": self.x_axis,
+                  "y_axis": self.y_axis,
+                  "weight_cp": self.weight_cp,
+                  "segment": self.segment,
+                  "optimal_fit_edelta": self.optimal_fit_edelta,
+                  "optimal_fit_num_samples": self.optimal_fit_num_samples,
+                  "gcf_k": self.gcf_k,
+                  }
+        if self.method is not None:
+            kwargs["method"] = self.method
+            kwargs["method_kws"] = dict(self.method_kws or ())
+        return kwargs
+
+    def with_params(self, params):
+        """Return a copy with different initial parameters"""
+        return dataclasses.replace(self,
+                                   params_initial=params_to_tuple(params))
+
+
+def get_fit_key(fdist, fit_settings, anc_checked=None):
+    """Return the settings `fdist` is fitted with (the fit cache key)
+
+    Parameters
+    ----------
+    fdist: nanite.Indentation
+        preprocessed curve
+    fit_settings: FitSettings
+        fit settings
+    anc_checked: list of bool or None
+        "use" states of the ancillary parameter table; if given,
+        the initial parameters are replaced by the ancillary
+        parameters of `fdist` like in the fit tab (see
+        :func:`pyjibe.fd.ancillaries.apply_to_initial_parameters`),
+        so that the key is the same as the one of the settings
+        shown for `fdist` in the fit tab
+    """
+    if anc_checked is None:
+        return fit_settings
+    from . import ancillaries  # circular import
+    params = fit_settings.get_params()
+    ancillaries.apply_to_initial_parameters(
+        fdist, fit_settings.model_key, params, anc_checked)
+    return fit_settings.with_params(params)
+
+
+#: fit settings and fit hash of the last fit of each curve
+_fit_cache = weakref.WeakKeyDictionary()
+_fit_cache_lock = threading.Lock()
+
+
+def get_cached_fit(fdist, key):
+    """Whether `fdist` was fitted with `key` and is still unchanged
+
+    Parameters
+    ----------
+    fdist: nanite.Indentation
+        the curve
+    key: hashable
+        cache key of the fit (e.g. a :class:`FitSettings` instance)
+    """
+    with _fit_cache_lock:
+        cached = _fit_cache.get(fdist)
+    fit_hash = fdist.fit_properties.get("hash")
+    # The hash is removed by nanite when the curve or its
+    # preprocessing changes.
+    return (cached is not None
+            and fit_hash is not None
+            and cached == (key, fit_hash))
+
+
+def get_cached_fit_key(fdist):
+    """Return the key `fdist` was fitted with (None if it changed)"""
+    with _fit_cache_lock:
+        cached = _fit_cache.get(fdist)
+    if cached is not None and get_cached_fit(fdist, cached[0]):
+        return cached[0]
+    return None
+
+
+def set_cached_fit(fdist, key):
+    """Remember that `fdist` was fitted with `key`"""
+    fit_hash = fdist.fit_properties.get("hash")
+    with _fit_cache_lock:
+        if fit_hash is None:
+            _fit_cache.pop(fdist, None)
+        else:
+            _fit_cache[fdist] = (key, fit_hash)
@@ -0,0 +1,116 @@
+"""Stages of the analysis of the current curve
+
+When a setting in the GUI changes, the current curve is analyzed
+again (see `UiForceDistance.on_params_init`). The analysis is split
+into the stages in :data:`STAGES`. Each stage has a key that contains
+the settings this stage depends on; a stage and all subsequent stages
+are only run if one of their keys changed. For instance, a different
+contact point weight does not require preprocessing, but a new fit
+and, if the fit result changed, a new plot.
+
+The fit stages are performed by `TabFit.fit_approach_retract`,
+which also skips fits with identical settings (see
+:mod:`pyjibe.fd.fit_settings`). The plot is only redrawn if the
+preprocessed data or the fit result of the curve changed.
+"""
+import json
+
+from .. import instrument
+
+
+#: analysis stages of a curve in processing order
+STAGES = ("preprocessing", "fit range", "weights", "optimization")
+
+
+def get_stage_keys(identifiers, options, fit_settings, anc_checked=None):
+    """Return the key of each stage
+
+    Parameters
+    ----------
+    identifiers: list of str
+        preprocessing identifiers
+    options: dict
+        preprocessing options
+    fit_settings: pyjibe.fd.fit_settings.FitSettings
+        fit settings
+    anc_checked: list of bool or None
+        "use" states of the ancillary parameter table
+
+    Returns
+    -------
+    keys: dict
+        hashable key for each stage in :data:`STAGES`
+    """
+    fs = fit_settings
+    return {
+        "preprocessing": json.dumps([identifiers, options], sort_keys=True,
+                                    default=str),
+        "fit range": (fs.x_axis, fs.y_axis, fs.segment, fs.range_x,
+                      fs.range_type, fs.optimal_fit_edelta,
+                      fs.optimal_fit_num_samples, fs.gcf_k),
+        "weights": fs.weight_cp,
+        "optimization": (fs.model_key, fs.params_initial, fs.method,
+                         fs.method_kws, tuple(anc_checked or ())),
+    }
+
+
+def get_display_key(fdist):
+    """Return the data of `fdist` that are shown in the plot"""
+    return (fdist,
+            fdist["tip position"],
+            fdist["fit"] if "fit" in fdist else None,
+            fdist.fit_properties.get("hash"))
+
+
+class StageTracker:
+    def __init__(self):
+        """Keep track of the stages of the current curve"""
+        #: curve and stage keys of the last analysis
+        self._keys = None
+        #: display key of the last plot
+        self._display = None
+
+    def get_invalid_stages(self, fdist, keys):
+        """Return the stages that have to be run (in processing order)
+
+        All stages are invalid for a curve other than the one
+        of the last call to :func:`StageTracker.set_keys`.
+        """
+        if self._keys is None or self._keys[0] is not fdist:
+            return STAGES
+        for ii, stage in enumerate(STAGES):
+            if self._keys[1][stage] != keys[stage]:
+                return STAGES[ii:]
+        return ()
+
+    def invalidate(self):
+        """Run all stages and redraw the plot the next time"""
+        self._keys = None
+        self._display = None
+
+    def is_displayed(self, fdist):
+        """Whether the plot shows the current data of `fdist`"""
+        if self._display is None:
+            return False
+        shown = self._display
+        current = get_display_key(fdist)
+        # compare the curve and the arrays by identity
+        return (all(aa is bb for aa, bb in zip(shown[:3], current[:3]))
+                and shown[3] == current[3])
+
+    def set_displayed(self, fdist):
+        """Remember that the plot shows the current data of `fdist`"""
+        self._display = get_display_key(fdist)
+
+    def set_keys(self, fdist, keys):
+        """Remember the stage keys after analyzing `fdist`"""
+        self._keys = (fdist, dict(keys))
+
+    @staticmethod
+    def timing(stages):
+        """Record the duration of running `stages`
+
+        The duration is recorded for the first stage (e.g.
+        "stage weights" if only the fit has to be repeated).
+        """
+        return instrument.timing("stage {}".format(stages[0]))
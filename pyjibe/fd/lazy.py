@@ -0,0 +1,136 @@
+"""Lazy materialization of curve data
+
+In lazy-open mode, only the metadata of a curve (path, enum, QMap
+position) are required to populate the curve list. The data columns
+of a curve are parsed on first access or by a background
+:class:`CurveMaterializer`.
+"""
+import concurrent.futures
+import threading
+import weakref
+
+from afmformats.afm_segment import AFMSegment
+import numpy as np
+
+from ..head.scheduler import ComputeScheduler
+
+
+class LazyColumns:
+    def __init__(self, raw_data, lock):
+        """Dictionary of raw data columns that are parsed on first access
+
+        Parameters
+        ----------
+        raw_data: dict-like
+            the original raw data of the curve as returned by the
+            afmformats loader (e.g. :class:`afmformats.LazyData`)
+        lock: threading.Lock
+            lock shared by all curves of a file, so that the file is
+            not read concurrently by the GUI and a background thread
+        """
+        self._raw_data = raw_data
+        self._columns = {}
+        self._lock = lock
+
+    def __contains__(self, key):
+        return key in self._raw_data
+
+    def __getitem__(self, key):
+        if key not in self._columns:
+            with self._lock:
+                if key not in self._columns:
+                    self._columns[key] = np.asarray(self._raw_data[key])
+        return self._columns[key]
+
+    def __iter__(self):
+        for key in self._raw_data:
+            yield key
+
+    def keys(self):
+        return self._raw_data.keys()
+
+    @property
+    def materialized(self):
+        """Whether all columns have been parsed"""
+        return len(self._columns) == len(list(self.keys()))
+
+    def materialize(self):
+        """Parse all columns"""
+        for key in self.keys():
+            self[key]
+
+
+class CurveMaterializer:
+    def __init__(self, curves, scheduler=None, owner=None):
+        """Parse the data of curves in the background
+
+        Parameters
+        ----------
+        curves: list of nanite.Indentation
+            curves to materialize, in the order given
+        scheduler: pyjibe.head.scheduler.ComputeScheduler
+            scheduler to which one job per curve is submitted;
+            if None, a scheduler with one worker is created
+        owner: object
+            owner of the jobs (see `ComputeScheduler.submit`)
+        """
+        self.curves = list(curves)
+        if scheduler is None:
+            scheduler = ComputeScheduler(max_workers=1)
+        self.scheduler = scheduler
+        # weak reference, because the owner (the GUI) usually
+        # holds a reference to this object
+        self._owner = weakref.ref(self if owner is None else owner)
+        self._stop = threading.Event()
+        self._futures = []
+
+    def run(self, fdist):
+        if not self._stop.is_set():
+            materialize(fdist)
+
+    def start(self):
+        self._futures = [self.scheduler.submit(self._owner(), self.run, fdist)
+                         for fdist in self.curves]
+
+    def stop(self):
+        """Stop materialization after the current curves"""
+        self._stop.set()
+        for future in self._futures:
+            future.cancel()
+
+    def wait(self, timeout=None):
+        _, not_done = concurrent.futures.wait(self._futures, timeout)
+        return not not_done
+
+
+def replace_raw_data(fdist, raw_data):
+    """Replace the raw data of a curve and of its segments
+
+    The segments of a curve (e.g. `fdist.appr` and `fdist.retr`)
+    hold their own reference to the raw data of the curve, which
+    is replaced as well.
+    """
+    old = fdist._raw_data
+    for segment in vars(fdist).values():
+        if isinstance(segment, AFMSegment) and segment._raw_data is old:
+            segment._raw_data = raw_data
+    fdist._raw_data = raw_data
+
+
+def is_lazy(fdist):
+    """Whether the data of a curve are lazily materialized"""
+    return isinstance(fdist._raw_data, LazyColumns)
+
+
+def materialize(fdist):
+    """Parse all data columns of a lazily-opened curve"""
+    if is_lazy(fdist):
+        fdist._raw_data.materialize()
+
+
+def wrap_group(group):
+    """Defer parsing of the data of all curves in `group`"""
+    lock = threading.Lock()
+    for fdist in group:
+        if not is_lazy(fdist):
+            replace_raw_data(fdist, LazyColumns(fdist._raw_data, lock))
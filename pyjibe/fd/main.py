@@ -1,5 +1,6 @@
+import concurrent.futures
+import functools
 import hashlib
-import importlib.resources
 import io
 import logging
 import os
@@ -11,24 +12,49 @@ import afmformats.errors
 import nanite
 import nanite.fit as nfit
 import numpy as np
-from PyQt6 import uic, QtCore, QtGui, QtWidgets
+from PyQt6 import QtCore, QtGui, QtWidgets
 
 from .. import colormap
 from ..head.custom_widgets import show_wait_cursor
+from ..head.scheduler import ComputeScheduler
+from .. import instrument
+from ..settings import get_settings
+from .. import uicache
 from .. import units
 
+from . import autosave_journal
+from . import batch_fit
+from . import curve_id
 from . import dlg_export_vals
+from . import edelta_search
 from . import export
+from . import fit_stages
+from . import lazy
+from . import prefetch
 from . import rating_base
 from . import rating_iface
+from . import scratch
+from . import session as fd_session
+from .fit_settings import FitSettings
+from .warm_start import WarmStart
 
 
 logger = logging.getLogger(__name__)
 
-# load QWidget from ui file
-dlg_ref = importlib.resources.files("pyjibe.fd") / "dlg_autosave_design.ui"
-with importlib.resources.as_file(dlg_ref) as dlg_autosave_path:
-    DlgAutosave = uic.loadUiType(dlg_autosave_path)[0]
+#: number of curves processed per job when fitting in batches
+BATCH_JOB_SIZE = 64
+
+
+class DlgAutosave:
+    """Autosave dialog form
+
+    The ui file is only loaded when the dialog is shown for
+    the first time.
+    """
+    def __new__(cls):
+        form_class = uicache.get_form_class("pyjibe.fd",
+                                            "dlg_autosave_design.ui")
+        return form_class()
 
 
 class UiForceDistance(QtWidgets.QWidget):
@@ -37,14 +63,19 @@ class UiForceDistance(QtWidgets.QWidget):
     # but do not persist it across restarts.
     _autosave_override_session = -1
 
-    def __init__(self, *args, **kwargs):
-        """Base class for force-indentation analysis"""
+    def __init__(self, *args, scheduler=None, **kwargs):
+        """Base class for force-indentation analysis
+
+        Parameters
+        ----------
+        scheduler: pyjibe.head.scheduler.ComputeScheduler
+            application-wide scheduler for background jobs; if None,
+            a scheduler with one worker is created for this instance
+        """
         super(UiForceDistance, self).__init__(*args, **kwargs)
-        ref = importlib.resources.files("pyjibe.fd") / "main.ui"
-        with importlib.resources.as_file(ref) as path_ui:
-            uic.loadUi(path_ui, self)
+        uicache.setup_ui(self, "pyjibe.fd", "main.ui")
 
-        self.settings = QtCore.QSettings()
+        self.settings = get_settings()
         if not self.settings.value("force-distance/rate ts path", ""):
             dataloc = pathlib.Path(QtCore.QStandardPaths.writableLocation(
                 QtCore.QStandardPaths.StandardLocation.AppDataLocation))
@@ -57,6 +88,16 @@ class UiForceDistance(QtWidgets.QWidget):
         self.parent().setWindowTitle(title)
 
         self.data_set = nanite.IndentationGroup()
+        #: Scheduler for background jobs (shared by all subwindows)
+        self.scheduler = scheduler or ComputeScheduler(max_workers=1)
+        # Background processing of the neighbours of the current curve
+        self.prefetcher = prefetch.NeighbourPrefetcher(
+            scheduler=self.scheduler, owner=self)
+        #: statistics of the last warm-started "fit all"
+        #: (see :class:`pyjibe.fd.warm_start.WarmStartReport`)
+        self.warm_start_report = None
+        #: stages of the analysis of the current curve
+        self.fit_stages = fit_stages.StageTracker()
 
         # rating scheme
         self.rating_scheme_setup()
@@ -76,6 +117,8 @@ class UiForceDistance(QtWidgets.QWidget):
             self.tab_edelta.on_delta_change_spin)
         self.tab_fit.sp_range_1.valueChanged.connect(self.on_params_init)
         self.tab_fit.sp_range_2.valueChanged.connect(self.on_params_init)
+        self.tab_preprocess.cb_preproc_presel.currentIndexChanged.connect(
+            self.prefetcher.cancel)
 
         # rating
         self.btn_rating_filter.clicked.connect(self.on_rating_threshold)
@@ -107,7 +150,16 @@ class UiForceDistance(QtWidgets.QWidget):
         self._autosave_override = UiForceDistance._autosave_override_session
         # Filenames that were created by this instance
         self._autosave_original_files = []
+        # Journal of the autosaved results file of each directory
+        self._autosave_journals = {}
+        # Row in the curve list of each curve
+        self._curve_rows = {}
+        # Curve identifiers of the data set (see `curve_id`)
+        self._curve_ids_taken = set()
+        # Background parsing of curve data in lazy-open mode
+        self._materializer = None
 
+    @instrument.timed("load_file")
     def load_file(self, path, callback, user_metadata):
         """Load a data file, optionally asking for missing metadata
 
@@ -158,6 +210,13 @@ class UiForceDistance(QtWidgets.QWidget):
             grp = nanite.IndentationGroup(path,
                                           callback=callback,
                                           meta_override=custom_metadata)
+        if int(self.settings.value("advanced/scratch store", 0)):
+            # move the raw data to the session-wide HDF5 scratch file
+            scratch.get_session_store().attach(grp)
+        elif int(self.settings.value("advanced/lazy open", 0)):
+            # parse curve data on first access
+            lazy.wrap_group(grp)
+        curve_id.assign_curve_ids(grp, taken=self._curve_ids_taken)
         return grp
 
     @property
@@ -178,28 +237,38 @@ class UiForceDistance(QtWidgets.QWidget):
     def selected_curves(self):
         """IndentationGroup with all curves selected by the user"""
         curves = nanite.IndentationGroup()
-        for ar in self.data_set:
-            idx = self.data_set.index(ar)
+        for idx, ar in enumerate(self.data_set):
             item = self.list_curves.topLevelItem(idx)
             if item.checkState(3) == QtCore.Qt.CheckState.Checked:
                 curves.append(ar)
         return curves
 
-    def add_files(self, files):
+    def add_files(self, files, session=None):
         """Populate self.data_set and display the first curve
 
         Parameters
         ----------
-        files: list of pathlib.Path
-            List of experimental data files
+        files: list or iterable of pathlib.Path
+            Experimental data files; if an iterable without length
+            is given (e.g. from :func:`pyjibe.discovery.iter_data_files`),
+            the files are loaded while they are discovered.
+        session: pyjibe.fd.session.Session
+            If given, the settings and the analysis state of the
+            curves are restored from this session before the first
+            curve is displayed (see :func:`restore_session`).
         """
         # The `mult` parameter is used to chunk the progress bar,
         # because we cannot use floats with `QProgressDialog`, but
         # we want to be able to show progress for files that contain
         # multiple force curves.
         mult = 100
-        bar = QtWidgets.QProgressDialog("Loading data files...",
-                                        "Stop", 1, len(files)*mult)
+        if hasattr(files, "__len__"):
+            bar = QtWidgets.QProgressDialog("Loading data files...",
+                                            "Stop", 1, len(files)*mult)
+        else:
+            # unknown number of files (busy indicator)
+            bar = QtWidgets.QProgressDialog("Loading data files...",
+                                            "Stop", 0, 0)
         bar.setWindowTitle("Loading data files")
         bar.setMinimumDuration(1000)
         user_metadata = {}
@@ -217,7 +286,8 @@ class UiForceDistance(QtWidgets.QWidget):
                 partial: float in [0,1]
                     The progress for a single file
                 """
-                bar.setValue(int((ii+partial)*mult))
+                if bar.maximum():
+                    bar.setValue(int((ii+partial)*mult))
                 QtCore.QCoreApplication.instance().processEvents(
                     QtCore.QEventLoop.ProcessEventsFlag.AllEvents, 300)
                 if bar.wasCanceled():
@@ -236,20 +306,54 @@ class UiForceDistance(QtWidgets.QWidget):
                 self.data_set += grp
         bar.reset()
         bar.close()
+        self.prefetcher.forget_grids()
         self.curve_list_setup()
+        if session is not None:
+            self.restore_session(session)
         # Select first item
         it = self.list_curves.topLevelItem(0)
         self.list_curves.setCurrentItem(it)
+        # Parse the data of lazily-opened curves in the background
+        pending = [fdist for fdist in self.data_set if lazy.is_lazy(fdist)]
+        if pending:
+            if self._materializer is not None:
+                self._materializer.stop()
+            self._materializer = lazy.CurveMaterializer(
+                pending, scheduler=self.scheduler, owner=self)
+            self._materializer.start()
 
+    @instrument.timed("autosave")
     def autosave(self, fdist):
-        """Performs autosaving for all files"""
-        if (self.cb_autosave.checkState() == QtCore.Qt.CheckState.Checked
-                and fdist.fit_properties.get("success", False)):
-            # Determine the directory of the current curve
-            adir = os.path.dirname(fdist.path)
+        """Performs autosaving for all files
+
+        The results file of a directory is written once with all
+        curves and afterwards, the results of each curve are appended
+        to its journal (see :mod:`pyjibe.fd.autosave_journal`), which
+        is compacted into the results file when the analysis is closed.
+        """
+        if self.cb_autosave.checkState() != QtCore.Qt.CheckState.Checked:
+            return
+        adir = os.path.dirname(fdist.path)
+        journal = self._autosave_journals.get(adir)
+        success = fdist.fit_properties.get("success", False)
+        if journal is not None and (
+                not success
+                or fdist.fit_properties["model_key"] == journal.model_key):
+            row = self._curve_rows[fdist]
+            it = self.list_curves.topLevelItem(row)
+            use = (success
+                   and it.checkState(3) == QtCore.Qt.CheckState.Checked)
+            journal.append(fdist, index=row, use=use)
+        elif success:
+            if journal is not None:
+                # The results file only contains curves of one model.
+                self._autosave_journals.pop(adir).close()
+            # results of a previous analysis that was not closed properly
+            autosave_journal.recover_journals(adir)
             model_key = fdist.fit_properties["model_key"]
             # Determine all other curves with the same path
             exp_curv = []
+            exp_rows = []
             for ii, ar in enumerate(self.data_set):
                 it = self.list_curves.topLevelItem(ii)
                 if (
@@ -265,6 +369,7 @@ class UiForceDistance(QtWidgets.QWidget):
                     it.checkState(3) == QtCore.Qt.CheckState.Checked
                 ):
                     exp_curv.append(ar)
+                    exp_rows.append(ii)
             # The file to export
             fname = os.path.join(adir, "pyjibe_fit_results_leaf.tsv")
 
@@ -309,11 +414,21 @@ class UiForceDistance(QtWidgets.QWidget):
                         )
                         fname = os.path.join(adir, newbase)
                 # Export data
-                which = ["params_fitted", "params_ancillary", "rating"]
+                which = autosave_journal.AUTOSAVE_CHOICES
                 export.save_tsv_metadata_results(filename=fname,
                                                  fdist_list=exp_curv,
                                                  which=which)
                 self._autosave_original_files.append(fname)
+                self._autosave_journals[adir] = \
+                    autosave_journal.AutosaveJournal(fname,
+                                                     model_key=model_key,
+                                                     curves=exp_curv,
+                                                     indices=exp_rows)
+
+    def autosave_compact(self):
+        """Write the autosaved results files from their journals"""
+        for journal in self._autosave_journals.values():
+            journal.compact()
 
     def curve_list_setup(self):
         """Add items to the tree widget"""
@@ -324,7 +439,8 @@ class UiForceDistance(QtWidgets.QWidget):
         self.list_curves.setColumnWidth(1, 70)
         self.list_curves.setColumnWidth(2, 70)
         self.list_curves.setColumnWidth(3, 40)
-        for ar in self.data_set:
+        for ii, ar in enumerate(self.data_set):
+            self._curve_rows[ar] = ii
             it = QtWidgets.QTreeWidgetItem(self.list_curves,
                                            ["..."+str(ar.path)[-62:],
                                             str(ar.enum),
@@ -364,16 +480,83 @@ class UiForceDistance(QtWidgets.QWidget):
              ]
         """
         choices = [["metadata and results", "on_export_fit_results"],
-                   ["E(δ) curves", "on_export_edelta"]
+                   ["E(δ) curves", "on_export_edelta"],
+                   ["session", "on_save_session"],
+                   ["autosaved results (compact)", "on_autosave_compact"],
                    ]
         return choices
 
+    def finish(self):
+        """Called before the analysis is closed
+
+        The autosave journals are compacted into the results files.
+        """
+        for journal in self._autosave_journals.values():
+            journal.close()
+        self._autosave_journals.clear()
+
+    def get_process_job(self, anc_checked=None, fit_settings=None,
+                        warm_start=None, batch=False):
+        """Return a job that processes a curve with the current settings
+
+        The job can be run in a background thread, see
+        :func:`pyjibe.fd.prefetch.process_curve`. If `batch` is
+        True, the job processes a list of curves instead, see
+        :func:`pyjibe.fd.prefetch.process_curves`.
+        """
+        identifiers, options = self.tab_preprocess.current_preprocessing()
+        rate_ts_path = self.settings.value("force-distance/rate ts path", "")
+        if fit_settings is None:
+            fit_settings = self.tab_fit.get_fit_settings()
+        kwargs = dict(
+            preprocessing=identifiers,
+            options=options,
+            fit_settings=fit_settings,
+            rating=(self.cb_rating_scheme.currentIndex(), rate_ts_path))
+        if batch:
+            return functools.partial(prefetch.process_curves, **kwargs)
+        return functools.partial(prefetch.process_curve,
+                                 anc_checked=anc_checked,
+                                 warm_start=warm_start,
+                                 **kwargs)
+
+    def get_session_settings(self):
+        """Return the GUI settings stored in session files"""
+        identifiers, options = self.tab_preprocess.current_preprocessing()
+        self.tab_fit.on_update_weights(on_params_init=False)
+        tab_fit = self.tab_fit
+        return {
+            "preprocessing": identifiers,
+            "preprocessing_options": options,
+            "fit_settings": tab_fit.get_fit_settings().to_dict(),
+            "delta_select": tab_fit.cb_delta_select.currentIndex(),
+            "indentation_depth_individual":
+                tab_fit._indentation_depth_individual,
+            "rating_scheme": self.cb_rating_scheme.currentText(),
+        }
+
+    def get_stage_keys(self):
+        """Return the keys of the analysis stages of the current settings
+
+        See :func:`pyjibe.fd.fit_stages.get_stage_keys`.
+        """
+        identifiers, options = self.tab_preprocess.current_preprocessing()
+        return fit_stages.get_stage_keys(
+            identifiers, options, self.tab_fit.get_fit_settings(),
+            anc_checked=self.tab_fit.anc_check_states())
+
     def info_update(self, fdist=None):
         """Updates the info tab"""
         if fdist is None:
             fdist = self.current_curve
         self.tab_info.update_info(fdist)
 
+    @QtCore.pyqtSlot()
+    @show_wait_cursor
+    def on_autosave_compact(self):
+        """Update the autosaved results files"""
+        self.autosave_compact()
+
     @QtCore.pyqtSlot()
     def on_cb_rating_scheme(self):
         """Switch rating scheme or import a new one"""
@@ -402,6 +585,9 @@ class UiForceDistance(QtWidgets.QWidget):
         """Called when a new curve is selected"""
         fdist = self.current_curve
         idx = self.current_index
+        self.fit_stages.invalidate()
+        # make sure the curve is not processed in the background
+        self.prefetcher.claim(fdist)
         # perform preprocessing
         self.tab_preprocess.apply_preprocessing(fdist)
         # update user interface with initial parameters
@@ -420,6 +606,8 @@ class UiForceDistance(QtWidgets.QWidget):
         self.tab_edelta.mpl_edelta_update()
         # Autosave
         self.autosave(fdist)
+        # Process the neighbouring curves in the background
+        self.prefetch_neighbours()
 
     @QtCore.pyqtSlot(QtCore.QModelIndex)
     @show_wait_cursor
@@ -466,7 +654,7 @@ class UiForceDistance(QtWidgets.QWidget):
                 # - Use the callback method in `compute_emodulus_mindelta`
                 #   to prevent "freezing" of the GUI?
                 try:
-                    e, d = ar.compute_emodulus_mindelta()
+                    e, d = edelta_search.compute_emodulus_mindelta(ar)
                 except nfit.FitDataError:
                     pass
                 else:
@@ -491,7 +679,8 @@ class UiForceDistance(QtWidgets.QWidget):
         fdist_list = [fdist for fdist in self.selected_curves]
         dlg = dlg_export_vals.ExportDialog(parent=self,
                                            fdist_list=fdist_list,
-                                           identifier=self._instance_counter)
+                                           identifier=self._instance_counter,
+                                           scheduler=self.scheduler)
         dlg.show()
 
     @QtCore.pyqtSlot()
@@ -504,16 +693,60 @@ class UiForceDistance(QtWidgets.QWidget):
         bar.setWindowTitle("Loading data files")
         bar.setMinimumDuration(1000)
         errored = []
+        futures = {}
+        warm_start = None
+        self.fit_stages.invalidate()
+        # The settings are read from the GUI only once.
+        self.tab_fit.on_update_weights(on_params_init=False)
+        fit_settings = self.tab_fit.get_fit_settings()
+        if self.tab_fit.cb_delta_select.currentIndex() == 0:
+            # The curves are fitted with identical settings, so they can
+            # be processed by the workers of the scheduler in advance.
+            # The loop below then only picks up the (cached) results.
+            self.prefetcher.cancel()
+            self.prefetcher.wait()
+            order = self.data_set
+            if (int(self.settings.value("advanced/batch fit", 0))
+                    and batch_fit.is_supported(fit_settings)):
+                # Fit chunks of curves with the vectorized engine.
+                job = self.get_process_job(fit_settings=fit_settings,
+                                           batch=True)
+                for start in range(0, len(self.data_set), BATCH_JOB_SIZE):
+                    chunk = self.data_set[start:start + BATCH_JOB_SIZE]
+                    for fdist in chunk:
+                        self.prefetcher.claim(fdist)
+                    future = self.scheduler.submit(self, job, chunk)
+                    for fdist in chunk:
+                        futures[fdist] = future
+                # no jobs for single curves
+                order = []
+            elif int(self.settings.value("advanced/warm start", 0)):
+                warm_start = WarmStart(self.data_set)
+                if warm_start.num_grid_curves:
+                    order = warm_start.get_fit_order()
+                else:
+                    # not a QMap
+                    warm_start = None
+            job = self.get_process_job(fit_settings=fit_settings,
+                                       warm_start=warm_start)
+            for fdist in order:
+                self.prefetcher.claim(fdist)
+                futures[fdist] = self.scheduler.submit(self, job, fdist)
         for ii, fdist in enumerate(self.data_set):
             QtCore.QCoreApplication.instance().processEvents(
                 QtCore.QEventLoop.ProcessEventsFlag.AllEvents, 300)
             if bar.wasCanceled():
                 break
+            if fdist in futures:
+                # errors are reproduced and reported below
+                concurrent.futures.wait([futures.pop(fdist)])
             try:
+                self.prefetcher.claim(fdist)
                 # preprocessing could fail for bad data
                 self.tab_preprocess.apply_preprocessing(fdist)
                 # external fitting model could fail
-                self.tab_fit.fit_approach_retract(fdist, update_ui=False)
+                self.tab_fit.fit_approach_retract(fdist, update_ui=False,
+                                                  fit_settings=fit_settings)
             except BaseException as e:
                 logger.error(traceback.format_exc())
                 errored.append([fdist.path, e.__class__.__name__, e.args])
@@ -527,6 +760,25 @@ class UiForceDistance(QtWidgets.QWidget):
 
             bar.setValue(ii+1)
 
+        if futures:
+            # the user canceled, discard the remaining results
+            for future in futures.values():
+                future.cancel()
+            concurrent.futures.wait(futures.values())
+            for ii, fdist in enumerate(self.data_set):
+                future = futures.get(fdist)
+                if future is not None and not future.cancelled():
+                    prefetch.invalidate(fdist)
+                    self.curve_list_update(item=ii)
+
+        if warm_start is not None:
+            self.warm_start_report = warm_start.report
+            summary = warm_start.report.summary()
+            logger.info(summary)
+            window = self.window()
+            if isinstance(window, QtWidgets.QMainWindow):
+                window.statusBar().showMessage(summary)
+
         # display qmap
         self.tab_qmap.mpl_qmap_update()
         if errored:
@@ -546,6 +798,10 @@ class UiForceDistance(QtWidgets.QWidget):
         # The difference to "on_params_init" is that we
         # have to `fit_update_parameters` in order to display
         # potential new parameter names of the new model.
+        # All curves are rated below, wait for the prefetcher.
+        self.prefetcher.cancel()
+        self.prefetcher.wait()
+        self.fit_stages.invalidate()
         fdist = self.current_curve
         self.tab_preprocess.apply_preprocessing(fdist)
         self.tab_fit.fit_update_parameters(fdist)
@@ -561,15 +817,34 @@ class UiForceDistance(QtWidgets.QWidget):
 
     @QtCore.pyqtSlot()
     def on_params_init(self):
-        """Called when the initial parameters are changed"""
+        """Called when the initial parameters are changed
+
+        Only the stages of the analysis that depend on changed
+        settings are run (see :mod:`pyjibe.fd.fit_stages`).
+        """
+        self.prefetcher.cancel()
         fdist = self.current_curve
         idx = self.current_index
-        self.tab_preprocess.apply_preprocessing(fdist)
-        self.tab_fit.anc_update_parameters(fdist)
-        self.tab_fit.fit_approach_retract(fdist)
-        self.widget_plot_fd.mpl_curve_update(fdist)
-        self.curve_list_update(item=idx)
-        self.tab_qmap.mpl_qmap_update()
+        # µm and % of the contact point weight
+        self.tab_fit.on_update_weights(on_params_init=False)
+        stages = self.fit_stages.get_invalid_stages(fdist,
+                                                    self.get_stage_keys())
+        if stages:
+            with self.fit_stages.timing(stages):
+                if "preprocessing" in stages:
+                    self.tab_preprocess.apply_preprocessing(fdist)
+                if stages[0] in ["preprocessing", "optimization"]:
+                    # The ancillary parameters depend on the
+                    # preprocessing, the model and the initial parameters.
+                    self.tab_fit.anc_update_parameters(fdist)
+                self.tab_fit.fit_approach_retract(fdist)
+            # (ancillary parameters may change the initial parameters)
+            self.fit_stages.set_keys(fdist, self.get_stage_keys())
+        if not self.fit_stages.is_displayed(fdist):
+            with instrument.timing("stage display"):
+                self.widget_plot_fd.mpl_curve_update(fdist)
+                self.curve_list_update(item=idx)
+                self.tab_qmap.mpl_qmap_update()
 
     @QtCore.pyqtSlot()
     @show_wait_cursor
@@ -592,6 +867,21 @@ class UiForceDistance(QtWidgets.QWidget):
         for fdist in self.data_set:
             self.autosave(fdist)
 
+    @QtCore.pyqtSlot()
+    def on_save_session(self):
+        """Save the analysis session to a file"""
+        suffix = fd_session.SESSION_SUFFIX
+        fname, _e = QtWidgets.QFileDialog.getSaveFileName(
+            self.parent(),
+            "Save session",
+            "",
+            "PyJibe session (*{})".format(suffix)
+        )
+        if fname:
+            if not fname.endswith(suffix):
+                fname += suffix
+            self.save_session(fname)
+
     @QtCore.pyqtSlot()
     @show_wait_cursor
     def on_tab_changed(self):
@@ -644,6 +934,20 @@ class UiForceDistance(QtWidgets.QWidget):
             self.curve_rater = rt
             rt.show()
 
+    def prefetch_neighbours(self):
+        """Process the neighbours of the current curve in the background
+
+        The settings currently shown in the GUI are used. If the
+        indentation depth is set individually for each curve, the
+        neighbours are not processed.
+        """
+        if self.tab_fit.cb_delta_select.currentIndex() == 1:
+            return
+        job = self.get_process_job(
+            anc_checked=self.tab_fit.anc_check_states())
+        self.prefetcher.prefetch(self.data_set, self.current_index, job)
+
+    @instrument.timed("rate_data")
     def rate_data(self, data):
         """Apply rating to a force-distance curves (or a list of curves)"""
         rate_ts_path = self.settings.value("force-distance/rate ts path", "")
@@ -659,6 +963,69 @@ class UiForceDistance(QtWidgets.QWidget):
         self.cb_rating_scheme.addItems(list(schemes.keys()))
         self.cb_rating_scheme.addItem("Add...")
 
+    def restore_session(self, session):
+        """Restore settings and curve states from a session
+
+        The curves are assigned their stored state by identifier
+        (see :func:`pyjibe.fd.session.restore_curve`); they are
+        neither preprocessed nor fitted. Curves of the session that
+        are not in `self.data_set` are ignored.
+        """
+        settings = session.settings
+        self.tab_preprocess.set_preprocessing(
+            settings["preprocessing"],
+            options=settings["preprocessing_options"],
+            apply=False)
+        self.tab_fit.set_fit_settings(
+            FitSettings.from_dict(settings["fit_settings"]),
+            delta_select=settings["delta_select"])
+        self.tab_fit._indentation_depth_individual.update(
+            settings["indentation_depth_individual"])
+        scheme_idx = self.cb_rating_scheme.findText(settings["rating_scheme"])
+        if scheme_idx >= 0:
+            self.cb_rating_scheme.blockSignals(True)
+            self.cb_rating_scheme.setCurrentIndex(scheme_idx)
+            self.cb_rating_scheme.blockSignals(False)
+        stored = dict(zip(session.curve_ids,
+                          zip(session.use, session.states)))
+        self.list_curves.blockSignals(True)
+        self.list_curves.model().blockSignals(True)
+        try:
+            for ii, fdist in enumerate(self.data_set):
+                entry = stored.get(curve_id.get_curve_id(fdist))
+                if entry is None:
+                    continue
+                use, state = entry
+                it = self.list_curves.topLevelItem(ii)
+                if not use:
+                    it.setCheckState(3, QtCore.Qt.CheckState.Unchecked)
+                if state is not None:
+                    fd_session.restore_curve(fdist, state)
+                    if fdist._rating is not None and scheme_idx >= 0:
+                        # (cached rating)
+                        self.curve_list_update(item=ii)
+        finally:
+            self.list_curves.model().blockSignals(False)
+            self.list_curves.blockSignals(False)
+        self.fit_stages.invalidate()
+
+    def save_session(self, path):
+        """Save the analysis session to an HDF5 file
+
+        See :mod:`pyjibe.fd.session`.
+        """
+        use = [self.list_curves.topLevelItem(ii).checkState(3)
+               == QtCore.Qt.CheckState.Checked
+               for ii in range(len(self.data_set))]
+        # the curves must not change while they are saved
+        self.prefetcher.wait()
+        fd_session.save_session(path,
+                                data_set=self.data_set,
+                                use=use,
+                                settings=self.get_session_settings(),
+                                scheduler=self.scheduler,
+                                owner=self)
+
 
 class AbortProgress(BaseException):
     pass
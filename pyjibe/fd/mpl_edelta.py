@@ -12,6 +12,8 @@ from PyQt6 import QtCore
 
 from .. import units
 from ..head import custom_widgets
+from . import curve_id
+from . import edelta_search
 
 
 class MPLEDelta(object):
@@ -61,7 +63,7 @@ class MPLEDelta(object):
         with io.open(filename, "ab") as fd:
             np.savetxt(fd, self.plot_data, delimiter="\t")
 
-    def update(self, fdist, delta_opt=None):
+    def update(self, fdist, delta_opt=None, cache_key=None):
         """Update the map tab plot data
 
         Parameters
@@ -70,25 +72,35 @@ class MPLEDelta(object):
             Approach-Retract data set
         delta_opt: float
             Optimal indentation depth
+        cache_key: hashable
+            If given, the E(delta) data are cached for this key
+            (see :func:`pyjibe.fd.edelta_search.get_edelta_key`)
         """
         # TODO:
         # - use Python threading instead of this lambda method?
         self._update_in_progress_active = fdist
-        if fdist in self._update_in_progress_locks:
+        cid = curve_id.get_curve_id(fdist)
+        cached = None
+        if cache_key is not None:
+            cached = edelta_search.get_cached_edelta(fdist, cache_key)
+        if cached is not None:
+            self.update_plot(cached[0], cached[1], delta_opt, fdist=fdist)
+        elif cid in self._update_in_progress_locks:
             QApplication.instance().processEvents(
                 QtCore.QEventLoop.ProcessEventsFlag.AllEvents, 300)
         else:
-            self._update_in_progress_locks[fdist] = True
+            self._update_in_progress_locks[cid] = True
             def cbfdist(e, d): return self.update_plot(e, d, fdist=fdist)
             try:
-                emod, delta = fdist.compute_emodulus_mindelta(callback=cbfdist)
+                emod, delta = edelta_search.compute_emodulus_mindelta(
+                    fdist, callback=cbfdist, key=cache_key)
             except nfit.FitDataError:
                 # Could not generate E(d) plot due to weird data
                 self.hide_plot(True)
                 self.canvas.draw()
             else:
                 self.update_plot(emod, delta, delta_opt, fdist=fdist)
-            self._update_in_progress_locks.pop(fdist)
+            self._update_in_progress_locks.pop(cid)
 
     def update_delta(self, delta):
         """Updates the vertical line for indentation depth"""
@@ -0,0 +1,314 @@
+"""Background preprocessing and fitting of neighbouring curves
+
+While the user inspects a curve, the curves next to it in the curve
+list and in the QMap grid are preprocessed, fitted and rated with the
+current settings in background threads. When the user selects one
+of these curves, nanite recognizes the identical fit keyword arguments
+and does not fit again.
+"""
+import concurrent.futures
+import logging
+import threading
+import weakref
+import traceback
+
+from ..head.scheduler import ComputeScheduler
+from . import ancillaries
+from . import batch_fit
+from . import edelta_search
+from .fit_settings import get_cached_fit, get_fit_key, set_cached_fit
+from . import rating_base
+from . import session
+
+
+logger = logging.getLogger(__name__)
+
+
+class NeighbourPrefetcher:
+    def __init__(self, scheduler=None, owner=None, num_neighbours=2):
+        """Process the neighbours of the current curve in the background
+
+        Parameters
+        ----------
+        scheduler: pyjibe.head.scheduler.ComputeScheduler
+            scheduler to which one job per neighbour is submitted;
+            if None, a scheduler with one worker is created
+        owner: object
+            owner of the jobs (see `ComputeScheduler.submit`)
+        num_neighbours: int
+            number of curves before and after the current curve in
+            the curve list and size of the neighbourhood in the
+            QMap grid that are processed
+        """
+        self.num_neighbours = num_neighbours
+        if scheduler is None:
+            scheduler = ComputeScheduler(max_workers=1)
+        self.scheduler = scheduler
+        # weak reference, because the owner (the GUI) usually
+        # holds a reference to this object
+        self._owner = weakref.ref(self if owner is None else owner)
+        self._lock = threading.Lock()
+        #: notified when a curve is done
+        self._condition = threading.Condition(self._lock)
+        #: incremented when the settings change
+        self._generation = 0
+        #: incremented with every new prefetch request
+        self._request = 0
+        #: curves processed by the GUI (never touched by the prefetcher)
+        self._claimed = set()
+        #: curves processed with the settings of the current generation
+        self._prefetched = set()
+        #: curves currently processed in the background
+        self._busy = set()
+        #: jobs submitted to the scheduler
+        self._futures = []
+        #: QMap grid positions for each measurement path
+        self._grids = {}
+
+    def cancel(self):
+        """Discard all prefetched results, because settings changed
+
+        Curves that were prefetched but not yet claimed are reset,
+        so that they are processed with the new settings. Curves
+        that are being processed right now are reset in the
+        background as soon as they are done.
+        """
+        with self._lock:
+            self._generation += 1
+            self._request += 1
+            for fdist in self._prefetched:
+                invalidate(fdist)
+            self._prefetched.clear()
+            futures = self._futures
+        for future in futures:
+            future.cancel()
+
+    def claim(self, fdist):
+        """Take over a curve for processing in the GUI
+
+        If the curve is currently processed in the background,
+        this method blocks until that is done. Afterwards, the
+        prefetcher does not touch the curve anymore.
+        """
+        with self._lock:
+            self._claimed.add(fdist)
+            self._prefetched.discard(fdist)
+            while fdist in self._busy:
+                self._condition.wait()
+
+    def forget_grids(self):
+        """Forget the QMap grid positions (e.g. when curves are added)"""
+        with self._lock:
+            self._grids.clear()
+
+    def get_neighbours(self, data_set, index):
+        """Return the neighbours of the curve at `index` in `data_set`
+
+        Curves adjacent in the curve list come first (closest first),
+        followed by curves adjacent in the QMap grid of the same
+        measurement.
+        """
+        neighbours = []
+        for dd in range(1, self.num_neighbours + 1):
+            for ii in [index + dd, index - dd]:
+                if 0 <= ii < len(data_set):
+                    neighbours.append(data_set[ii])
+        fdist = data_set[index]
+        grid = self._get_grid(data_set, fdist.path)
+        pos = None
+        for key, ar in grid.items():
+            if ar is fdist:
+                pos = key
+                break
+        if pos is not None:
+            gx, gy = pos
+            for dd in range(1, self.num_neighbours + 1):
+                for dx in range(-dd, dd + 1):
+                    for dy in range(-dd, dd + 1):
+                        if max(abs(dx), abs(dy)) == dd:
+                            ar = grid.get((gx + dx, gy + dy))
+                            if ar is not None:
+                                neighbours.append(ar)
+        unique = []
+        for ar in neighbours:
+            if ar is not fdist and ar not in unique:
+                unique.append(ar)
+        return unique
+
+    def _get_grid(self, data_set, path):
+        """Map QMap grid positions to the curves of a measurement"""
+        with self._lock:
+            if path in self._grids:
+                return self._grids[path]
+        grid = {}
+        for ar in data_set:
+            if ar.path == path:
+                meta = ar.metadata
+                gx = meta.get("grid index x")
+                gy = meta.get("grid index y")
+                if gx is not None and gy is not None:
+                    grid.setdefault((gx, gy), ar)
+        with self._lock:
+            self._grids[path] = grid
+        return grid
+
+    def prefetch(self, data_set, index, job):
+        """Process the neighbours of a curve in the background
+
+        Parameters
+        ----------
+        data_set: nanite.IndentationGroup
+            all curves
+        index: int
+            index of the curve the user is looking at
+        job: callable
+            function that processes a single curve; it is called
+            with the curve as the only argument
+        """
+        neighbours = self.get_neighbours(data_set, index)
+        with self._lock:
+            self._request += 1
+            request = self._request
+            generation = self._generation
+            # neighbours of the previous curve are not needed anymore
+            futures = self._futures
+        for future in futures:
+            future.cancel()
+        futures = [self.scheduler.submit(self._owner(), self._run, fdist, job,
+                                         request, generation)
+                   for fdist in neighbours]
+        with self._lock:
+            self._futures = [ft for ft in self._futures if not ft.done()]
+            self._futures += futures
+
+    def wait(self, timeout=None):
+        """Wait until all prefetch requests submitted so far are done
+
+        Call :func:`cancel` before, if the remaining neighbours
+        should not be processed.
+        """
+        with self._lock:
+            futures = list(self._futures)
+        _, not_done = concurrent.futures.wait(futures, timeout)
+        return not not_done
+
+    def _run(self, fdist, job, request, generation):
+        with self._lock:
+            if (request != self._request
+                    or generation != self._generation):
+                # superseded by a newer request or settings changed
+                return
+            if (fdist in self._claimed
+                    or fdist in self._prefetched
+                    or fdist in self._busy
+                    or fdist.fit_properties.get("params_initial")
+                    is not None):
+                # Curves that already have initial parameters were
+                # processed by the user before. Their parameters
+                # are restored by the GUI and must not be touched.
+                return
+            self._busy.add(fdist)
+        try:
+            job(fdist)
+        except BaseException:
+            # bad data; the GUI will report the error if the
+            # user selects the curve
+            logger.debug(traceback.format_exc())
+            stale = True
+        else:
+            stale = False
+        with self._lock:
+            if stale or generation != self._generation:
+                invalidate(fdist)
+            elif fdist not in self._claimed:
+                self._prefetched.add(fdist)
+            self._busy.discard(fdist)
+            self._condition.notify_all()
+
+
+def invalidate(fdist):
+    """Reset a curve to the state it had before it was prefetched"""
+    fdist.fit_properties.clear()
+    fdist._anc_cache = None
+    ancillaries.invalidate(fdist)
+    fdist._rating = None
+
+
+def process_curve(fdist, preprocessing, options, fit_settings, anc_checked,
+                  rating, warm_start=None):
+    """Preprocess, fit and rate a curve like the GUI would
+
+    Parameters
+    ----------
+    fdist: nanite.Indentation
+        curve to process
+    preprocessing: list of str
+        preprocessing identifiers
+    options: dict
+        preprocessing options
+    fit_settings: pyjibe.fd.fit_settings.FitSettings
+        fit settings, see :func:`pyjibe.fd.tab_fit.TabFit.get_fit_settings`
+    anc_checked: list of bool or None
+        "use" states of the ancillary parameter table; ancillary
+        parameters that are used replace the initial parameters
+        (see :func:`pyjibe.fd.ancillaries.apply_to_initial_parameters`);
+        set to None to use the initial parameters as they are
+    rating: tuple
+        rating scheme index and path to the imported training sets
+    warm_start: pyjibe.fd.warm_start.WarmStart
+        if given, the fit is started from the results of already
+        fitted neighbours in the QMap grid
+    """
+    # curves restored from a session file are not preprocessed yet
+    session.reattach(fdist)
+    fdist.apply_preprocessing(preprocessing, options=options)
+    # same key as in `TabFit.fit_approach_retract`
+    fit_settings = get_fit_key(fdist, fit_settings, anc_checked)
+    if not get_cached_fit(fdist, fit_settings):
+        if warm_start is None:
+            edelta_search.fit_curve(fdist, fit_settings)
+        else:
+            warm_start.fit(fdist, fit_settings)
+        set_cached_fit(fdist, fit_settings)
+    elif warm_start is not None:
+        warm_start.add_result(fdist)
+    scheme_id, rate_ts_path = rating
+    rating_base.rate_fdist(data=fdist,
+                           scheme_id=scheme_id,
+                           rate_ts_path=rate_ts_path)
+
+
+def process_curves(fdists, preprocessing, options, fit_settings, rating):
+    """Preprocess, fit and rate curves, fitting them in batches
+
+    Same as :func:`process_curve` (without ancillary parameters),
+    but the curves are fitted with
+    :func:`pyjibe.fd.batch_fit.fit_curves`. Curves that cannot be
+    processed are skipped; the GUI will report the error when
+    the curve is processed again.
+    """
+    preprocessed = []
+    for fdist in fdists:
+        try:
+            session.reattach(fdist)
+            fdist.apply_preprocessing(preprocessing, options=options)
+        except BaseException:
+            logger.debug(traceback.format_exc())
+        else:
+            preprocessed.append(fdist)
+    unfitted = [fd for fd in preprocessed
+                if not get_cached_fit(fd, fit_settings)]
+    try:
+        batch_fit.fit_curves(unfitted, fit_settings)
+    except BaseException:
+        logger.debug(traceback.format_exc())
+    for fdist in unfitted:
+        set_cached_fit(fdist, fit_settings)
+    scheme_id, rate_ts_path = rating
+    for fdist in preprocessed:
+        try:
+            rating_base.rate_fdist(data=fdist,
+                                   scheme_id=scheme_id,
+                                   rate_ts_path=rate_ts_path)
+        except BaseException:
+            logger.debug(traceback.format_exc())
@@ -1,22 +1,17 @@
 import os
 import pathlib
-import importlib.resources
 
 from nanite.rate import io as nio
-from PyQt6 import uic, QtCore, QtWidgets
+from PyQt6 import QtCore, QtWidgets
 
+from .. import uicache
 
-# load QWidget from ui file
-ui_ref = importlib.resources.files("pyjibe.fd") / "rating_iface.ui"
-with importlib.resources.as_file(ui_ref) as path_ui:
-    UiUserRatingBase = uic.loadUiType(path_ui)[0]
 
-
-class Rater(QtWidgets.QWidget, UiUserRatingBase):
+class Rater(QtWidgets.QWidget):
     def __init__(self, fdui, path):
         QtWidgets.QWidget.__init__(self, None)
-        UiUserRatingBase.__init__(self)
-        self.setupUi(self)
+        # load QWidget from ui file
+        uicache.setup_ui(self, "pyjibe.fd", "rating_iface.ui")
         self.fdui = fdui
         path = pathlib.Path(path)
         if not path.suffix == ".h5":
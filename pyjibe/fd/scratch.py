@@ -0,0 +1,136 @@
+"""HDF5 scratch store for the raw data of loaded curves
+
+Raw data columns of a curve are written once to an uncompressed,
+contiguous HDF5 dataset in a per-session scratch directory. The
+curve (and its segments) then access the raw columns through views
+of a memory map of that file instead of holding them in memory.
+"""
+import atexit
+import pathlib
+import shutil
+import tempfile
+import threading
+
+import h5py
+import numpy as np
+
+from .lazy import replace_raw_data
+
+
+class MemmapColumns:
+    def __init__(self, path, layout, memmap=None):
+        """Read-only dictionary of memory-mapped raw data columns
+
+        Parameters
+        ----------
+        path: pathlib.Path
+            path to the HDF5 scratch file
+        layout: dict
+            maps each column name to a tuple `(offset, shape, dtype)`
+            describing the contiguous dataset in `path`
+        memmap: numpy.memmap
+            byte-wise memory map of `path` (shared by all curves
+            of the file); if None, `path` is mapped
+        """
+        self.path = path
+        self.layout = layout
+        if memmap is None:
+            memmap = np.memmap(path, mode="r", dtype=np.uint8)
+        self.memmap = memmap
+
+    def __contains__(self, key):
+        return key in self.layout
+
+    def __getitem__(self, key):
+        if key not in self.layout:
+            raise KeyError(f"Column '{key}' not in '{self.path}'!")
+        offset, shape, dtype = self.layout[key]
+        if offset is None:
+            # h5py does not allocate storage for empty datasets
+            return np.zeros(shape, dtype=dtype)
+        dtype = np.dtype(dtype)
+        size = int(np.prod(shape)) * dtype.itemsize
+        data = self.memmap[offset:offset + size].view(np.ndarray)
+        return data.view(dtype).reshape(shape)
+
+    def __iter__(self):
+        for key in self.layout:
+            yield key
+
+    def keys(self):
+        return self.layout.keys()
+
+
+class ScratchStore:
+    def __init__(self, directory=None):
+        """Per-session HDF5 backing store for raw curve data
+
+        Parameters
+        ----------
+        directory: str or pathlib.Path or None
+            directory in which the scratch files are created; if
+            None, a temporary directory is created on first use
+        """
+        self._directory = directory
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self):
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix="pyjibe_scratch_")
+        directory = pathlib.Path(self._directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory
+
+    def attach(self, group):
+        """Move the raw data of all curves in `group` to the store
+
+        Parameters
+        ----------
+        group: nanite.IndentationGroup
+            curves whose raw data columns will be written to a new
+            scratch file and replaced by memory-mapped views
+
+        Returns
+        -------
+        path: pathlib.Path
+            path to the scratch file
+        """
+        with self._lock:
+            self._counter += 1
+            path = self.directory / f"scratch_{self._counter:05d}.h5"
+        layouts = []
+        with h5py.File(path, "w") as h5:
+            for ii, fdist in enumerate(group):
+                h5grp = h5.create_group(str(ii))
+                layout = {}
+                for col in fdist.columns_innate:
+                    # no chunking or compression, so that the dataset
+                    # is stored contiguously and can be memory-mapped
+                    ds = h5grp.create_dataset(
+                        col, data=np.asarray(fdist._raw_data[col]))
+                    layout[col] = [ds.id.get_offset(), ds.shape, ds.dtype]
+                layouts.append(layout)
+        memmap = np.memmap(path, mode="r", dtype=np.uint8)
+        for fdist, layout in zip(group, layouts):
+            replace_raw_data(fdist, MemmapColumns(path, layout, memmap))
+        return path
+
+    def close(self):
+        """Remove all scratch files of this store"""
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
+
+
+def get_session_store():
+    """Return the scratch store of the current session"""
+    global _session_store
+    if _session_store is None:
+        _session_store = ScratchStore()
+        atexit.register(_session_store.close)
+    return _session_store
+
+
+_session_store = None
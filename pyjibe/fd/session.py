@@ -0,0 +1,292 @@
+"""Session files of the force-distance analysis
+
+A session file stores the state of an analysis window in a compact
+HDF5 file: the settings shown in the GUI (preprocessing, fit settings,
+indentation depth selection, rating scheme), the individual indentation
+depths, and for every curve its identifier (see
+:mod:`pyjibe.fd.curve_id`), its "use" flag and, if it was analyzed,
+its preprocessing, fit properties, rating and ancillary parameters.
+The curve data are not stored.
+
+When a session is loaded, the data files are opened again and the
+stored state is assigned to the curves with matching identifiers
+(see :func:`restore_curve`). No curve is preprocessed or fitted at
+that point. The preprocessed data and the fit curve of a restored
+curve are rebuilt from the stored fit parameters when the curve data
+are needed for the first time (see :func:`reattach`).
+
+File layout::
+
+    /                 attributes "software", "version", "settings" (JSON)
+    /files            data file paths
+    /curves/id        curve identifiers
+    /curves/use       "use" flags (curve list check boxes)
+    /curves/state     gzip-compressed JSON lines (one per curve,
+                      "null" for curves that were not analyzed)
+"""
+import copy
+import dataclasses
+import json
+import pathlib
+import threading
+import weakref
+
+import h5py
+import lmfit
+import nanite.model as nmodel
+from nanite import fit as nfit
+from nanite import preproc
+import numpy as np
+
+from .._version import version
+from . import ancillaries
+from . import curve_id
+from .fit_settings import FitSettings, get_cached_fit_key, set_cached_fit
+
+
+#: file name suffix of session files
+SESSION_SUFFIX = ".pjsession"
+#: version of the session file layout
+SESSION_VERSION = 1
+
+#: restored curves whose data have not been preprocessed yet
+_detached = weakref.WeakKeyDictionary()
+_detached_lock = threading.RLock()
+
+
+@dataclasses.dataclass
+class Session:
+    #: data files of the analysis
+    files: list
+    #: GUI settings (see `UiForceDistance.get_session_settings`)
+    settings: dict
+    #: identifier of each curve
+    curve_ids: list
+    #: "use" flag of each curve
+    use: list
+    #: analysis state of each curve (see :func:`get_curve_state`)
+    states: list
+
+
+def _encode(obj):
+    """Convert `obj` to JSON-serializable data"""
+    if isinstance(obj, lmfit.Parameters):
+        return {"__parameters__": [_encode(p.__getstate__())
+                                   for p in obj.values()]}
+    elif isinstance(obj, dict):
+        return {key: _encode(val) for key, val in obj.items()}
+    elif isinstance(obj, (list, tuple)):
+        return [_encode(val) for val in obj]
+    elif isinstance(obj, np.ndarray):
+        return {"__ndarray__": obj.tolist()}
+    elif isinstance(obj, np.generic):
+        return obj.item()
+    elif isinstance(obj, pathlib.Path):
+        return {"__path__": str(obj)}
+    return obj
+
+
+def _decode_hook(obj):
+    """Inverse of :func:`_encode` (`object_hook` for `json.loads`)"""
+    if "__parameters__" in obj:
+        pars = []
+        for state in obj["__parameters__"]:
+            par = lmfit.Parameter(state[0])
+            par.__setstate__(tuple(state))
+            pars.append(par)
+        params = lmfit.Parameters()
+        params.add_many(*pars)
+        return params
+    elif "__ndarray__" in obj:
+        return np.array(obj["__ndarray__"])
+    elif "__path__" in obj:
+        return pathlib.Path(obj["__path__"])
+    return obj
+
+
+def get_curve_state(fdist):
+    """Return the analysis state of a curve (or None if not analyzed)
+
+    The state consists of the preprocessing, the fit properties,
+    the fit settings the curve was fitted with, the rating and the
+    ancillary parameters (computed if not cached).
+    """
+    fp = fdist.fit_properties
+    if fp.get("params_initial") is None:
+        return None
+    state = {"preprocessing": fdist.preprocessing,
+             "preprocessing_options": fdist.preprocessing_options,
+             "fit_properties": dict(fp),
+             "fit_key": None,
+             "rating": fdist._rating,
+             "ancillaries": ancillaries.get_ancillary_parameters(fdist),
+             }
+    key = get_cached_fit_key(fdist)
+    if isinstance(key, FitSettings):
+        state["fit_key"] = key.to_dict()
+    return state
+
+
+def restore_curve(fdist, state):
+    """Assign a stored analysis state to a curve
+
+    The curve data are not touched; they are preprocessed and the
+    fit is rebuilt when :func:`reattach` is called.
+    """
+    fdist.preprocessing = state["preprocessing"]
+    fdist.preprocessing_options = state["preprocessing_options"]
+    fdist.fit_properties = nfit.FitProperties()
+    # (no checks, the stored fit properties are consistent)
+    fdist.fit_properties.restore(state["fit_properties"])
+    fdist._anc_cache = None
+    fdist._preprocessing_details = {}
+    rating = state["rating"]
+    fdist._rating = None if rating is None else tuple(rating)
+    if state["fit_key"] is not None:
+        set_cached_fit(fdist, FitSettings.from_dict(state["fit_key"]))
+    if state["ancillaries"] is not None:
+        ancillaries.set_ancillary_parameters(fdist, state["ancillaries"])
+    with _detached_lock:
+        _detached[fdist] = True
+
+
+def is_detached(fdist):
+    """Whether the data of a restored curve were not preprocessed yet"""
+    with _detached_lock:
+        return fdist in _detached
+
+
+def reattach(fdist):
+    """Preprocess a restored curve and rebuild its fit
+
+    Nothing is done for curves that were not restored with
+    :func:`restore_curve` or that were already reattached.
+    The fit curve, the residuals and the fitting range are
+    computed from the stored fit parameters (the curve is not
+    fitted again). If the stored fit does not match the data
+    anymore, the fit results are discarded.
+    """
+    with _detached_lock:
+        if _detached.pop(fdist, None) is None:
+            return
+        fp = fdist.fit_properties
+        details = preproc.apply(apret=fdist,
+                                identifiers=fdist.preprocessing,
+                                options=fdist.preprocessing_options,
+                                ret_details=True)
+        fdist._preprocessing_details = details
+        if "hash" in fp:
+            _rebuild_fit(fdist)
+
+
+def _rebuild_fit(fdist):
+    """Compute fit curve, residuals and range from the fit properties"""
+    fp = fdist.fit_properties
+    fitter = nfit.IndentationFitter(fdist)
+    if fitter.fp["hash"] != fp["hash"]:
+        # different data or nanite version
+        fp.reset()
+        fdist._rating = None
+        ancillaries.invalidate(fdist)
+        return
+    fit_curve = fitter.fit_curve
+    fit_residuals = fitter.fit_residuals
+    fit_range = fitter.fit_range
+    fit_curve[:] = np.nan
+    fit_residuals[:] = np.nan
+    if fp.get("success", False):
+        gcf_k = fp["gcf_k"]
+        segid = fitter.segment
+        x = fitter.x_axis
+        # same as in `nanite.fit.IndentationFitter._fit`
+        xmin, xmax = fp["xmin"], fp["xmax"]
+        tol = 1e-12 * max(abs(xmin), abs(xmax))
+        fit_range[:] = segid & (x >= xmin - tol) & (x <= xmax + tol)
+        params = copy.deepcopy(fp["params_fitted"])
+        cpf = params["contact_point"].value
+        params["contact_point"].set(value=cpf * gcf_k)
+        md = nmodel.models_available[fp["model_key"]]
+        xseg = x[segid] * gcf_k
+        fit_curve[segid] = md.model(params, xseg)
+        fit_residuals[segid] = md.residual(params, xseg,
+                                           fitter.y_axis[segid],
+                                           fp["weight_cp"])
+    fdist["fit"] = fit_curve
+    fdist["fit residuals"] = fit_residuals
+    fdist["fit range"] = fit_range
+
+
+def save_session(path, data_set, use, settings, scheduler=None,
+                 owner=None):
+    """Save an analysis session to an HDF5 file
+
+    Parameters
+    ----------
+    path: str or pathlib.Path
+        output file
+    data_set: list of nanite.Indentation
+        all curves of the analysis
+    use: list of bool
+        "use" flag of each curve
+    settings: dict
+        JSON-serializable GUI settings
+    scheduler: pyjibe.head.scheduler.ComputeScheduler
+        if given, the ancillary parameters of many curves are
+        computed by the workers of the scheduler
+        (see :func:`pyjibe.fd.ancillaries.compute_ancillary_parameters`)
+    owner: object
+        owner of the jobs submitted to `scheduler`
+    """
+    analyzed = [fd for fd in data_set
+                if fd.fit_properties.get("params_initial") is not None]
+    ancillaries.compute_ancillary_parameters(analyzed, scheduler=scheduler,
+                                             owner=owner)
+    files = []
+    for fdist in data_set:
+        fpath = str(pathlib.Path(fdist.path).resolve())
+        if fpath not in files:
+            files.append(fpath)
+    lines = [json.dumps(_encode(get_curve_state(fdist)))
+             for fdist in data_set]
+    states = np.frombuffer("\n".join(lines).encode("utf-8"), dtype=np.uint8)
+    with h5py.File(path, "w") as h5:
+        h5.attrs["software"] = "PyJibe {}".format(version)
+        h5.attrs["version"] = SESSION_VERSION
+        h5.attrs["settings"] = json.dumps(_encode(settings))
+        h5.create_dataset("files", data=files,
+                          dtype=h5py.string_dtype())
+        curves = h5.create_group("curves")
+        curves.create_dataset(
+            "id", data=[curve_id.get_curve_id(fd) for fd in data_set],
+            dtype=h5py.string_dtype())
+        curves.create_dataset("use", data=np.array(use, dtype=bool))
+        curves.create_dataset("state", data=states,
+                              compression="gzip" if states.size else None)
+
+
+def load_session(path):
+    """Load an analysis session from an HDF5 file
+
+    Returns
+    -------
+    session: Session
+        the session; the curve states are assigned to the curves
+        with :func:`restore_curve`
+    """
+    with h5py.File(path, "r") as h5:
+        if h5.attrs.get("version", 0) > SESSION_VERSION:
+            raise ValueError(f"Session file '{path}' was created with a "
+                             + "newer version of PyJibe!")
+        settings = json.loads(h5.attrs["settings"],
+                              object_hook=_decode_hook)
+        files = [pathlib.Path(ff) for ff in h5["files"].asstr()[:]]
+        curve_ids = list(h5["curves/id"].asstr()[:])
+        use = [bool(uu) for uu in h5["curves/use"][:]]
+        text = h5["curves/state"][:].tobytes().decode("utf-8")
+    states = [json.loads(line, object_hook=_decode_hook)
+              for line in text.split("\n") if line]
+    return Session(files=files,
+                   settings=settings,
+                   curve_ids=curve_ids,
+                   use=use,
+                   states=states)
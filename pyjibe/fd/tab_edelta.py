@@ -1,18 +1,17 @@
-import importlib.resources
-
 import numpy as np
-from PyQt6 import uic, QtCore, QtWidgets
+from PyQt6 import QtCore, QtWidgets
 
+from .. import instrument
+from .. import uicache
 from .. import units
+from . import edelta_search
 from .mpl_edelta import MPLEDelta
 
 
 class TabEdelta(QtWidgets.QWidget):
     def __init__(self, *args, **kwargs):
         super(TabEdelta, self).__init__(*args, **kwargs)
-        ref = importlib.resources.files("pyjibe.fd") / "tab_edelta.ui"
-        with importlib.resources.as_file(ref) as path_ui:
-            uic.loadUi(path_ui, self)
+        uicache.setup_ui(self, "pyjibe.fd", "tab_edelta.ui")
 
         self.mpl_edelta_setup()
 
@@ -44,6 +43,7 @@ class TabEdelta(QtWidgets.QWidget):
         self.edelta_mpllayout.addWidget(self.mpl_edelta.canvas)
         self.edelta_mpllayout.addWidget(self.mpl_edelta.toolbar)
 
+    @instrument.timed("mpl_edelta_update")
     def mpl_edelta_update(self):
         """Update the E(delta) plot"""
         if self.fd.tabs.currentWidget() == self:
@@ -62,13 +62,18 @@ class TabEdelta(QtWidgets.QWidget):
             self.delta_slider.blockSignals(False)
             # Update E(delta) plot
             self.fd.tab_fit.fit_approach_retract(fdist)
-            self.mpl_edelta.update(fdist, delta_opt)
+            # E(delta) does not depend on the indentation depth
+            cache_key = edelta_search.get_edelta_key(
+                fdist, self.fd.tab_fit.get_fit_settings())
+            self.mpl_edelta.update(fdist, delta_opt, cache_key=cache_key)
 
     @QtCore.pyqtSlot()
     def on_delta_guess(self):
         """Guess the optimal indentation depth for the current curve"""
         fdist = self.current_curve
-        value = fdist.estimate_optimal_mindelta()
+        key = edelta_search.get_edelta_key(
+            fdist, self.fd.tab_fit.get_fit_settings())
+        value = edelta_search.estimate_optimal_mindelta(fdist, key=key)
         value /= units.scales["µ"]
         self.delta_spin.setValue(value)
 
@@ -1,26 +1,75 @@
-import importlib.resources
-
 import nanite.model as nmodel
 import numpy as np
-from PyQt6 import uic, QtCore, QtWidgets
+from PyQt6 import QtCore, QtWidgets
 
+from .. import instrument
+from ..settings import get_settings
+from .. import uicache
 from .. import units
 
+from . import ancillaries
+from . import curve_id
+from . import edelta_search
+from .fit_settings import (FitSettings, get_cached_fit, get_fit_key,
+                           set_cached_fit)
+
+
+class ParameterMirror:
+    def __init__(self):
+        """Typed copy of the initial parameter table
+
+        The rows of `TabFit.table_parameters_initial` are mirrored in
+        SI units, so that the initial fit parameters can be built
+        without searching the table or parsing its text.
+        """
+        #: parameter label (name and unit) of each row
+        self.labels = []
+        #: row of each parameter label
+        self.rows = {}
+        #: multiplier for the human-readable unit of each row
+        self.scales = []
+        #: [vary, value, min, max] in SI units for each row
+        self.values = []
+
+    def get(self, label):
+        """Return [vary, value, min, max] for `label` (or None)"""
+        row = self.rows.get(label)
+        return None if row is None else self.values[row]
+
+    def reset(self, labels, scales):
+        self.labels = list(labels)
+        self.rows = {label: row for row, label in enumerate(labels)}
+        self.scales = list(scales)
+        self.values = [[True, np.nan, -np.inf, np.inf] for _ in labels]
+
+    def update_from_item(self, item):
+        """Update the mirror with an item of the parameter table"""
+        row = item.row()
+        col = item.column()
+        if row >= len(self.labels):
+            return
+        if col == 0:
+            # checked means "fixed"
+            self.values[row][0] = \
+                item.checkState() == QtCore.Qt.CheckState.Unchecked
+        else:
+            self.values[row][col] = float(item.text()) / self.scales[row]
+
 
 class TabFit(QtWidgets.QWidget):
     def __init__(self, *args, **kwargs):
         super(TabFit, self).__init__(*args, **kwargs)
 
-        ref = importlib.resources.files("pyjibe.fd") / "tab_fit.ui"
-        with importlib.resources.as_file(ref) as path_ui:
-            uic.loadUi(path_ui, self)
+        uicache.setup_ui(self, "pyjibe.fd", "tab_fit.ui")
+        #: typed copy of `self.table_parameters_initial`
+        self.params_mirror = ParameterMirror()
 
         # Setup the fitting tab
         id_para = 0
         # Model selection
         models_av = list(nmodel.models_available.keys())
         # Exact spherical model is only available in developer mode
-        self.settings = QtCore.QSettings()
+        self.settings = get_settings()
         dev_mode = bool(int(
             self.settings.value("advanced/developer mode", "0")))
         exp_mode = bool(int(
@@ -58,7 +107,8 @@ class TabFit(QtWidgets.QWidget):
         self.cb_model.currentIndexChanged.connect(self.on_model)
         self.cb_range_type.currentTextChanged.connect(self.on_params_init)
         self.table_parameters_anc.itemChanged.connect(self.on_params_anc)
-        self.table_parameters_initial.itemChanged.connect(self.on_params_init)
+        self.table_parameters_initial.itemChanged.connect(
+            self.on_params_init_item)
         self.cb_weight_cp.stateChanged.connect(self.on_params_init)
         self.sp_weight_cp_um.valueChanged.connect(self.on_update_weights)
         self.sp_weight_cp_perc.valueChanged.connect(self.on_update_weights)
@@ -79,51 +129,50 @@ class TabFit(QtWidgets.QWidget):
 
     def anc_update_parameters(self, fdist):
         model_key = self.fit_model.model_key
+        itab = self.table_parameters_initial
+        atab = self.table_parameters_anc
+        # "use" states of the current rows (all ancillary
+        # parameters are used if the number of rows changes)
+        anc_checked = [atab.item(row, 0).checkState()
+                       == QtCore.Qt.CheckState.Checked
+                       for row in range(atab.rowCount())]
         # Apply the current set of parameters
         # (some ancillary parameters depend on the correct initial parameters)
-        fdist.fit_properties["params_initial"] = self.fit_parameters()
-        # ancillaries
-        anc = fdist.get_ancillary_parameters(model_key=model_key)
-        anc_used = [ak for ak in anc if ak in self.fit_model.parameter_keys]
-        if anc_used:
+        rows = ancillaries.apply_to_initial_parameters(
+            fdist, model_key, self.fit_parameters(), anc_checked)
+        if rows:
             self.widget_anc.setVisible(True)
-            itab = self.table_parameters_initial
-            atab = self.table_parameters_anc
             atab.blockSignals(True)
             rows_changed = self.assert_parameter_table_rows(atab,
-                                                            len(anc_used),
+                                                            len(rows),
                                                             cb_first=True,
                                                             read_only=True)
-            row = 0
-            for ak in self.fit_model.parameter_anc_keys:
-                if ak not in anc_used:
-                    continue
-                # Get the human-readable name of the parameter
-                hrname = self.fit_model.get_parm_name(ak)
-                # Determine unit scale, e.g. 1e6 [sic] for µm
-                si_unit = self.fit_model.get_parm_unit(ak)
-                # Determine unit scale, e.g. 1e6 [sic] for µm
-                scale = units.hrscale(hrname, si_unit=si_unit)
-                label = units.hrscname(hrname, si_unit=si_unit)
-                value_text = "{:.5g}".format(anc[ak] * scale)
+            for row, (label, value_text, used) in enumerate(rows):
                 atab.verticalHeaderItem(row).setText(label)
                 if rows_changed:
                     atab.item(row, 0).setCheckState(
                         QtCore.Qt.CheckState.Checked)
                 atab.item(row, 1).setText(value_text)
                 # updates initial parameters if "use" is checked
-                if (atab.item(row, 0).checkState() ==
-                        QtCore.Qt.CheckState.Checked):
+                if used:
                     # update initial parameters
-                    for rr in range(itab.rowCount()):
-                        if itab.verticalHeaderItem(rr).text() == label:
-                            if value_text != "nan":
-                                itab.item(rr, 1).setText(value_text)
-                row += 1
+                    rr = self.params_mirror.rows.get(label)
+                    if rr is not None and value_text != "nan":
+                        itab.item(rr, 1).setText(value_text)
             atab.blockSignals(False)
         else:
             self.widget_anc.setVisible(False)
 
+    def anc_check_states(self):
+        """Return the "use" states of the ancillary parameter table"""
+        atab = self.table_parameters_anc
+        states = []
+        if self.widget_anc.isVisibleTo(self):
+            for row in range(atab.rowCount()):
+                states.append(atab.item(row, 0).checkState()
+                              == QtCore.Qt.CheckState.Checked)
+        return states
+
     def assert_parameter_table_rows(self, table, rows, cb_first=False,
                                     read_only=False):
         """Make sure a QTableWidget has enough rows
@@ -167,7 +216,8 @@ class TabFit(QtWidgets.QWidget):
 
         return rows_changed
 
-    def fit_approach_retract(self, fdist, update_ui=True):
+    @instrument.timed("fit_approach_retract")
+    def fit_approach_retract(self, fdist, update_ui=True, fit_settings=None):
         """Perform preprocessing and fit data
 
         Parameters
@@ -178,6 +228,84 @@ class TabFit(QtWidgets.QWidget):
             Update the user interface after fitting,
             i.e. displaying the results in
             `self.table_parameters_fitted`.
+        fit_settings: FitSettings
+            Settings used for fitting (e.g. when fitting many curves
+            with identical settings); if None, the settings are
+            read from the GUI with `get_fit_settings`.
+        """
+        dev_mode = bool(int(
+            self.settings.value("advanced/developer mode", "0")))
+        # Remember range if applicable
+        if self.cb_delta_select.currentIndex() == 1:
+            cid = curve_id.get_curve_id(fdist)
+            self._indentation_depth_individual[cid] = (
+                self.sp_range_1.value(), self.sp_range_2.value())
+        if fit_settings is None:
+            # Determine if we want to weight the contact point
+            self.on_update_weights(on_params_init=False)
+            fit_settings = self.get_fit_settings()
+        # The ancillary parameters were already applied to the initial
+        # parameters (see `anc_update_parameters`).
+        fit_settings = get_fit_key(fdist, fit_settings)
+        # Perform fitting
+        optimal_fit_edelta = fit_settings.optimal_fit_edelta
+        if not get_cached_fit(fdist, fit_settings):
+            edelta_search.fit_curve(fdist, fit_settings)
+            set_cached_fit(fdist, fit_settings)
+        ftab = self.table_parameters_fitted
+        success = fdist.fit_properties.get("success", False)
+        if success:
+            # Perform automatic saving of results
+            self.fd.autosave(fdist)
+            # Display automatically detected optimal indentation depth
+            if optimal_fit_edelta:
+                # Set guessed indentation depth in GUI
+                val = fdist.fit_properties["optimal_fit_delta"]
+                self.sp_range_1.setValue(val / units.scales["µ"])
+
+        if update_ui:
+            # Display fit results in `self.table_parameters_fitted`
+            if success:
+                # use fit parameters only
+                showpar = fdist.fit_properties["params_fitted"]
+            else:
+                # use initial parameters
+                showpar = fdist.fit_properties["params_initial"]
+            # Display all varied parameters and expression parameters
+            # (expression parameters are discouraged, but supported).
+            dispars = [p for p in showpar.values() if p.vary or p.expr]
+            # Show hidden parameters only in dev mode
+            if not dev_mode:
+                dispars = [p for p in dispars if not p.name.startswith("_")]
+            self.assert_parameter_table_rows(ftab, len(dispars),
+                                             read_only=True)
+            for ii, p in enumerate(dispars):
+                # Get the human-readable name of the parameter
+                hrname = self.fit_model.get_parm_name(p.name)
+                # SI unit
+                si_unit = self.fit_model.get_parm_unit(p.name)
+                # Determine unit scale, e.g. 1e6 [sic] for µm
+                scale = units.hrscale(hrname, si_unit=si_unit)
+                label = units.hrscname(hrname, si_unit=si_unit)
+                ftab.verticalHeaderItem(ii).setText(label)
+                if success:
+                    ftab.item(ii, 0).setText("{:.5g}".format(p.value * scale))
+                else:
+                    ftab.item(ii, 0).setText("nan")
+
+    def get_fit_kwargs(self):
+        """Return the keyword arguments for `Indentation.fit_model`
+
+        All settings, including the initial parameters (see
+        `fit_parameters`), are read from the GUI.
+        """
+        return self.get_fit_settings().to_kwargs()
+
+    def get_fit_settings(self):
+        """Return the current fit settings as a `FitSettings` instance
+
+        All settings, including the initial parameters (see
+        `fit_parameters`), are read from the GUI.
         """
         dev_mode = bool(int(
             self.settings.value("advanced/developer mode", "0")))
@@ -201,13 +329,8 @@ class TabFit(QtWidgets.QWidget):
         # Determine range
         range_x = [self.sp_range_1.value() * units.scales["µ"],
                    self.sp_range_2.value() * units.scales["µ"]]
-        # Remember range if applicable
-        if self.cb_delta_select.currentIndex() == 1:
-            self._indentation_depth_individual[fdist] = (
-                self.sp_range_1.value(), self.sp_range_2.value())
         # Determine if we want to weight the contact point
-        self.on_update_weights(on_params_init=False)
-        if self.cb_weight_cp.checkState() == 2:
+        if self.cb_weight_cp.checkState() == QtCore.Qt.CheckState.Checked:
             weight_cp = self.sp_weight_cp_um.value() * units.scales["µ"]
         else:
             weight_cp = False
@@ -221,8 +344,19 @@ class TabFit(QtWidgets.QWidget):
         optimal_fit_num_samples = tab_edelta.sp_delta_num_samples.value()
         # fit parameters
         params = self.fit_parameters()
+        kwargs = {"model_key": model_key,
+                  "params_initial": params,
+                  "range_x": range_x,
+                  "range_type": range_type,
+                  "x_axis": x_axis,
+                  "y_axis": y_axis,
+                  "weight_cp": weight_cp,
+                  "segment": segment,
+                  "optimal_fit_edelta": optimal_fit_edelta,
+                  "optimal_fit_num_samples": optimal_fit_num_samples,
+                  "gcf_k": gcf_k,
+                  }
         # fit method (if in developer mode)
-        kwargs = {}
         if dev_mode or exp_mode:
             # We are in developer or expert mode.
             # Populate the user-defined keyword arguments. Note that
@@ -233,113 +367,111 @@ class TabFit(QtWidgets.QWidget):
             for item in self.lineEdit_method.text().strip().split():
                 key, val = item.split("=", 1)
                 method_kws[key] = float(val)
-            kwargs = {
-                "method": self.comboBox_method.currentText(),
-                "method_kws": method_kws,
-            }
-        # Perform fitting
-        fdist.fit_model(model_key=model_key,
-                        params_initial=params,
-                        range_x=range_x,
-                        range_type=range_type,
-                        x_axis=x_axis,
-                        y_axis=y_axis,
-                        weight_cp=weight_cp,
-                        segment=segment,
-                        optimal_fit_edelta=optimal_fit_edelta,
-                        optimal_fit_num_samples=optimal_fit_num_samples,
-                        gcf_k=gcf_k,
-                        **kwargs
-                        )
-        ftab = self.table_parameters_fitted
-        success = fdist.fit_properties.get("success", False)
-        if success:
-            # Perform automatic saving of results
-            self.fd.autosave(fdist)
-            # Display automatically detected optimal indentation depth
-            if optimal_fit_edelta:
-                # Set guessed indentation depth in GUI
-                val = fdist.fit_properties["optimal_fit_delta"]
-                self.sp_range_1.setValue(val / units.scales["µ"])
+            kwargs["method"] = self.comboBox_method.currentText()
+            kwargs["method_kws"] = method_kws
+        return FitSettings.from_kwargs(kwargs)
 
-        if update_ui:
-            # Display fit results in `self.table_parameters_fitted`
-            if success:
-                # use fit parameters only
-                showpar = fdist.fit_properties["params_fitted"]
-            else:
-                # use initial parameters
-                showpar = fdist.fit_properties["params_initial"]
-            # Display all varied parameters and expression parameters
-            # (expression parameters are discouraged, but supported).
-            dispars = [p for p in showpar.values() if p.vary or p.expr]
-            # Show hidden parameters only in dev mode
-            if not dev_mode:
-                dispars = [p for p in dispars if not p.name.startswith("_")]
-            self.assert_parameter_table_rows(ftab, len(dispars),
-                                             read_only=True)
-            for ii, p in enumerate(dispars):
-                # Get the human-readable name of the parameter
-                hrname = self.fit_model.get_parm_name(p.name)
-                # SI unit
-                si_unit = self.fit_model.get_parm_unit(p.name)
-                # Determine unit scale, e.g. 1e6 [sic] for µm
-                scale = units.hrscale(hrname, si_unit=si_unit)
-                label = units.hrscname(hrname, si_unit=si_unit)
-                ftab.verticalHeaderItem(ii).setText(label)
-                if success:
-                    ftab.item(ii, 0).setText("{:.5g}".format(p.value * scale))
-                else:
-                    ftab.item(ii, 0).setText("nan")
+    def set_fit_settings(self, fit_settings, delta_select=0):
+        """Display fit settings in the GUI (e.g. from a session file)
+
+        This is the inverse of :func:`get_fit_settings`. No curve
+        is fitted.
+
+        Parameters
+        ----------
+        fit_settings: FitSettings
+            fit settings to display
+        delta_select: int
+            indentation depth selection method (index of
+            `self.cb_delta_select`, see :func:`on_delta_select`)
+        """
+        idx = self.cb_model.findData(fit_settings.model_key)
+        if idx < 0:
+            raise ValueError(
+                "Unknown model '{}'!".format(fit_settings.model_key))
+        tab_edelta = self.fd.tab_edelta
+        widgets = [self.cb_model, self.cb_segment, self.cb_xaxis,
+                   self.cb_yaxis, self.sp_gcfk, self.cb_range_type,
+                   self.sp_range_1, self.sp_range_2, self.cb_weight_cp,
+                   self.sp_weight_cp_um, self.cb_delta_select,
+                   tab_edelta.cb_delta_select, tab_edelta.delta_spin,
+                   tab_edelta.delta_slider, tab_edelta.sp_delta_num_samples]
+        for wid in widgets:
+            wid.blockSignals(True)
+        try:
+            self.cb_model.setCurrentIndex(idx)
+            self.cb_segment.setCurrentIndex(
+                0 if fit_settings.segment == "approach" else 1)
+            self.cb_xaxis.setCurrentText(fit_settings.x_axis)
+            self.cb_yaxis.setCurrentText(fit_settings.y_axis)
+            self.sp_gcfk.setValue(fit_settings.gcf_k)
+            self.cb_range_type.setCurrentIndex(
+                0 if fit_settings.range_type == "absolute" else 1)
+            left, right = [rx / units.scales["µ"]
+                           for rx in fit_settings.range_x]
+            self.sp_range_1.setValue(left)
+            self.sp_range_2.setValue(right)
+            tab_edelta.delta_spin.setValue(left)
+            tab_edelta.delta_slider.setValue(left)
+            weight_cp = bool(fit_settings.weight_cp)
+            self.cb_weight_cp.setChecked(weight_cp)
+            # the signals of `cb_weight_cp` are blocked
+            self.widget_res_cp.setVisible(weight_cp)
+            if weight_cp:
+                # The weight is stored in µm; do not let
+                # `on_update_weights` recompute it from the percentage.
+                self.rd_weight_um.setChecked(True)
+                self.sp_weight_cp_um.setValue(
+                    fit_settings.weight_cp / units.scales["µ"])
+            tab_edelta.sp_delta_num_samples.setValue(
+                fit_settings.optimal_fit_num_samples)
+            self.cb_delta_select.setCurrentIndex(delta_select)
+            tab_edelta.cb_delta_select.setCurrentIndex(delta_select)
+            self.show_delta_select(delta_select)
+            if fit_settings.method is not None:
+                self.comboBox_method.setCurrentText(fit_settings.method)
+                self.lineEdit_method.setText(
+                    " ".join("{}={}".format(key, val)
+                             for key, val in fit_settings.method_kws or ()))
+        finally:
+            for wid in widgets:
+                wid.blockSignals(False)
+        self.on_update_weights(on_params_init=False)
+        self.show_initial_parameters(fit_settings.get_params())
 
     def fit_parameters(self):
         """Return initial fit parameters currently set in the GUI
 
-        The parameter data is read out from
-        `self.table_parameters_initial`. If the model that was
-        previously set does not match the current model, only the
-        parameters with the same name (existing in both models) are
-        updated.
+        The parameter data are taken from `self.params_mirror`, the
+        typed copy of `self.table_parameters_initial`. If the model
+        that was previously set does not match the current model,
+        only the parameters with the same name (existing in both
+        models) are updated.
         """
         # Get model key from dropdown list
         model_key = self.fit_model.model_key
         # Get parameters from `self.table_parameters_initial`
         model = nmodel.models_available[model_key]
         params = model.get_parameter_defaults()
-        itab = self.table_parameters_initial
-        if itab.verticalHeaderItem(0):
-            # Only update if there is already something set
-            for ii, key in enumerate(list(params.keys())):
-                p = params[key]
-                if p.expr:
-                    # Parameter has an expression, no update necessary
-                    continue
-                # Determine the scale for which we need to revert
-                # the multiplications.
-                # performed in `fit_update_parameters`.
-                hrname = model.parameter_names[ii]
-                si_unit = model.parameter_units[ii]
-                scale = units.hrscale(hrname, si_unit=si_unit)
-                label = units.hrscname(hrname, si_unit=si_unit)
-                for rr in range(itab.rowCount()):
-                    # search for a row matching the parameter `p`
-                    if itab.verticalHeaderItem(rr).text() == label:
-                        # update parameter `p`
-                        state = itab.item(rr, 0).checkState()
-                        if state == QtCore.Qt.CheckState.Unchecked:
-                            p.vary = True
-                        else:
-                            p.vary = False
-                        p.set(float(itab.item(rr, 1).text()) / scale)
-                        p.min = float(itab.item(rr, 2).text()) / scale
-                        p.max = float(itab.item(rr, 3).text()) / scale
-                        break
+        for ii, key in enumerate(list(params.keys())):
+            p = params[key]
+            if p.expr:
+                # Parameter has an expression, no update necessary
+                continue
+            label = units.hrscname(model.parameter_names[ii],
+                                   si_unit=model.parameter_units[ii])
+            values = self.params_mirror.get(label)
+            if values is not None:
+                # update parameter `p`
+                vary, value, pmin, pmax = values
+                p.vary = vary
+                p.set(value)
+                p.min = pmin
+                p.max = pmax
         return params
 
     def fit_update_parameters(self, fdist):
         """Update the ancillary and initial parameters in the UI"""
-        dev_mode = bool(int(
-            self.settings.value("advanced/developer mode", "0")))
         model_key = self.fit_model.model_key
 
         # set the model
@@ -356,6 +488,25 @@ class TabFit(QtWidgets.QWidget):
             params = self.fit_parameters()
 
         # parameter table
+        self.show_initial_parameters(params)
+
+        # indentation depth
+        if self.cb_delta_select.currentIndex() == 1:
+            # Set indentation depth individually
+            cid = curve_id.get_curve_id(fdist)
+            if cid in self._indentation_depth_individual:
+                left, right = self._indentation_depth_individual[cid]
+                self.fd.tab_edelta.delta_spin.setValue(left)
+                if self.cb_right_individ.isChecked() and right is not None:
+                    self.sp_range_2.setValue(right)
+
+        # ancillaries
+        self.anc_update_parameters(fdist)
+
+    def show_initial_parameters(self, params):
+        """Display initial parameters in `self.table_parameters_initial`"""
+        dev_mode = bool(int(
+            self.settings.value("advanced/developer mode", "0")))
         itab = self.table_parameters_initial
 
         itab.setColumnWidth(0, 30)
@@ -372,6 +523,8 @@ class TabFit(QtWidgets.QWidget):
         if not dev_mode:
             par_names = [p for p in par_names if not p.startswith("_")]
         self.assert_parameter_table_rows(itab, len(par_names), cb_first=True)
+        labels = []
+        scales = []
         for ii, key in enumerate(par_names):
             p = params[key]
             # Get the human readable name of the parameter
@@ -390,6 +543,8 @@ class TabFit(QtWidgets.QWidget):
             itab.item(ii, 1).setText("{:.5g}".format(p.value * scale))
             itab.item(ii, 2).setText(str(p.min * scale))
             itab.item(ii, 3).setText(str(p.max * scale))
+            labels.append(label)
+            scales.append(scale)
             # grey out/disable expression parameters
             if p.expr:
                 for jj in range(4):
@@ -398,23 +553,18 @@ class TabFit(QtWidgets.QWidget):
                         item.setCheckState(QtCore.Qt.CheckState.Unchecked)
                     item.setFlags(QtCore.Qt.ItemFlag.NoItemFlags)
 
-        itab.blockSignals(False)
+        # mirror the table (the values are rounded like the text)
+        self.params_mirror.reset(labels, scales)
+        for ii in range(len(labels)):
+            for jj in range(4):
+                self.params_mirror.update_from_item(itab.item(ii, jj))
 
-        # indentation depth
-        if self.cb_delta_select.currentIndex() == 1:
-            # Set indentation depth individually
-            if fdist in self._indentation_depth_individual:
-                left, right = self._indentation_depth_individual[fdist]
-                self.fd.tab_edelta.delta_spin.setValue(left)
-                if self.cb_right_individ.isChecked() and right is not None:
-                    self.sp_range_2.setValue(right)
-
-        # ancillaries
-        self.anc_update_parameters(fdist)
+        itab.blockSignals(False)
 
     def indentation_depth_setup(self):
         """Initiate ranges (spin/slider) that allow inf values"""
         # Initialize individual indentation depth dictionary
+        # (the keys are curve identifiers, see `curve_id.get_curve_id`)
         self._indentation_depth_individual = {}
         # Left
         self.sp_range_1.setValue(-np.inf)
@@ -436,6 +586,12 @@ class TabFit(QtWidgets.QWidget):
     def on_params_init(self):
         self.fd.on_params_init()
 
+    @QtCore.pyqtSlot(QtWidgets.QTableWidgetItem)
+    def on_params_init_item(self, item):
+        """The user edited the initial parameter table"""
+        self.params_mirror.update_from_item(item)
+        self.on_params_init()
+
     @QtCore.pyqtSlot(int)
     def on_delta_select(self, index):
         """The user selected a method for indentation depth determination
@@ -455,6 +611,22 @@ class TabFit(QtWidgets.QWidget):
             - 1: Set indentation depth individually
             - 2: Guess optimal indentation depth
         """
+        self.show_delta_select(index)
+        if index == 1:
+            # Set/get indentation depth individually
+            cid = curve_id.get_curve_id(self.current_curve)
+            if cid in self._indentation_depth_individual:
+                left = self._indentation_depth_individual[cid][0]
+            else:
+                left = self.fd.tab_edelta.delta_spin.value()
+            self.fd.tab_edelta.delta_spin.setValue(left)
+        self.on_params_init()
+
+    def show_delta_select(self, index):
+        """Enable the widgets for an indentation depth selection method
+
+        See :func:`on_delta_select` for the values of `index`.
+        """
         # These widgets are disabled when the user wants
         # PyJibe to guess the indentation depth:
         global_disable = [self.sp_range_1]
@@ -476,13 +648,6 @@ class TabFit(QtWidgets.QWidget):
             [item.setEnabled(True) for item in local_enable]
             self.cb_range_type.setEnabled(False)
             self.cb_range_type.setCurrentText("absolute")
-            # Set/get indentation depth individually
-            fdist = self.current_curve
-            if fdist in self._indentation_depth_individual:
-                left = self._indentation_depth_individual[fdist][0]
-            else:
-                left = self.fd.tab_edelta.delta_spin.value()
-            self.fd.tab_edelta.delta_spin.setValue(left)
         elif index == 2:
             # Guess optimal indentation depth
             [item.setEnabled(False) for item in global_disable]
@@ -498,7 +663,6 @@ class TabFit(QtWidgets.QWidget):
         else:
             self.cb_right_individ.setVisible(False)
             self.cb_right_individ.setChecked(False)
-        self.on_params_init()
 
     @QtCore.pyqtSlot()
     def on_update_weights(self, on_params_init=True):
@@ -1,20 +1,20 @@
 import numbers
-import importlib.resources
 
 from afmformats import meta
 from nanite import model
 import numpy as np
-from PyQt6 import uic, QtWidgets
+from PyQt6 import QtWidgets
 
+from .. import uicache
 from .. import units
 
+from . import ancillaries
+
 
 class TabInfo(QtWidgets.QWidget):
     def __init__(self, *args, **kwargs):
         super(TabInfo, self).__init__(*args, **kwargs)
-        ref = importlib.resources.files("pyjibe.fd") / "tab_info.ui"
-        with importlib.resources.as_file(ref) as path_ui:
-            uic.loadUi(path_ui, self)
+        uicache.setup_ui(self, "pyjibe.fd", "tab_info.ui")
 
     def update_info(self, fdist):
         hr_info = {}
@@ -35,7 +35,7 @@ class TabInfo(QtWidgets.QWidget):
                 hr_info[sec.capitalize()] = atext
 
         # Ancillaries
-        anc_dict = fdist.get_ancillary_parameters()
+        anc_dict = ancillaries.get_ancillary_parameters(fdist)
         if anc_dict:
             text_meta = []
             model_key = fdist.fit_properties["model_key"]
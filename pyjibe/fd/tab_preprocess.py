@@ -1,17 +1,16 @@
-import importlib.resources
-
 from nanite import preproc
-from PyQt6 import uic, QtCore, QtWidgets
+from PyQt6 import QtCore, QtWidgets
 
+from .. import instrument
+from .. import uicache
+from . import session
 from .widget_preprocess_item import WidgetPreprocessItem
 
 
 class TabPreprocess(QtWidgets.QWidget):
     def __init__(self, *args, **kwargs):
         super(TabPreprocess, self).__init__(*args, **kwargs)
-        ref = importlib.resources.files("pyjibe.fd") / "tab_preprocess.ui"
-        with importlib.resources.as_file(ref) as path_ui:
-            uic.loadUi(path_ui, self)
+        uicache.setup_ui(self, "pyjibe.fd", "tab_preprocess.ui")
 
         # Setup everything necessary for the preprocessing tab:
         # Get list of preprocessing methods
@@ -43,6 +42,7 @@ class TabPreprocess(QtWidgets.QWidget):
     def fd(self):
         return self.parent().parent().parent().parent()
 
+    @instrument.timed("apply_preprocessing")
     def apply_preprocessing(self, fdist=None):
         """Apply the preprocessing steps if required"""
         if fdist is None:
@@ -52,6 +52,8 @@ class TabPreprocess(QtWidgets.QWidget):
                 # initialization not finished
                 return
         identifiers, options = self.current_preprocessing()
+        # curves restored from a session file are preprocessed here
+        session.reattach(fdist)
         # Perform preprocessing
         preproc_visible = self.fd.stackedWidget.currentWidget() == \
             self.fd.widget_plot_preproc
@@ -63,6 +65,8 @@ class TabPreprocess(QtWidgets.QWidget):
 
     @QtCore.pyqtSlot()
     def on_preproc_step_changed(self):
+        # prefetched curves were preprocessed differently
+        self.fd.prefetcher.cancel()
         self.check_selection()
         self.apply_preprocessing()
 
@@ -149,14 +153,20 @@ class TabPreprocess(QtWidgets.QWidget):
             pwidget.blockSignals(False)
         self.apply_preprocessing()
 
-    def set_preprocessing(self, preprocessing, options=None):
-        """Set preprocessing (mostly used for testing)"""
+    def set_preprocessing(self, preprocessing, options=None, apply=True):
+        """Set preprocessing (mostly used for testing)
+
+        If `apply` is False, the preprocessing is not applied to
+        the current curve.
+        """
         if options is None:
             options = {}
         for pwidget in self._map_widgets_to_preproc_ids:
             pid = self._map_widgets_to_preproc_ids[pwidget]
+            pwidget.blockSignals(not apply)
             pwidget.setChecked(pid in preprocessing)
             if pid in options:
                 opts = options[pid]
                 name = sorted(opts.keys())[0]  # not future-proof
                 pwidget.set_option(name=name, value=opts[name])
+            pwidget.blockSignals(False)
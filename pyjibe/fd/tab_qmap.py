@@ -1,11 +1,11 @@
-import importlib.resources
-
 import nanite
-from PyQt6 import uic, QtCore, QtWidgets
+from PyQt6 import QtCore, QtWidgets
 
 from .mpl_qmap import MPLQMap
 
 from ..head.custom_widgets import show_wait_cursor
+from .. import instrument
+from .. import uicache
 
 
 class QMapCache:
@@ -23,9 +23,7 @@ class QMapCache:
 class TabQMap(QtWidgets.QWidget):
     def __init__(self, *args, **kwargs):
         super(TabQMap, self).__init__(*args, **kwargs)
-        ref = importlib.resources.files("pyjibe.fd") / "tab_qmap.ui"
-        with importlib.resources.as_file(ref) as path_ui:
-            uic.loadUi(path_ui, self)
+        uicache.setup_ui(self, "pyjibe.fd", "tab_qmap.ui")
 
         # Setup the matplotlib interface for 2D map plotting
         self.mpl_qmap = MPLQMap()
@@ -53,6 +51,7 @@ class TabQMap(QtWidgets.QWidget):
     def fd(self):
         return self.parent().parent().parent().parent()
 
+    @instrument.timed("mpl_qmap_update")
     def mpl_qmap_update(self):
         # Only update if we are on the right tab
         if self.fd.tabs.currentWidget() == self:
@@ -109,9 +108,9 @@ class TabQMap(QtWidgets.QWidget):
         # Get the qmap name
         cc = fd.current_curve
         # idx is `enum` and curves are sorted
-        curves = [ci for ci in fd.data_set if ci.path == cc.path]
-        fdist = curves[idx]
-        idcurve = fd.data_set.index(fdist)
+        indices = [ii for ii, ci in enumerate(fd.data_set)
+                   if ci.path == cc.path]
+        idcurve = indices[idx]
         item = fd.list_curves.topLevelItem(idcurve)
         fd.list_curves.setCurrentItem(item)
 
@@ -0,0 +1,329 @@
+"""Warm-started fits of QMap curves
+
+Normally, every curve is fitted starting from the initial parameters
+in the GUI. In a QMap, adjacent curves usually have similar elastic
+moduli, so the fit of a curve may start from the results of its
+already-fitted neighbours. The curves are processed coarse-to-fine:
+every fourth grid point is fitted cold (from the GUI parameters),
+then every second grid point and finally the rest are fitted warm,
+such that most curves have fitted neighbours.
+
+The contact point is not seeded by default. After the tip offset
+correction it is close to zero (the GUI default) for every curve,
+and starting from the contact point of a neighbour may lead to a
+different local minimum.
+
+A warm-started fit that fails is repeated with the initial
+parameters from the GUI. The initial parameters from the GUI are
+stored in the fit properties of each curve, so exported initial
+parameters and the cache keys are the same as for a cold start.
+
+The residual evaluations of each fit are counted with the `iter_cb`
+callback of lmfit (see :func:`fit_counted`), such that the savings
+can be reported (see :class:`WarmStartReport`).
+"""
+import threading
+import time
+
+import numpy as np
+import nanite.fit as nfit
+
+from .batch_fit import store_results
+
+
+def fit_counted(fdist, fit_settings):
+    """Fit a curve and return the number of residual evaluations
+
+    Same as `nanite.Indentation.fit_model`. The evaluations of
+    this fit are counted with the `iter_cb` callback of lmfit,
+    which is not stored in the fit properties.
+
+    Parameters
+    ----------
+    fdist: nanite.Indentation
+        curve to fit (must be preprocessed)
+    fit_settings: pyjibe.fd.fit_settings.FitSettings
+        fit settings
+
+    Returns
+    -------
+    evaluations: int
+        number of residual evaluations (0 if the curve was
+        already fitted with these settings)
+    """
+    kwargs = fit_settings.to_kwargs()
+    # same as in `nanite.Indentation.fit_model`
+    for arg in sorted(kwargs.keys()):
+        fdist.fit_properties[arg] = kwargs[arg]
+    if "hash" in fdist.fit_properties:
+        return 0
+    fdist._anc_cache = None
+    fitter = nfit.IndentationFitter(fdist)
+    evaluations = 0
+
+    def count(*args, **kwargs):
+        nonlocal evaluations
+        evaluations += 1
+
+    # (the fit hash was already computed by the fitter)
+    method_kws = fitter.fp["method_kws"]
+    fitter.fp.restore({"method_kws": dict(method_kws, iter_cb=count)})
+    try:
+        fitter.fit()
+    finally:
+        fitter.fp.restore({"method_kws": method_kws})
+    store_results(fdist, fitter)
+    return evaluations
+
+
+class WarmStartReport:
+    def __init__(self):
+        """Statistics of warm-started and cold-started fits"""
+        self._lock = threading.Lock()
+        #: number of fits started from neighbouring results
+        self.num_warm = 0
+        #: number of fits started from the GUI initial parameters
+        self.num_cold = 0
+        #: number of warm-started fits that were repeated cold
+        self.num_fallback = 0
+        #: residual evaluations of warm-started fits
+        self.evaluations_warm = 0
+        #: residual evaluations of cold-started fits
+        self.evaluations_cold = 0
+        #: wall time of warm-started fits [s]
+        self.time_warm = 0
+        #: wall time of cold-started fits [s]
+        self.time_cold = 0
+
+    def add(self, warm, evaluations, duration, fallback=False):
+        with self._lock:
+            if warm:
+                self.num_warm += 1
+                self.num_fallback += bool(fallback)
+                self.evaluations_warm += evaluations
+                self.time_warm += duration
+            else:
+                self.num_cold += 1
+                self.evaluations_cold += evaluations
+                self.time_cold += duration
+
+    def get_saved(self):
+        """Estimate the residual evaluations and time saved
+
+        The cost of a cold start is estimated from the mean of the
+        cold-started fits in this batch.
+
+        Returns
+        -------
+        evaluations: float
+            residual evaluations saved (nan if there are no
+            cold-started fits)
+        duration: float
+            wall time saved [s] (nan if there are no cold-started fits)
+        """
+        with self._lock:
+            if not self.num_cold:
+                return np.nan, np.nan
+            evals = (self.evaluations_cold / self.num_cold * self.num_warm
+                     - self.evaluations_warm)
+            duration = (self.time_cold / self.num_cold * self.num_warm
+                        - self.time_warm)
+        return evals, duration
+
+    def summary(self):
+        """Return a one-line summary for logging and the status bar"""
+        evals, duration = self.get_saved()
+        text = "Warm start: {} warm ({} repeated cold), {} cold fits".format(
+            self.num_warm, self.num_fallback, self.num_cold)
+        if np.isfinite(evals):
+            text += ("; saved {:.0f} residual evaluations and {:.2f}s "
+                     "(estimate)").format(evals, duration)
+        return text
+
+    def to_dict(self):
+        evals, duration = self.get_saved()
+        with self._lock:
+            return {
+                "warm fits": self.num_warm,
+                "cold fits": self.num_cold,
+                "fallback fits": self.num_fallback,
+                "evaluations warm": self.evaluations_warm,
+                "evaluations cold": self.evaluations_cold,
+                "time warm [s]": self.time_warm,
+                "time cold [s]": self.time_cold,
+                "evaluations saved": evals,
+                "time saved [s]": duration,
+            }
+
+
+class WarmStart:
+    def __init__(self, data_set, parameters=("E",), max_step=4):
+        """Seed the initial parameters with results of neighbours
+
+        Parameters
+        ----------
+        data_set: list of nanite.Indentation
+            curves of a batch; only curves with the metadata keys
+            "grid index x" and "grid index y" are warm-started
+        parameters: tuple of str
+            names of the parameters that are seeded (if they are
+            varied and not defined by an expression)
+        max_step: int
+            grid spacing of the coarse (cold-started) pass (power of
+            two); also the maximum distance of neighbours used for
+            seeding
+        """
+        self.parameters = parameters
+        self.max_step = max_step
+        self.report = WarmStartReport()
+        #: QMap grid of each measurement
+        self._grids = {}
+        #: (measurement path, grid position) of each curve
+        self._positions = {}
+        for fdist in data_set:
+            meta = fdist.metadata
+            gx = meta.get("grid index x")
+            gy = meta.get("grid index y")
+            if gx is not None and gy is not None:
+                grid = self._grids.setdefault(fdist.path, {})
+                grid.setdefault((gx, gy), fdist)
+                self._positions[fdist] = (fdist.path, (gx, gy))
+        self._data_set = list(data_set)
+        #: fitted values of the seeded parameters of each curve
+        self._results = {}
+        self._lock = threading.Lock()
+
+    @property
+    def num_grid_curves(self):
+        """Number of curves with a QMap grid position"""
+        return len(self._positions)
+
+    def add_result(self, fdist):
+        """Make the fit results of `fdist` available to its neighbours"""
+        fp = fdist.fit_properties
+        if fp.get("success", False) and "params_fitted" in fp:
+            values = {}
+            for name in self.parameters:
+                if name in fp["params_fitted"]:
+                    value = fp["params_fitted"][name].value
+                    if np.isfinite(value):
+                        values[name] = value
+            with self._lock:
+                self._results[fdist] = values
+
+    def fit(self, fdist, fit_settings):
+        """Fit a curve, warm-started if neighbours were fitted before
+
+        Parameters
+        ----------
+        fdist: nanite.Indentation
+            curve to fit
+        fit_settings: pyjibe.fd.fit_settings.FitSettings
+            fit settings (with the initial parameters that are
+            used for a cold start)
+        """
+        seeded = self.get_seeded_params(fdist, fit_settings.get_params())
+        tic = time.perf_counter()
+        fallback = False
+        if seeded is not None:
+            evaluations = fit_counted(fdist, fit_settings.with_params(seeded))
+            if self.is_acceptable(fdist):
+                # The initial parameters from the GUI are stored, so
+                # that they are shown and exported for this curve.
+                fdist.fit_properties.restore(
+                    {"params_initial": fit_settings.get_params()})
+            else:
+                fallback = True
+                evaluations += fit_counted(fdist, fit_settings)
+        else:
+            evaluations = fit_counted(fdist, fit_settings)
+        self.report.add(warm=seeded is not None,
+                        evaluations=evaluations,
+                        duration=time.perf_counter() - tic,
+                        fallback=fallback)
+        self.add_result(fdist)
+
+    def get_fit_order(self):
+        """Return the curves of the batch in coarse-to-fine order
+
+        Grid positions that are multiples of `max_step` come first,
+        followed by multiples of `max_step/2`, etc. Curves without
+        grid position come last. The original order is kept within
+        each pass.
+        """
+        num_levels = int(np.log2(self.max_step)) + 1
+
+        def level(item):
+            index, fdist = item
+            return self.get_level(fdist, default=num_levels), index
+
+        return [fdist for _, fdist in sorted(enumerate(self._data_set),
+                                             key=level)]
+
+    def get_level(self, fdist, default=None):
+        """Return the coarse-to-fine pass of a curve (0 is coarsest)"""
+        if fdist not in self._positions:
+            return default
+        gx, gy = self._positions[fdist][1]
+        step = self.max_step
+        lev = 0
+        while step > 1 and (gx % step or gy % step):
+            step //= 2
+            lev += 1
+        return lev
+
+    def get_neighbour_values(self, fdist):
+        """Return the fitted values of the closest fitted neighbours
+
+        The neighbours are searched in square rings of increasing
+        size (up to `max_step`) around the grid position of `fdist`.
+        """
+        if fdist not in self._positions:
+            return []
+        path, (gx, gy) = self._positions[fdist]
+        grid = self._grids[path]
+        with self._lock:
+            for dd in range(1, self.max_step + 1):
+                values = []
+                for dx in range(-dd, dd + 1):
+                    for dy in range(-dd, dd + 1):
+                        if max(abs(dx), abs(dy)) == dd:
+                            ar = grid.get((gx + dx, gy + dy))
+                            if ar is not None and ar in self._results:
+                                values.append(self._results[ar])
+                if values:
+                    return values
+        return []
+
+    def get_seeded_params(self, fdist, params):
+        """Return initial parameters seeded from fitted neighbours
+
+        The median of the fitted values of the closest fitted
+        neighbours is used. Returns None for curves of the coarse
+        pass or if no neighbour has been fitted yet.
+        """
+        if not self.get_level(fdist, default=0):
+            return None
+        values = self.get_neighbour_values(fdist)
+        if not values:
+            return None
+        seeded = False
+        for name in self.parameters:
+            if name in params and params[name].vary and not params[name].expr:
+                nvals = [vv[name] for vv in values if name in vv]
+                if nvals:
+                    pp = params[name]
+                    pp.set(value=np.clip(np.median(nvals), pp.min, pp.max))
+                    seeded = True
+        return params if seeded else None
+
+    @staticmethod
+    def is_acceptable(fdist):
+        """Whether a warm-started fit can replace a cold-started fit"""
+        fp = fdist.fit_properties
+        if not fp.get("success", False):
+            return False
+        for pp in fp["params_fitted"].values():
+            if not np.isfinite(pp.value):
+                return False
+        return True
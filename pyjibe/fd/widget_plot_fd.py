@@ -1,6 +1,7 @@
 """Widget containing force-distance plot"""
 from PyQt6 import QtWidgets
 
+from .. import instrument
 from .mpl_indent import MPLIndentation
 
 
@@ -20,6 +21,7 @@ class WidgetPlotFD(QtWidgets.QWidget):
     def fd(self):
         return self.parent().parent().parent()
 
+    @instrument.timed("mpl_curve_update")
     def mpl_curve_update(self, fdist):
         """Update the force-indentation curve"""
         autoscale_x = self.fd.cb_mpl_rescale_plot_x.checkState().value == 2
@@ -39,3 +41,4 @@ class WidgetPlotFD(QtWidgets.QWidget):
         self.mpl_curve.update(fdist,
                               rescale_x=rescale_x,
                               rescale_y=rescale_y)
+        self.fd.fit_stages.set_displayed(fdist)
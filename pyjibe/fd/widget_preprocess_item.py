@@ -1,7 +1,7 @@
-import importlib.resources
-
 from nanite import preproc
-from PyQt6 import QtCore, QtWidgets, uic
+from PyQt6 import QtCore, QtWidgets
+
+from .. import uicache
 
 
 class WidgetPreprocessItem(QtWidgets.QWidget):
@@ -12,10 +12,7 @@ class WidgetPreprocessItem(QtWidgets.QWidget):
         """Special widget for preprocessing options"""
         self.identifier = identifier
         super(WidgetPreprocessItem, self).__init__(*args, **kwargs)
-        ref = (importlib.resources.files("pyjibe.fd") /
-               "widget_preprocess_item.ui")
-        with importlib.resources.as_file(ref) as path_ui:
-            uic.loadUi(path_ui, self)
+        uicache.setup_ui(self, "pyjibe.fd", "widget_preprocess_item.ui")
 
         # set label text
         name = preproc.get_name(identifier)
@@ -0,0 +1,367 @@
+"""Parallel conversion of AFM data files
+
+The functions in this module are executed in worker processes and
+must therefore not depend on Qt. Each worker loads one input file with
+afmformats and writes the output itself, except for merging, where the
+workers only read the curves and a single writer in the main process
+appends them to the output file.
+"""
+import concurrent.futures
+import json
+import multiprocessing
+import os
+import pathlib
+
+import afmformats
+from afmformats.afm_data import column_units
+import h5py
+import numpy as np
+
+from ..util import hashfile
+
+
+def get_metadata_keys(fdist, storage=True):
+    """Return the metadata keys of a curve that should be exported
+
+    Parameters
+    ----------
+    fdist: afmformats.AFMData
+        the curve
+    storage: bool
+        whether to export the "storage" metadata (e.g. path,
+        date, or time)
+    """
+    metadata = fdist.metadata
+    if not storage:
+        for key in metadata.get_summary()["storage"]:
+            if key in metadata:
+                metadata.pop(key)
+    return list(metadata.keys())
+
+
+def export_curves(path_in, out_dir, stem, fmt, storage=True,
+                  compression="gzip", shuffle=True):
+    """Export each curve of a file to a separate file
+
+    Returns
+    -------
+    outputs: list of pathlib.Path
+        paths to the output files
+    """
+    outputs = []
+    for fdist in afmformats.load_data(path_in):
+        name = "{}_{}.{}".format(stem, fdist.enum, fmt)
+        path_out = pathlib.Path(out_dir) / name
+        keys = get_metadata_keys(fdist, storage)
+        if fmt in ["h5", "hdf5"]:
+            with h5py.File(path_out, mode="w") as h5:
+                write_hdf5(h5, fdist, keys, compression, shuffle)
+        else:
+            fdist.export_data(path_out, metadata=keys, fmt=fmt)
+        outputs.append(path_out)
+    return outputs
+
+
+def export_file(path_in, path_out, fmt="h5", storage=True,
+                compression="gzip", shuffle=True):
+    """Export all curves of a file to one HDF5 file
+
+    Returns
+    -------
+    outputs: list of pathlib.Path
+        path to the output file
+    """
+    path_out = pathlib.Path(path_out)
+    path_out.parent.mkdir(parents=True, exist_ok=True)
+    with h5py.File(path_out, mode="w") as h5:
+        for fdist in afmformats.load_data(path_in):
+            keys = get_metadata_keys(fdist, storage)
+            if fmt in ["h5", "hdf5"]:
+                write_hdf5(h5, fdist, keys, compression, shuffle)
+            else:
+                fdist.export_data(h5, metadata=keys, fmt=fmt)
+    return [path_out]
+
+
+def read_curves(path_in, storage=True):
+    """Read the data and metadata of all curves of a file
+
+    Returns
+    -------
+    curves: list of tuple
+        for each curve, a dictionary of data columns, a dictionary
+        of the metadata, and the list of metadata keys that should
+        be exported
+    """
+    curves = []
+    for fdist in afmformats.load_data(path_in):
+        metadata = fdist.metadata
+        meta = {key: metadata[key] for key in metadata}
+        data = {col: fdist[col] for col in fdist.columns_innate}
+        curves.append((data, meta, get_metadata_keys(fdist, storage)))
+    return curves
+
+
+def write_curves(h5, curves, compression="gzip", shuffle=True):
+    """Append curves returned by :func:`read_curves` to an HDF5 file"""
+    for data, meta, keys in curves:
+        fdist = afmformats.AFMForceDistance(data=data, metadata=meta)
+        write_hdf5(h5, fdist, keys, compression, shuffle)
+
+
+def write_hdf5(h5group, fdist, keys, compression="gzip", shuffle=True):
+    """Write a curve to an HDF5 file in the afmformats layout
+
+    In contrast to :func:`afmformats.AFMData.export_data`, the
+    compression can be chosen. Each column is stored in one chunk,
+    such that reading a column of a curve requires reading and
+    decompressing exactly one chunk.
+
+    Parameters
+    ----------
+    h5group: h5py.Group
+        output file or group
+    fdist: afmformats.AFMData
+        curve to write
+    keys: list of str
+        metadata keys to store
+    compression: str or None
+        "gzip", "lzf", or None
+    shuffle: bool
+        whether to apply the shuffle filter before compression
+    """
+    h5group.attrs["software"] = "afmformats"
+    h5group.attrs["software version"] = afmformats.__version__
+    # get the next free enum key (same as afmformats)
+    enum_key = str(fdist.enum)
+    if enum_key in h5group:
+        ii = 0
+        while str(ii) in h5group:
+            ii += 1
+        enum_key = str(ii)
+    subgroup = h5group.create_group(enum_key)
+    for col in fdist.columns:
+        if col == "index":
+            # do not store index column
+            continue
+        data = np.asarray(fdist[col])
+        if col == "segment":
+            data = np.asarray(data, dtype=np.uint8)
+        if data.size:
+            kwargs = {"chunks": data.shape,
+                      "compression": compression,
+                      "shuffle": shuffle and compression is not None,
+                      "fletcher32": True}
+        else:
+            # empty datasets cannot be chunked
+            kwargs = {}
+        ds = subgroup.create_dataset(name=col, data=data, **kwargs)
+        ds.attrs["unit"] = column_units[col]
+    metadata = fdist.metadata
+    for key in keys:
+        if key == "path":
+            subgroup.attrs["path"] = str(metadata["path"])
+        else:
+            subgroup.attrs[key] = metadata[key]
+    subgroup.attrs["enum"] = int(enum_key)
+
+
+def hash_and_run(path_in, func, *args):
+    """Run a conversion function and hash its input file
+
+    The input file is stat'ed before it is hashed, so that a file
+    that is modified during conversion is not recorded as up to
+    date in the :class:`ConversionManifest`.
+
+    Returns
+    -------
+    path_in: str
+        input path
+    file_hash: str
+        MD5 hash of the input file
+    stat: os.stat_result
+        status of the input file before hashing
+    outputs: list of pathlib.Path
+        return value of `func`
+    """
+    stat = os.stat(path_in)
+    file_hash = hashfile(path_in)
+    return str(path_in), file_hash, stat, func(path_in, *args)
+
+
+class ConversionManifest:
+    def __init__(self, out_dir):
+        """Record of converted input files in an output directory
+
+        The manifest (a JSON file in `out_dir`) stores for each input
+        file the MD5 hash, size, modification time, output files, and
+        conversion settings. An input file does not have to be
+        converted again if it is unchanged and all its outputs exist.
+
+        Parameters
+        ----------
+        out_dir: str or pathlib.Path
+            conversion output directory
+        """
+        self.out_dir = pathlib.Path(out_dir)
+        self.path = self.out_dir / "pyjibe_conversion_manifest.json"
+        self.files = {}
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.files = data["files"]
+
+    def is_up_to_date(self, path_in, settings):
+        """Whether the outputs of `path_in` exist and are up to date
+
+        Parameters
+        ----------
+        path_in: str or pathlib.Path
+            input file
+        settings: dict
+            the current conversion settings; if they differ from
+            the recorded settings, the file must be converted again
+        """
+        path_in = pathlib.Path(path_in)
+        entry = self.files.get(str(path_in.resolve()))
+        if entry is None or entry["settings"] != settings:
+            return False
+        for name in entry["outputs"]:
+            if not (self.out_dir / name).exists():
+                return False
+        stat = path_in.stat()
+        if stat.st_size != entry["size"]:
+            return False
+        elif stat.st_mtime != entry["mtime"]:
+            # file was touched, check whether the content changed
+            if hashfile(path_in) != entry["hash"]:
+                return False
+            entry["mtime"] = stat.st_mtime
+        return True
+
+    def update(self, path_in, file_hash, stat, outputs, settings):
+        """Record a converted input file
+
+        Parameters
+        ----------
+        path_in: str or pathlib.Path
+            input file
+        file_hash: str
+            MD5 hash of the input file
+        stat: os.stat_result
+            status of the input file when it was hashed
+            (see :func:`hash_and_run`)
+        outputs: list of pathlib.Path
+            output files
+        settings: dict
+            conversion settings
+        """
+        path_in = pathlib.Path(path_in)
+        self.files[str(path_in.resolve())] = {
+            "hash": file_hash,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "outputs": [os.path.relpath(pp, self.out_dir) for pp in outputs],
+            "settings": settings,
+        }
+
+    def save(self):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        data = {"files": self.files}
+        self.path.write_text(json.dumps(data, indent=2, sort_keys=True),
+                             encoding="utf-8")
+
+
+class ConversionEngine:
+    def __init__(self, max_workers=None):
+        """Run conversion jobs in a process pool
+
+        Parameters
+        ----------
+        max_workers: int
+            number of worker processes; defaults to the number
+            of CPUs
+        """
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+        self.max_workers = max_workers
+
+    def run(self, func, jobs, callback=None, consume=None):
+        """Run `func` for each job in the process pool
+
+        Parameters
+        ----------
+        func: callable
+            module-level function (must be picklable)
+        jobs: list of tuple
+            positional arguments for `func`; the first argument
+            is the input path, which is used in the error report
+        callback: callable
+            called with the number of finished jobs and the total
+            number of jobs while the jobs are running; conversion
+            is cancelled if it returns False (without waiting for
+            the jobs that are already running)
+        consume: callable
+            called in the main process with the result of each job,
+            in the order of `jobs` (e.g. a single HDF5 writer)
+
+        Returns
+        -------
+        errors: list
+            for each job that failed, a list with input path,
+            exception name and message
+        """
+        errors = []
+        num_done = 0
+        # At most this many results are kept in memory
+        # (only relevant if `consume` is given).
+        max_ahead = 2 * self.max_workers
+        futures = {}
+        results = {}
+        next_submit = 0
+        next_consume = 0
+        # "spawn" does not copy the state of the GUI process
+        mp_context = multiprocessing.get_context("spawn")
+        pool = concurrent.futures.ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=mp_context)
+        cancelled = False
+        try:
+            while num_done < len(jobs):
+                while (next_submit < len(jobs)
+                       and next_submit - next_consume < max_ahead):
+                    future = pool.submit(func, *jobs[next_submit])
+                    futures[future] = next_submit
+                    next_submit += 1
+                finished, _ = concurrent.futures.wait(
+                    futures, timeout=.1,
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+                for future in finished:
+                    idx = futures.pop(future)
+                    try:
+                        results[idx] = future.result()
+                    except BaseException as e:
+                        errors.append(format_error(jobs[idx][0], e))
+                        results[idx] = None
+                # Consume the results in the order of the jobs
+                while next_consume in results:
+                    result = results.pop(next_consume)
+                    if consume is not None and result is not None:
+                        try:
+                            consume(result)
+                        except BaseException as e:
+                            errors.append(
+                                format_error(jobs[next_consume][0], e))
+                    next_consume += 1
+                    num_done += 1
+                if callback is not None and not callback(num_done,
+                                                         len(jobs)):
+                    cancelled = True
+                    break
+        finally:
+            # Do not wait for running jobs when conversion is cancelled.
+            pool.shutdown(wait=not cancelled, cancel_futures=True)
+        return errors
+
+
+def format_error(path, exc):
+    """Return an entry for the error report of :class:`ConversionEngine`"""
+    return [str(path), exc.__class__.__name__, str(exc)]
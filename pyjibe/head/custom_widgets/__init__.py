@@ -1,9 +1,27 @@
-# flake8: noqa: F401
+"""Custom widgets
+
+The matplotlib navigation toolbars are only imported when they are
+accessed, because importing the matplotlib Qt backend is slow and
+not required for showing the main window.
+"""
+from __future__ import annotations
+
 from .dirdialog_multiselect import DirectoryDialogMultiSelect
-from .mpl_navigation_toolbar_icons import (
-    NavigationToolbarIndent,
-    NavigationToolbarEDelta,
-    NavigationToolbarQMap,
-    NavigationToolbarPreproc
-    )
 from .wait_cursor import ShowWaitCursor, show_wait_cursor
+
+__all__ = [
+    "DirectoryDialogMultiSelect",
+    "NavigationToolbarIndent",
+    "NavigationToolbarEDelta",
+    "NavigationToolbarQMap",
+    "NavigationToolbarPreproc",
+    "ShowWaitCursor",
+    "show_wait_cursor",
+]
+
+
+def __getattr__(name: str):
+    if name.startswith("NavigationToolbar"):
+        from . import mpl_navigation_toolbar_icons
+        return getattr(mpl_navigation_toolbar_icons, name)
+    raise AttributeError(name)
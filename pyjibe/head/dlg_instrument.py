@@ -0,0 +1,75 @@
+from PyQt6 import QtCore, QtWidgets
+
+from .. import instrument
+from .. import uicache
+
+
+#: characters for displaying histograms
+BARS = " ▁▂▃▄▅▆▇█"
+
+
+class InstrumentDialog(QtWidgets.QDialog):
+    def __init__(self, parent, *args, **kwargs):
+        """Timing statistics of the analysis pipeline (developer mode)"""
+        super(InstrumentDialog, self).__init__(parent=parent, *args, **kwargs)
+        uicache.setup_ui(self, "pyjibe.head", "dlg_instrument.ui")
+
+        self.checkBox_record.setChecked(instrument.is_enabled())
+        self.checkBox_record.toggled.connect(instrument.set_enabled)
+        self.toolButton_refresh.clicked.connect(self.refresh)
+        self.toolButton_reset.clicked.connect(self.on_reset)
+        self.pushButton_json.clicked.connect(self.on_export_json)
+        self.pushButton_trace.clicked.connect(self.on_export_trace)
+        self.refresh()
+
+    @QtCore.pyqtSlot()
+    def on_export_json(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Export timing statistics", "pyjibe_timings.json",
+            "JSON file (*.json)")
+        if path:
+            instrument.export_json(path)
+
+    @QtCore.pyqtSlot()
+    def on_export_trace(self):
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Export Chrome trace", "pyjibe_trace.json",
+            "Chrome trace (*.json)")
+        if path:
+            instrument.export_chrome_trace(path)
+
+    @QtCore.pyqtSlot()
+    def on_reset(self):
+        instrument.reset()
+        self.refresh()
+
+    @QtCore.pyqtSlot()
+    def refresh(self):
+        """Display the current statistics in the table"""
+        stats = instrument.get_statistics()
+        self.tableWidget.setRowCount(len(stats))
+        for row, stage in enumerate(sorted(stats)):
+            st = stats[stage]
+            hist = st["histogram"]
+            hmax = max(hist) or 1
+            # bar height rounded up (non-empty bins are always visible)
+            bars = "".join(BARS[-(-(len(BARS) - 1) * hh // hmax)]
+                           for hh in hist)
+            values = [stage,
+                      str(st["count"]),
+                      "{:.3f}".format(st["total [s]"]),
+                      "{:.2f}".format(st["mean [s]"] * 1e3),
+                      "{:.2f}".format(st["min [s]"] * 1e3),
+                      "{:.2f}".format(st["max [s]"] * 1e3),
+                      bars,
+                      ]
+            for col, value in enumerate(values):
+                item = QtWidgets.QTableWidgetItem(value)
+                if col == 6:
+                    edges = instrument.HISTOGRAM_EDGES
+                    item.setToolTip("\n".join(
+                        "< {:.3g} s: {}".format(ee, hh)
+                        for ee, hh in zip(edges, hist))
+                        + "\n> {:.3g} s: {}".format(edges[-1], hist[-1]))
+                self.tableWidget.setItem(row, col, item)
+        self.tableWidget.resizeColumnsToContents()
@@ -1,11 +1,17 @@
 import codecs
+import functools
 import hashlib
+import os
 import pathlib
-import importlib.resources
+import time
 
 import afmformats
 import h5py
-from PyQt6 import uic, QtWidgets
+from PyQt6 import QtCore, QtWidgets
+
+from .. import discovery
+from .. import uicache
+from . import convert_engine
 
 
 class ConvertDialog(QtWidgets.QDialog):
@@ -14,11 +20,11 @@ class ConvertDialog(QtWidgets.QDialog):
     def __init__(self, parent, *args, **kwargs):
         """Data conversion dialog"""
         super(ConvertDialog, self).__init__(parent=parent, *args, **kwargs)
-        ref = importlib.resources.files("pyjibe.head") / "dlg_tool_convert.ui"
-        with importlib.resources.as_file(ref) as path_ui:
-            uic.loadUi(path_ui, self)
+        uicache.setup_ui(self, "pyjibe.head", "dlg_tool_convert.ui")
 
         self._file_list = []
+        #: compression ratio and throughput of the last conversion
+        self.report = ""
 
         self.toolButton_browse.clicked.connect(self.on_browse)
         self.toolButton_clear.clicked.connect(self._file_list.clear)
@@ -35,13 +41,18 @@ class ConvertDialog(QtWidgets.QDialog):
         if not file.endswith(".h5"):
             file += ".h5"
         # HDF5 format
+        storage = self.checkBox_storage.isChecked()
+        jobs = [(path, storage) for path in self.file_list]
+        start = time.perf_counter()
         with h5py.File(file, "w") as h5:
-            for path in self.file_list:
-                fdlist = afmformats.load_data(path)
-                for fdist in fdlist:
-                    fdist.export(h5,
-                                 metadata=self.get_metadata_keys(fdist),
-                                 fmt="hdf5")
+            # files are read in parallel, but there is only one writer
+            self.run_jobs(convert_engine.read_curves, jobs,
+                          consume=functools.partial(
+                              convert_engine.write_curves, h5,
+                              compression=self.compression,
+                              shuffle=self.checkBox_shuffle.isChecked()))
+        self.show_report(self.file_list, [file],
+                         time.perf_counter() - start)
         return True
 
     def _convert_mirror(self):
@@ -79,14 +90,11 @@ class ConvertDialog(QtWidgets.QDialog):
                         ii += 1
                 out_list.append(outp)
             # Perform the export
-            for pin, pout in zip(self.file_list, out_list):
-                pout.parent.mkdir(parents=True, exist_ok=True)
-                with h5py.File(pout, mode="w") as h5:
-                    fdlist = afmformats.load_data(pin)
-                    for fdist in fdlist:
-                        fdist.export(h5,
-                                     metadata=self.get_metadata_keys(fdist),
-                                     fmt="hdf5")
+            storage = self.checkBox_storage.isChecked()
+            shuffle = self.checkBox_shuffle.isChecked()
+            jobs = [(pin, pout, "hdf5", storage, self.compression, shuffle)
+                    for pin, pout in zip(self.file_list, out_list)]
+            self.run_conversion(convert_engine.export_file, jobs, out_dir)
             return True
         else:
             return False
@@ -96,18 +104,17 @@ class ConvertDialog(QtWidgets.QDialog):
         out_dir = QtWidgets.QFileDialog.getExistingDirectory(
             self.parent(), "Select output directory", "")
         if out_dir:
+            storage = self.checkBox_storage.isChecked()
+            shuffle = self.checkBox_shuffle.isChecked()
+            jobs = []
             for path in self.file_list:
                 path = pathlib.Path(path)
                 epath = codecs.encode(str(path), encoding="utf-8",
                                       errors="ignore")
                 stem = path.name + "_" + hashlib.md5(epath).hexdigest()[:5]
-                fdlist = afmformats.load_data(path)
-                for fdist in fdlist:
-                    name = "{}_{}.{}".format(stem, fdist.enum, self.format)
-                    opath = pathlib.Path(out_dir) / name
-                    fdist.export(opath,
-                                 metadata=self.get_metadata_keys(fdist),
-                                 fmt=self.format)
+                jobs.append((path, out_dir, stem, self.format, storage,
+                             self.compression, shuffle))
+            self.run_conversion(convert_engine.export_curves, jobs, out_dir)
             return True
         else:
             return False  # do not close the dialog
@@ -117,6 +124,9 @@ class ConvertDialog(QtWidgets.QDialog):
         out_dir = QtWidgets.QFileDialog.getExistingDirectory(
             self.parent(), "Select output directory", "")
         if out_dir:
+            storage = self.checkBox_storage.isChecked()
+            shuffle = self.checkBox_shuffle.isChecked()
+            jobs = []
             for path in self.file_list:
                 path = pathlib.Path(path)
                 epath = codecs.encode(str(path), encoding="utf-8",
@@ -125,17 +135,21 @@ class ConvertDialog(QtWidgets.QDialog):
                                          hashlib.md5(epath).hexdigest()[:5],
                                          self.format)
                 opath = pathlib.Path(out_dir) / name
-
-                with h5py.File(opath, mode="w") as h5:
-                    fdlist = afmformats.load_data(path)
-                    for fdist in fdlist:
-                        fdist.export(h5,
-                                     metadata=self.get_metadata_keys(fdist),
-                                     fmt=self.format)
+                jobs.append((path, opath, self.format, storage,
+                             self.compression, shuffle))
+            self.run_conversion(convert_engine.export_file, jobs, out_dir)
             return True
         else:
             return False  # do not close the dialog
 
+    @property
+    def compression(self):
+        """HDF5 compression filter (None for no compression)"""
+        compression = self.comboBox_compression.currentText()
+        if compression == "none":
+            compression = None
+        return compression
+
     @property
     def file_list(self):
         return sorted(self._file_list)
@@ -176,6 +190,104 @@ class ConvertDialog(QtWidgets.QDialog):
 
         super(ConvertDialog, self).done(r)
 
+    def run_conversion(self, func, jobs, out_dir):
+        """Convert files to an output directory and show a report
+
+        If incremental conversion is selected, input files whose
+        outputs are up to date according to the manifest in
+        `out_dir` are skipped and the manifest is updated.
+        """
+        paths_in = [job[0] for job in jobs]
+        start = time.perf_counter()
+        if self.checkBox_incremental.isChecked():
+            manifest = convert_engine.ConversionManifest(out_dir)
+            settings = {"function": func.__name__,
+                        "format": self.format,
+                        "storage": self.checkBox_storage.isChecked(),
+                        "compression": self.compression,
+                        "shuffle": self.checkBox_shuffle.isChecked(),
+                        }
+            jobs = [job for job in jobs
+                    if not manifest.is_up_to_date(job[0], settings)]
+            results = self.run_jobs(convert_engine.hash_and_run,
+                                    [(job[0], func) + job[1:]
+                                     for job in jobs])
+            outputs = []
+            for path_in, file_hash, stat, outs in results:
+                manifest.update(path_in, file_hash, stat, outs, settings)
+                outputs += outs
+            manifest.save()
+        else:
+            results = self.run_jobs(func, jobs)
+            outputs = [pp for outs in results for pp in outs]
+        self.show_report([job[0] for job in jobs], outputs,
+                         time.perf_counter() - start,
+                         num_skipped=len(paths_in) - len(jobs))
+
+    def run_jobs(self, func, jobs, consume=None):
+        """Run conversion jobs in a process pool with a progress dialog
+
+        See :func:`convert_engine.ConversionEngine.run` for the
+        parameters. Files that could not be converted are listed
+        in a warning dialog.
+
+        Returns
+        -------
+        results: list
+            results of the successful jobs (only if `consume`
+            is not given)
+        """
+        bar = QtWidgets.QProgressDialog("Converting data files...",
+                                        "Stop", 0, len(jobs), self)
+        bar.setWindowTitle("Converting data files")
+        bar.setWindowModality(QtCore.Qt.WindowModality.WindowModal)
+        bar.setMinimumDuration(1000)
+
+        def callback(num_done, num_total):
+            bar.setValue(num_done)
+            QtCore.QCoreApplication.instance().processEvents(
+                QtCore.QEventLoop.ProcessEventsFlag.AllEvents, 100)
+            return not bar.wasCanceled()
+
+        results = []
+        if consume is None:
+            consume = results.append
+        engine = convert_engine.ConversionEngine()
+        errors = engine.run(func, jobs, callback=callback, consume=consume)
+        bar.reset()
+        bar.close()
+        if errors:
+            # Show warning dialog with files that could not be converted
+            msg = "The following files could not be converted:<br>"
+            for pp, err, message in errors:
+                msg += f"<br>{pp}: {err} ({message})<br>"
+            QtWidgets.QMessageBox.warning(
+                self,
+                "Some files could not be converted!",
+                msg,
+            )
+        return results
+
+    def show_report(self, paths_in, paths_out, duration, num_skipped=0):
+        """Display compression ratio and throughput of a conversion"""
+        size_in = sum(os.path.getsize(pp) for pp in paths_in)
+        size_out = sum(os.path.getsize(pp) for pp in paths_out)
+        mib = 1024**2
+        self.report = (
+            f"Converted {size_in / mib:.1f} MiB to {size_out / mib:.1f} MiB "
+            f"(compression ratio {size_in / max(size_out, 1):.2f}) "
+            f"in {duration:.1f} s "
+            f"({size_in / mib / max(duration, 1e-6):.1f} MiB/s).")
+        if num_skipped:
+            self.report += f" {num_skipped} up-to-date file(s) were skipped."
+        # non-modal, because this dialog is closed after conversion
+        msg = QtWidgets.QMessageBox(self.parent())
+        msg.setIcon(QtWidgets.QMessageBox.Icon.Information)
+        msg.setWindowTitle("Conversion finished")
+        msg.setText(self.report)
+        msg.setAttribute(QtCore.Qt.WidgetAttribute.WA_DeleteOnClose)
+        msg.show()
+
     def dragEnterEvent(self, e):
         """Whether files are accepted"""
         if e.mimeData().hasUrls():
@@ -186,24 +298,14 @@ class ConvertDialog(QtWidgets.QDialog):
     def dropEvent(self, e):
         """Add dropped files to view"""
         urls = e.mimeData().urls()
-        pathlist = []
-        for ff in urls:
-            pp = pathlib.Path(ff.toLocalFile())
-            if pp.is_dir():
-                for ext in afmformats.supported_extensions:
-                    pathlist += list(pp.rglob("*" + ext))
-            elif pp.suffix in afmformats.supported_extensions:
-                pathlist.append(pp)
-        for pp in pathlist:
+        paths = [pathlib.Path(ff.toLocalFile()) for ff in urls]
+        # single pass over the directory trees, suffixes only
+        for pp in discovery.iter_data_files(paths, detect=False):
             self.add_file(str(pp))
 
     def get_metadata_keys(self, fdist):
-        metadata = fdist.metadata
-        if not self.checkBox_storage.isChecked():
-            for key in metadata.get_summary()["storage"]:
-                if key in metadata:
-                    metadata.pop(key)
-        return list(metadata.keys())
+        return convert_engine.get_metadata_keys(
+            fdist, storage=self.checkBox_storage.isChecked())
 
     def on_browse(self):
         ext = " ".join(["*"+e for e in afmformats.supported_extensions])
@@ -1,34 +1,32 @@
 # flake8: noqa: E402 (matplotlib.use has to be right after the import)
 import os.path as os_path
 import pathlib
-import importlib.resources
+import importlib.metadata
+import itertools
 import signal
 import sys
+import time
 import traceback
 import webbrowser
 
 import matplotlib
 matplotlib.use('QT5Agg')
 
-from PyQt6 import uic, QtCore, QtWidgets
+from PyQt6 import QtCore, QtWidgets
 from PyQt6.QtCore import QStandardPaths
 
-import afmformats
-import h5py
-import lmfit
-import nanite
-import nanite.read
-import numpy
-import scipy
-import sklearn
-
 from . import custom_widgets
-from .dlg_tool_convert import ConvertDialog
 from . import preferences
+from . import scheduler
 from . import update
 
+from .. import discovery
 from ..extensions import ExtensionManager
+from .. import instrument
+from .. import profiler
 from .. import registry
+from ..settings import get_settings
+from .. import uicache
 from .._version import version as __version__
 
 
@@ -57,17 +55,17 @@ class PyJibe(QtWidgets.QMainWindow):
         QtCore.QCoreApplication.setOrganizationDomain("pyjibe.mpl.mpg.de")
         QtCore.QCoreApplication.setApplicationName("PyJibe")
         QtCore.QSettings.setDefaultFormat(QtCore.QSettings.Format.IniFormat)
-        #: PyJibe settings
-        self.settings = QtCore.QSettings()
+        #: PyJibe settings (shared in-memory snapshot)
+        self.settings = get_settings()
+        # make sure the settings of this application are loaded
+        self.settings.refresh()
 
         # update check
         self._update_thread = None
         self._update_worker = None
 
         # load ui files
-        ref = importlib.resources.files("pyjibe.head") / "main.ui"
-        with importlib.resources.as_file(ref) as path_ui:
-            uic.loadUi(path_ui, self)
+        uicache.setup_ui(self, "pyjibe.head", "main.ui")
 
         self.setWindowTitle("PyJibe {}".format(__version__))
         # Disable native menubar (e.g. on Mac)
@@ -77,10 +75,15 @@ class PyJibe(QtWidgets.QMainWindow):
         self.action_open_bulk.triggered.connect(self.on_open_bulk)
         self.action_open_single.triggered.connect(self.on_open_single)
         self.action_open_multiple.triggered.connect(self.on_open_multiple)
+        self.action_open_session.triggered.connect(self.on_open_session)
         # Edit menu
         self.actionPreferences.triggered.connect(self.on_preferences)
         # Tool menu
         self.actionConvert_AFM_data.triggered.connect(self.on_tool_convert)
+        self.actionTimings.triggered.connect(self.on_tool_timings)
+        self.actionRecordProfile.triggered.connect(
+            self.on_tool_record_profile)
+        self.apply_developer_mode()
         # Help menu
         self.actionDocumentation.triggered.connect(self.on_documentation)
         self.actionSoftware.triggered.connect(self.on_software)
@@ -100,6 +103,13 @@ class PyJibe(QtWidgets.QMainWindow):
                 + traceback.format_exc(),
                 )
 
+        #: Scheduler for the background jobs of all subwindows
+        self.scheduler = scheduler.ComputeScheduler(
+            max_workers=int(self.settings.value("advanced/compute workers",
+                                                0)))
+        self.mdiArea.subWindowActivated.connect(self.on_subwindow_activated)
+        self.settings.changed.connect(self.on_settings_changed)
+
         self.subwindows = []
         self.subwindow_data = []
         self.mdiArea.cascadeSubWindows()
@@ -120,14 +130,21 @@ class PyJibe(QtWidgets.QMainWindow):
         self.activateWindow()
         self.setWindowState(QtCore.Qt.WindowState.WindowActive)
 
+    def closeEvent(self, event):
+        """Stop the background workers (and write a pending profile)"""
+        for sub in self.subwindows:
+            finish_subwindow(sub)
+        self.scheduler.shutdown(wait=False)
+        self.on_tool_record_profile(False)
+        super(PyJibe, self).closeEvent(event)
+
     def load_data(self, files, retry_open=None, separate_analysis=False):
         """Load AFM data"""
-        # expand directories
-        data_files = []
-        for ff in files:
-            data_files += afmformats.find_data(ff)
+        # expand directories (the files are discovered while loading)
+        data_files = discovery.iter_data_files(files)
+        first = next(data_files, None)
 
-        if not data_files:
+        if first is None:
             ret = QtWidgets.QMessageBox.warning(
                 self,
                 "No AFM data found!",
@@ -137,23 +154,43 @@ class PyJibe(QtWidgets.QMainWindow):
             if retry_open is not None and ret == QtWidgets.QMessageBox.StandardButton.Retry:
                 retry_open()
         else:
-            # Make sure there are no duplicate files (#12)
-            data_files = sorted(set(data_files))
+            # Duplicate files are skipped during discovery (#12)
+            data_files = itertools.chain([first], data_files)
             if separate_analysis:
                 # open each file in one analysis
-                usable = [[ss] for ss in data_files]
+                usable = ([ss] for ss in data_files)
             else:
                 usable = [data_files]
             for flist in usable:
                 aclass = registry.fd.UiForceDistance
                 self.add_subwindow(aclass, flist)
 
-    def add_subwindow(self, aclass, flist):
+    def load_session(self, path):
+        """Restore a force-distance analysis from a session file"""
+        from ..fd import session
+        sess = session.load_session(path)
+        missing = [pp for pp in sess.files if not pp.exists()]
+        if missing:
+            QtWidgets.QMessageBox.warning(
+                self,
+                "Data files not found!",
+                "The following data files of the session could not be "
+                + "found:\n\n" + "\n".join(str(pp) for pp in missing),
+            )
+        files = [pp for pp in sess.files if pp.exists()]
+        if files:
+            aclass = registry.fd.UiForceDistance
+            self.add_subwindow(aclass, files, session=sess)
+
+    def add_subwindow(self, aclass, flist, session=None):
         """Add a subwindow, register data set and add to menu"""
         sub = PyJibeQMdiSubWindow()
-        inst = aclass(sub)
+        inst = aclass(sub, scheduler=self.scheduler)
         sub.setWidget(inst)
-        inst.add_files(flist)
+        if session is None:
+            inst.add_files(flist)
+        else:
+            inst.add_files(flist, session=session)
         self.mdiArea.addSubWindow(sub)
         sub.show()
         self.subwindows.append(sub)
@@ -165,11 +202,22 @@ class PyJibe(QtWidgets.QMainWindow):
                 action = menobj.addAction(choice[0])
                 action.triggered.connect(getattr(inst, choice[1]))
 
+    def apply_developer_mode(self):
+        """Show the developer tools if developer mode is enabled"""
+        # Timings are recorded in developer mode
+        devmode = bool(int(self.settings.value("advanced/developer mode", 0)))
+        self.actionTimings.setVisible(devmode)
+        self.actionRecordProfile.setVisible(devmode)
+        instrument.set_enabled(devmode)
+
     def rem_subwindow(self, title):
         """De-register a data set and remove from the menu"""
         for ii, sub in enumerate(self.subwindows):
             if sub.windowTitle() == title:
                 self.subwindows.pop(ii)
+                # discard pending background jobs
+                self.scheduler.cancel(sub.widget())
+                finish_subwindow(sub)
                 break
 
         for action in self.menuExport.actions():
@@ -265,6 +313,18 @@ class PyJibe(QtWidgets.QMainWindow):
                 self.settings.setValue("paths/load data",
                                        str(dlg.getDirectory()))
 
+    @QtCore.pyqtSlot()
+    def on_open_session(self):
+        from ..fd.session import SESSION_SUFFIX
+        search_dir = self.settings.value("paths/load data", "")
+        path, _e = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Open session", search_dir,
+            "PyJibe session (*{})".format(SESSION_SUFFIX))
+        if path:
+            self.load_session(path)
+            self.settings.setValue("paths/load data",
+                                   str(pathlib.Path(path).parent))
+
     @QtCore.pyqtSlot()
     def on_open_single(self):
         ext_opts = []
@@ -272,8 +332,9 @@ class PyJibe(QtWidgets.QMainWindow):
         exts = ["*"+e for e in registry.known_suffixes]
         ext_opts.append("Supported file types ({})".format(" ".join(exts)))
         # individual
+        from afmformats.formats import formats_by_suffix
         for suffix in registry.known_suffixes:
-            for item in afmformats.formats.formats_by_suffix[suffix]:
+            for item in formats_by_suffix[suffix]:
                 ext_opts.append("{} - {} (*{})".format(
                     item["maker"], item["descr"], suffix))
         exts_str = ";;".join(ext_opts)
@@ -293,22 +354,37 @@ class PyJibe(QtWidgets.QMainWindow):
         dlg = preferences.Preferences(self)
         dlg.exec()
 
+    @QtCore.pyqtSlot()
+    def on_settings_changed(self):
+        """Apply settings that were changed in the preferences"""
+        self.scheduler.set_max_workers(
+            int(self.settings.value("advanced/compute workers", 0)))
+        self.apply_developer_mode()
+
     @QtCore.pyqtSlot()
     def on_software(self):
-        libs = [afmformats,
-                h5py,
-                lmfit,
-                matplotlib,
-                nanite,
-                numpy,
-                sklearn,
-                scipy,
+        # module name and distribution name (the modules are not
+        # imported just for obtaining their version)
+        libs = [("afmformats", "afmformats"),
+                ("h5py", "h5py"),
+                ("lmfit", "lmfit"),
+                ("matplotlib", "matplotlib"),
+                ("nanite", "nanite"),
+                ("numpy", "numpy"),
+                ("sklearn", "scikit-learn"),
+                ("scipy", "scipy"),
                 ]
         sw_text = "PyJibe {}\n\n".format(__version__)
         sw_text += "Python {}\n\n".format(sys.version)
         sw_text += "Modules:\n"
-        for lib in libs:
-            sw_text += "- {} {}\n".format(lib.__name__, lib.__version__)
+        for name, dist in libs:
+            try:
+                version = importlib.metadata.version(dist)
+            except importlib.metadata.PackageNotFoundError:
+                # e.g. frozen executable without distribution metadata
+                version = getattr(importlib.import_module(name),
+                                  "__version__", "unknown")
+            sw_text += "- {} {}\n".format(name, version)
         sw_text += "- PyQt6 {}\n".format(QtCore.QT_VERSION_STR)
         if hasattr(sys, 'frozen'):
             sw_text += "\nThis executable has been created using PyInstaller."
@@ -316,11 +392,50 @@ class PyJibe(QtWidgets.QMainWindow):
                                           "Software",
                                           sw_text)
 
+    @QtCore.pyqtSlot(QtWidgets.QMdiSubWindow)
+    def on_subwindow_activated(self, sub):
+        """Process the background jobs of the active subwindow first"""
+        self.scheduler.set_active(sub.widget() if sub is not None else None)
+
     @QtCore.pyqtSlot()
     def on_tool_convert(self):
+        from .dlg_tool_convert import ConvertDialog
         dlg = ConvertDialog(self)
         dlg.show()
 
+    @QtCore.pyqtSlot(bool)
+    def on_tool_record_profile(self, record):
+        """Start or stop recording a profile of all subsequent actions"""
+        if record:
+            out_dir = QtWidgets.QFileDialog.getExistingDirectory(
+                self, "Select output directory for profiles",
+                self.settings.value("paths/profile", ""))
+            if not out_dir:
+                # user pressed cancel
+                self.actionRecordProfile.setChecked(False)
+                return
+            self.settings.setValue("paths/profile", out_dir)
+            profiler.start()
+            self.statusbar.showMessage("Recording profile...")
+        elif profiler.is_recording():
+            path = pathlib.Path(self.settings.value("paths/profile")) \
+                / time.strftime("pyjibe_profile_%Y-%m-%d_%H.%M.%S.pstats")
+            profiler.stop(path)
+            self.statusbar.showMessage("Profile written to {}".format(path))
+
+    @QtCore.pyqtSlot()
+    def on_tool_timings(self):
+        from .dlg_instrument import InstrumentDialog
+        dlg = InstrumentDialog(self)
+        dlg.show()
+
+
+def finish_subwindow(sub):
+    """Let the analysis of a subwindow write pending results"""
+    inst = sub.widget()
+    if hasattr(inst, "finish"):
+        inst.finish()
+
 
 def excepthook(etype, value, trace):
     """
@@ -1,12 +1,12 @@
 import os.path as os_path
-import importlib.resources
 import traceback
 
-import nanite
-from PyQt6 import uic, QtCore, QtWidgets
+from PyQt6 import QtCore, QtWidgets
 from PyQt6.QtCore import QStandardPaths
 
 from ..extensions import ExtensionManager, SUPPORTED_FORMATS
+from ..settings import get_settings
+from .. import uicache
 
 
 class ExtensionErrorWrapper:
@@ -35,16 +35,19 @@ class Preferences(QtWidgets.QDialog):
 
     def __init__(self, parent, *args, **kwargs):
         QtWidgets.QWidget.__init__(self, parent=parent, *args, **kwargs)
-        ref = importlib.resources.files("pyjibe.head") / "preferences.ui"
-        with importlib.resources.as_file(ref) as path_ui:
-            uic.loadUi(path_ui, self)
-        self.settings = QtCore.QSettings()
+        uicache.setup_ui(self, "pyjibe.head", "preferences.ui")
+        self.settings = get_settings()
         self.parent = parent
 
         #: configuration keys, corresponding widgets, and defaults
         self.config_pairs = [
+            ["advanced/batch fit", self.advanced_batch_fit, 0],
+            ["advanced/compute workers", self.advanced_compute_workers, 0],
             ["advanced/developer mode", self.advanced_developer_mode, 0],
             ["advanced/expert mode", self.advanced_expert_mode, 0],
+            ["advanced/lazy open", self.advanced_lazy_open, 0],
+            ["advanced/scratch store", self.advanced_scratch_store, 0],
+            ["advanced/warm start", self.advanced_warm_start, 0],
             ["check for updates", self.general_check_for_updates, 1],
         ]
 
@@ -85,6 +88,8 @@ class Preferences(QtWidgets.QDialog):
                 widget.setChecked(bool(int(value)))
             elif isinstance(widget, QtWidgets.QLineEdit):
                 widget.setText(value)
+            elif isinstance(widget, QtWidgets.QSpinBox):
+                widget.setValue(int(value))
             elif widget is self.dcor_servers:
                 self.dcor_servers.clear()
                 self.dcor_servers.addItems(value)
@@ -94,6 +99,7 @@ class Preferences(QtWidgets.QDialog):
 
         # peculiarities of developer mode
         devmode = bool(int(self.settings.value("advanced/developer mode", 0)))
+        import nanite.read
         if devmode:
             nanite.read.DEFAULT_MODALITY = None
         else:
@@ -208,6 +214,8 @@ class Preferences(QtWidgets.QDialog):
                         msg.exec()
             elif isinstance(widget, QtWidgets.QLineEdit):
                 value = widget.text().strip()
+            elif isinstance(widget, QtWidgets.QSpinBox):
+                value = widget.value()
             elif widget is self.dcor_servers:
                 curtext = self.dcor_servers.currentText()
                 items = self.settings.value(key, default)
@@ -218,6 +226,8 @@ class Preferences(QtWidgets.QDialog):
             else:
                 raise NotImplementedError("No rule for '{}'".format(key))
             self.settings.setValue(key, value)
+        # notify all widgets
+        self.settings.refresh()
 
         # reload UI to give visual feedback
         self.reload()
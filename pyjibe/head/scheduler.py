@@ -0,0 +1,182 @@
+"""Application-wide scheduling of background computations
+
+All analysis subwindows submit their background jobs (parsing curve
+data, preprocessing, fitting, rating) to one :class:`ComputeScheduler`
+owned by the main window. The number of worker threads is limited
+globally, so that opening many subwindows does not oversubscribe the
+CPUs. Jobs are queued per owner (subwindow) and the workers serve the
+owners in a fair-share manner, with the active (visible) subwindow
+first.
+"""
+import collections
+import concurrent.futures
+import os
+import threading
+
+from .. import profiler
+
+
+def get_default_workers():
+    """Number of workers used if the user did not specify it"""
+    return max(1, (os.cpu_count() or 1) - 1)
+
+
+class ComputeScheduler:
+    def __init__(self, max_workers=None):
+        """Fair-share thread pool for background computations
+
+        Parameters
+        ----------
+        max_workers: int
+            number of worker threads; if None or 0,
+            :func:`get_default_workers` is used
+        """
+        self._lock = threading.Lock()
+        self._condition = threading.Condition(self._lock)
+        #: pending jobs for each owner (in submission order)
+        self._queues = collections.OrderedDict()
+        #: number of running jobs for each owner
+        self._running = collections.Counter()
+        self._active = None
+        self._workers = []
+        self._num_idle = 0
+        self._shutdown = False
+        self.max_workers = max_workers or get_default_workers()
+
+    @property
+    def num_workers(self):
+        """Number of worker threads currently alive"""
+        with self._lock:
+            return len(self._workers)
+
+    def cancel(self, owner):
+        """Cancel all pending jobs of `owner`
+
+        Jobs that are already running are not interrupted.
+        """
+        with self._lock:
+            queue = self._queues.pop(owner, None)
+        if queue:
+            for future, _ in queue:
+                future.cancel()
+
+    def set_active(self, owner):
+        """Process the jobs of `owner` before the jobs of other owners"""
+        with self._lock:
+            self._active = owner
+
+    def set_max_workers(self, max_workers):
+        """Change the number of worker threads
+
+        Surplus workers exit after their current job.
+        """
+        with self._lock:
+            self.max_workers = max_workers or get_default_workers()
+            self._condition.notify_all()
+            self._num_idle = 0
+            num_pending = sum(len(queue) for queue in self._queues.values())
+            while len(self._workers) < min(self.max_workers, num_pending):
+                self._spawn_worker()
+
+    def shutdown(self, wait=True):
+        """Cancel all pending jobs and stop the worker threads"""
+        with self._lock:
+            self._shutdown = True
+            queues = list(self._queues.values())
+            self._queues.clear()
+            workers = list(self._workers)
+            self._condition.notify_all()
+            self._num_idle = 0
+        for queue in queues:
+            for future, _ in queue:
+                future.cancel()
+        if wait:
+            for thread in workers:
+                thread.join()
+
+    def submit(self, owner, func, *args, **kwargs):
+        """Submit a job
+
+        Parameters
+        ----------
+        owner: object
+            the owner of the job (e.g. a subwindow); jobs of the
+            same owner are started in the order they were submitted
+        func: callable
+            the function to run in a worker thread
+        *args, **kwargs:
+            arguments for `func`
+
+        Returns
+        -------
+        future: concurrent.futures.Future
+            the result of the job
+        """
+        future = concurrent.futures.Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit jobs after shutdown!")
+            queue = self._queues.setdefault(owner, collections.deque())
+            queue.append((future, (func, args, kwargs)))
+            if self._num_idle:
+                # wake up an idle worker
+                self._num_idle -= 1
+                self._condition.notify()
+            elif len(self._workers) < self.max_workers:
+                self._spawn_worker()
+        return future
+
+    def _spawn_worker(self):
+        """Start a new worker thread (lock must be held)"""
+        thread = threading.Thread(
+            target=self._work,
+            name="PyJibeCompute-{}".format(len(self._workers)),
+            daemon=True)
+        self._workers.append(thread)
+        thread.start()
+
+    def _next_job(self):
+        """Return the owner and job to run next (lock must be held)
+
+        The active owner comes first. Otherwise, the owner with the
+        fewest running jobs is chosen; among those, the owner that
+        was served least recently.
+        """
+        if self._active in self._queues:
+            owner = self._active
+        else:
+            owner = min(self._queues, key=lambda key: self._running[key])
+        queue = self._queues.pop(owner)
+        job = queue.popleft()
+        if queue:
+            # move the owner to the end (round robin)
+            self._queues[owner] = queue
+        return owner, job
+
+    def _work(self):
+        thread = threading.current_thread()
+        while True:
+            with self._lock:
+                while (not self._queues
+                       and not self._shutdown
+                       and len(self._workers) <= self.max_workers):
+                    # `_num_idle` is decremented by the thread that
+                    # wakes this worker up
+                    self._num_idle += 1
+                    self._condition.wait()
+                if self._shutdown or len(self._workers) > self.max_workers:
+                    self._workers.remove(thread)
+                    return
+                owner, (future, (func, args, kwargs)) = self._next_job()
+                self._running[owner] += 1
+            if future.set_running_or_notify_cancel():
+                try:
+                    result = profiler.runcall(func, *args, **kwargs)
+                except BaseException as exc:
+                    future.set_exception(exc)
+                else:
+                    future.set_result(result)
+            with self._lock:
+                self._running[owner] -= 1
+                if not self._running[owner]:
+                    del self._running[owner]
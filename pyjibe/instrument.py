@@ -0,0 +1,182 @@
+"""Timing instrumentation of the analysis pipeline
+
+The stages of the analysis pipeline (loading, preprocessing, fitting,
+rating, autosaving, and plotting) are wrapped with :func:`timed`
+(functions) or :func:`timing` (code blocks).
+When recording is enabled (see :func:`set_enabled`), the duration of
+each call is added to a per-stage histogram and to a trace of recent
+events, which can be exported as JSON or in the Chrome trace event
+format (chrome://tracing, https://ui.perfetto.dev). When recording is
+disabled, the wrappers only check a flag.
+"""
+import bisect
+import collections
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+
+#: upper bin edges of the duration histograms [s] (the last bin
+#: contains all durations above the last edge)
+HISTOGRAM_EDGES = [10**(ee / 2) for ee in range(-10, 3)]
+#: maximum number of events kept for the trace
+MAX_TRACE_EVENTS = 100000
+
+
+class StageStatistics:
+    def __init__(self):
+        """Aggregated durations of one pipeline stage"""
+        self.count = 0
+        self.total = 0.
+        self.min = float("inf")
+        self.max = 0.
+        self.histogram = [0] * (len(HISTOGRAM_EDGES) + 1)
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        self.min = min(self.min, duration)
+        self.max = max(self.max, duration)
+        self.histogram[bisect.bisect_left(HISTOGRAM_EDGES, duration)] += 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.
+
+    def to_dict(self):
+        return {"count": self.count,
+                "total [s]": self.total,
+                "mean [s]": self.mean,
+                "min [s]": self.min if self.count else 0.,
+                "max [s]": self.max,
+                "histogram": self.histogram,
+                }
+
+
+class _Recorder:
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            #: statistics for each stage
+            self.stages = collections.OrderedDict()
+            #: recent events (stage, start, duration, thread id)
+            self.events = collections.deque(maxlen=MAX_TRACE_EVENTS)
+            #: time origin of the trace
+            self.origin = time.perf_counter()
+
+    def add(self, stage, start, duration):
+        with self._lock:
+            if stage not in self.stages:
+                self.stages[stage] = StageStatistics()
+            self.stages[stage].add(duration)
+            self.events.append(
+                (stage, start, duration, threading.get_ident()))
+
+
+_recorder = _Recorder()
+
+
+def is_enabled():
+    """Whether timings are currently recorded"""
+    return _recorder.enabled
+
+
+def set_enabled(enabled):
+    """Enable or disable recording of timings"""
+    _recorder.enabled = bool(enabled)
+
+
+def reset():
+    """Discard all recorded timings"""
+    _recorder.reset()
+
+
+def timed(stage):
+    """Decorator recording the duration of a function call
+
+    Parameters
+    ----------
+    stage: str
+        name of the pipeline stage (e.g. "fit_approach_retract")
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _recorder.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                _recorder.add(stage, start, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+@contextlib.contextmanager
+def timing(stage):
+    """Context manager recording the duration of a code block
+
+    Parameters
+    ----------
+    stage: str
+        name of the pipeline stage (see :func:`timed`)
+    """
+    if not _recorder.enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _recorder.add(stage, start, time.perf_counter() - start)
+
+
+def get_statistics():
+    """Return the aggregated statistics for each stage
+
+    Returns
+    -------
+    statistics: dict
+        for each stage, a dictionary with the number of calls,
+        the total, mean, minimum, and maximum duration, and the
+        histogram of the durations (see :data:`HISTOGRAM_EDGES`)
+    """
+    with _recorder._lock:
+        return {stage: stats.to_dict()
+                for stage, stats in _recorder.stages.items()}
+
+
+def export_json(path):
+    """Export the aggregated statistics to a JSON file"""
+    data = {"histogram edges [s]": HISTOGRAM_EDGES,
+            "stages": get_statistics()}
+    with open(path, "w", encoding="utf-8") as fd:
+        json.dump(data, fd, indent=2)
+
+
+def export_chrome_trace(path):
+    """Export the recorded events in the Chrome trace event format"""
+    with _recorder._lock:
+        events = list(_recorder.events)
+        origin = _recorder.origin
+    pid = os.getpid()
+    trace = []
+    for stage, start, duration, tid in events:
+        # complete events with timestamps in microseconds
+        trace.append({"name": stage,
+                      "ph": "X",
+                      "ts": (start - origin) * 1e6,
+                      "dur": duration * 1e6,
+                      "pid": pid,
+                      "tid": tid,
+                      })
+    with open(path, "w", encoding="utf-8") as fd:
+        json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, fd)
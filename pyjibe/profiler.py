@@ -0,0 +1,107 @@
+"""On-demand profiling of PyJibe with :mod:`cProfile`
+
+While a profile is recorded (see :func:`start` and :func:`stop`),
+the main thread is profiled. Background jobs of the compute scheduler
+are run with :func:`runcall`, which profiles them in the worker
+threads. When the recording is stopped, all profiles are merged and
+written to a .pstats file (e.g. for snakeviz or `python -m pstats`).
+
+Since Python 3.12, :mod:`cProfile` uses the process-wide
+:mod:`sys.monitoring` and only one profiler can be active at a time.
+The profiler of the main thread then records all threads and the
+worker threads are not profiled separately.
+"""
+import cProfile
+import pstats
+import sys
+import threading
+
+
+#: whether the profiler of the main thread records all threads
+PROFILE_ALL_THREADS = sys.version_info >= (3, 12)
+
+
+class ProfileSession:
+    def __init__(self):
+        """Profiles recorded in the main thread and in worker threads"""
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._main = cProfile.Profile()
+        #: profiles of the worker threads
+        self._workers = []
+
+    def get_thread_profile(self):
+        """Return the profile of the current (worker) thread"""
+        profile = getattr(self._local, "profile", None)
+        if profile is None:
+            profile = self._local.profile = cProfile.Profile()
+            with self._lock:
+                self._workers.append(profile)
+        return profile
+
+    def start(self):
+        self._main.enable()
+
+    def stop(self, path):
+        """Stop profiling and write the merged profiles to `path`"""
+        self._main.disable()
+        stats = pstats.Stats(self._main)
+        with self._lock:
+            for profile in self._workers:
+                if profile.getstats():
+                    stats.add(profile)
+        stats.dump_stats(str(path))
+        return stats
+
+
+_session = None
+
+
+def is_recording():
+    """Whether a profile is currently recorded"""
+    return _session is not None
+
+
+def start():
+    """Start recording a profile"""
+    global _session
+    if _session is not None:
+        raise RuntimeError("A profile is already being recorded!")
+    _session = ProfileSession()
+    _session.start()
+
+
+def stop(path):
+    """Stop recording and write the profile to `path` (.pstats)
+
+    Returns
+    -------
+    stats: pstats.Stats
+        the recorded profile
+    """
+    global _session
+    if _session is None:
+        raise RuntimeError("No profile is being recorded!")
+    session = _session
+    _session = None
+    return session.stop(path)
+
+
+def runcall(func, *args, **kwargs):
+    """Call `func`, profiling it if a profile is being recorded
+
+    This is used for functions called in worker threads.
+    """
+    session = _session
+    if session is None or PROFILE_ALL_THREADS:
+        return func(*args, **kwargs)
+    profile = session.get_thread_profile()
+    try:
+        profile.enable()
+    except ValueError:
+        # another profiling tool is active
+        return func(*args, **kwargs)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profile.disable()
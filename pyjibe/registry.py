@@ -1,16 +1,37 @@
-from afmformats.formats import formats_by_modality
+"""Registry of analysis types
+
+`analysis_types` and `known_suffixes` are computed on first access,
+so that importing this module does not import afmformats and the
+analysis GUIs (and with them the scientific stack).
+"""
+import functools
 
 from . import fd
 
 
-analysis_types = {
-    "fd": {
-        "suffixes": [f["suffix"]
-                     for f in formats_by_modality["force-distance"]],
-        "gui": fd.UiForceDistance,
+@functools.lru_cache()
+def get_analysis_types():
+    from afmformats.formats import formats_by_modality
+    return {
+        "fd": {
+            "suffixes": [f["suffix"]
+                         for f in formats_by_modality["force-distance"]],
+            "gui": fd.UiForceDistance,
+        }
     }
-}
 
-known_suffixes = []
-for _item in analysis_types.values():
-    known_suffixes += _item["suffixes"]
+
+@functools.lru_cache()
+def get_known_suffixes():
+    known_suffixes = []
+    for _item in get_analysis_types().values():
+        known_suffixes += _item["suffixes"]
+    return known_suffixes
+
+
+def __getattr__(name):
+    if name == "analysis_types":
+        return get_analysis_types()
+    elif name == "known_suffixes":
+        return get_known_suffixes()
+    raise AttributeError(name)
@@ -0,0 +1,66 @@
+"""In-memory snapshot of the PyJibe settings
+
+Reading from :class:`PyQt6.QtCore.QSettings` is slow with the INI
+backend, which is a problem for settings that are read for every
+curve (e.g. the developer mode when fitting or exporting). All
+PyJibe widgets share one :class:`SettingsSnapshot` (see
+:func:`get_settings`) that keeps the settings in memory and writes
+changes through to QSettings.
+"""
+import threading
+
+from PyQt6 import QtCore
+
+
+class SettingsSnapshot(QtCore.QObject):
+    #: emitted when the settings were (re)loaded from QSettings
+    changed = QtCore.pyqtSignal()
+
+    def __init__(self, *args, **kwargs):
+        """Write-through cache for QSettings
+
+        The methods `value`, `setValue`, `clear`, and `sync` behave
+        like those of QSettings, so the snapshot can be used in its
+        place. Call :func:`SettingsSnapshot.refresh` if the settings
+        were modified with a separate QSettings instance.
+        """
+        super(SettingsSnapshot, self).__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+        self._values = {}
+        self.refresh()
+
+    def clear(self):
+        settings = QtCore.QSettings()
+        settings.clear()
+        settings.sync()
+        self.refresh()
+
+    def refresh(self):
+        """Reload all settings from QSettings and emit `changed`"""
+        settings = QtCore.QSettings()
+        values = {key: settings.value(key) for key in settings.allKeys()}
+        with self._lock:
+            self._values = values
+        self.changed.emit()
+
+    def setValue(self, key, value):
+        QtCore.QSettings().setValue(key, value)
+        with self._lock:
+            self._values[key] = value
+
+    def sync(self):
+        QtCore.QSettings().sync()
+
+    def value(self, key, default=None):
+        return self._values.get(key, default)
+
+
+_snapshot = None
+
+
+def get_settings():
+    """Return the settings snapshot shared by all widgets"""
+    global _snapshot
+    if _snapshot is None:
+        _snapshot = SettingsSnapshot()
+    return _snapshot
@@ -0,0 +1,101 @@
+"""Cached Python form classes for Qt Designer .ui files
+
+Parsing a .ui file with :func:`PyQt6.uic.loadUi` every time a widget
+is created is slow (e.g. for many subwindows in "open multiple" mode).
+Instead, each .ui file is compiled to Python code once, stored in the
+cache directory, and imported as a module. The form classes are kept
+in memory, so subsequent widgets only run the generated `setupUi`.
+"""
+import functools
+import hashlib
+import importlib.resources
+import importlib.util
+import io
+import logging
+import pathlib
+import sys
+
+from PyQt6 import QtCore, uic
+from PyQt6.QtCore import QStandardPaths
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_cache_dir():
+    """Return the directory where compiled .ui files are stored"""
+    return pathlib.Path(QStandardPaths.writableLocation(
+        QStandardPaths.StandardLocation.CacheLocation)) / "ui"
+
+
+@functools.lru_cache(maxsize=None)
+def get_form_class(package, name):
+    """Return the form class generated from a .ui file
+
+    Parameters
+    ----------
+    package: str
+        package containing the .ui file (e.g. "pyjibe.fd")
+    name: str
+        name of the .ui file (e.g. "tab_fit.ui")
+
+    Returns
+    -------
+    form_class: type
+        the `Ui_*` class generated by :func:`PyQt6.uic.compileUi`
+    """
+    ui_data = (importlib.resources.files(package) / name).read_bytes()
+    # The compiled code depends on the .ui file and on the code generator.
+    ui_hash = hashlib.md5(
+        ui_data + QtCore.PYQT_VERSION_STR.encode()).hexdigest()
+    module_name = "{}_{}".format(pathlib.Path(name).stem, ui_hash[:16])
+    path_py = get_cache_dir() / (module_name + ".py")
+    if not path_py.exists():
+        source = io.StringIO()
+        uic.compileUi(io.StringIO(ui_data.decode("utf-8")), source)
+        try:
+            path_py.parent.mkdir(parents=True, exist_ok=True)
+            # write atomically (several processes may start at once)
+            path_tmp = path_py.with_suffix(".tmp")
+            path_tmp.write_text(source.getvalue(), encoding="utf-8")
+            path_tmp.replace(path_py)
+        except OSError:
+            logger.warning("Cannot write ui cache '%s'", path_py)
+            namespace = {}
+            exec(compile(source.getvalue(), name, "exec"), namespace)
+            return _find_form_class(namespace.values())
+    spec = importlib.util.spec_from_file_location(
+        "pyjibe_ui_" + module_name, path_py)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    sys.modules[spec.name] = module
+    return _find_form_class(vars(module).values())
+
+
+def _find_form_class(objects):
+    for obj in objects:
+        if isinstance(obj, type) and obj.__name__.startswith("Ui_"):
+            return obj
+    raise ValueError("No form class found in compiled ui file!")
+
+
+def setup_ui(widget, package, name):
+    """Set up a widget from a .ui file (replacement for `uic.loadUi`)
+
+    Like :func:`PyQt6.uic.loadUi`, the child widgets, layouts, and
+    actions defined in the .ui file become attributes of `widget`.
+
+    Parameters
+    ----------
+    widget: QtWidgets.QWidget
+        the top-level widget of the form
+    package: str
+        package containing the .ui file (e.g. "pyjibe.fd")
+    name: str
+        name of the .ui file (e.g. "tab_fit.ui")
+    """
+    form = get_form_class(package, name)()
+    form.setupUi(widget)
+    for key, value in vars(form).items():
+        setattr(widget, key, value)
+    return form
@@ -1,4 +1,54 @@
 """Helper methods for handling units in PyJibe"""
+import collections
+import functools
+
+import numpy as np
+
+
+#: Resolved scale of a parameter (see :func:`get_unit_info`)
+UnitInfo = collections.namedtuple("UnitInfo", ["factor", "unit", "label"])
+
+
+@functools.lru_cache(maxsize=None)
+def get_unit_info(name, si_unit=None):
+    """Resolve the human-readable scale of a parameter
+
+    The result is cached, because this function is called for
+    every parameter of every curve (e.g. in tables and exports).
+
+    Parameters
+    ----------
+    name: str
+        The parameter name string, see `human_units`.
+    si_unit: str
+        The SI unit of the parameter (used if `name` is not
+        in `human_units`).
+
+    Returns
+    -------
+    info: UnitInfo
+        `factor` is the value of one human-readable unit in SI
+        units (e.g. 1e-6 for "µm"), `unit` is the unit including
+        the scale (e.g. "µm", or "" for unitless parameters),
+        and `label` is the name with unit (e.g. "Tip radius [µm]").
+    """
+    lname = name.lower()
+    if lname in human_units:
+        scalename, unit = human_units[lname]
+        factor = scales[scalename]
+        scaleunit = scalename + unit
+    elif si_unit in default_scales:
+        scalename = default_scales[si_unit]
+        factor = scales[scalename]
+        scaleunit = scalename + si_unit
+    elif si_unit is not None:
+        factor = 1
+        scaleunit = si_unit
+    else:
+        factor = 1
+        scaleunit = ""
+    label = "{} [{}]".format(name, scaleunit) if scaleunit else name
+    return UnitInfo(factor, scaleunit, label)
 
 
 def si2hr(name, value, si_unit=None):
@@ -19,67 +69,44 @@ def si2hr(name, value, si_unit=None):
     scaleunit: str
         The unit including the scale, e.g. "µm".
     """
-    name = name.lower()
-    if name in human_units:
-        scalename, unit = human_units[name]
-        scale = scales[scalename]
-        hr_value = value/scale
-        scaleunit = scalename + unit
-    elif si_unit in default_scales:
-        scalename = default_scales[si_unit]
-        scale = scales[scalename]
-        hr_value = value/scale
-        scaleunit = scalename + si_unit
-    elif si_unit is not None:
-        hr_value = value
-        scaleunit = si_unit
-    else:
-        hr_value = value
-        scaleunit = ""
-    return hr_value, scaleunit
+    info = get_unit_info(name, si_unit)
+    if info.factor != 1:
+        value = value / info.factor
+    return value, info.unit
+
+
+def si2hr_array(name, values, si_unit=None):
+    """Convert a column of values in SI units to human readable units
+
+    Same as :func:`si2hr`, but `values` (e.g. a list with one
+    value for each curve) are converted at once to a float array.
+    """
+    info = get_unit_info(name, si_unit)
+    return np.asarray(values, dtype=float) / info.factor, info.unit
 
 
 def hrscale(name, si_unit=None):
     """Returns the multiplier for unit scale conversion, e.g. 1e6 for µm"""
-    name = name.lower()
-    if name in human_units:
-        scalename, _unit = human_units[name]
-        scale = 1/scales[scalename]
-    elif si_unit in default_scales:
-        scalename = default_scales[si_unit]
-        scale = 1/scales[scalename]
-    else:
-        scale = 1
-    return scale
+    return 1 / get_unit_info(name, si_unit).factor
 
 
+@functools.lru_cache(maxsize=None)
 def hrunit(name, si_unit=None):
     """Returns the unit name for scale conversion, e.g. µm"""
-    name = name.lower()
-    if name in human_units:
-        scalename, unit = human_units[name]
-        scaleunit = scalename + unit
+    lname = name.lower()
+    if lname in human_units:
+        unit = human_units[lname][1]
         if si_unit is not None and si_unit != unit:
             raise ValueError(
                 "Bad `si_unit` '{}' given for '{}', expected '{}'! ".format(
                     si_unit, name, unit))
-    elif si_unit in default_scales:
-        scaleunit = default_scales[si_unit] + si_unit
-    elif si_unit is not None:
-        scaleunit = si_unit
-    else:
-        scaleunit = ""
-    return scaleunit
+    return get_unit_info(name, si_unit).unit
 
 
 def hrscname(name, si_unit=None):
     """Returns the name with human readable units, e.g. Force [nN]"""
-    unit = hrunit(name, si_unit=si_unit)
-    if unit == "":
-        hrscname = name
-    else:
-        hrscname = "{} [{}]".format(name, unit)
-    return hrscname
+    hrunit(name, si_unit=si_unit)  # check `si_unit`
+    return get_unit_info(name, si_unit).label
 
 
 # TODO:
@@ -3,12 +3,54 @@ import shutil
 import tempfile
 
 import lmfit
+import nanite
 import nanite.model
 from nanite.model import residuals
 import numpy as np
 
+from pyjibe.fd.fit_settings import FitSettings
+
 data_dir = here = pathlib.Path(__file__).parent / "data"
 
+PREPROCESSING = ["compute_tip_position",
+                 "correct_force_offset",
+                 "correct_tip_offset"]
+
+
+def make_synthetic_map(size=4):
+    """Replicate the curves of the 2x2 map on a dense grid"""
+    grp = nanite.IndentationGroup(data_dir / "map2x2_extracted.jpk-force-map")
+    data_set = []
+    for iy in range(size):
+        for ix in range(size):
+            src = grp[(iy * size + ix) % len(grp)]
+            meta = {key: src.metadata[key] for key in src.metadata}
+            meta.update({"enum": iy * size + ix,
+                         "grid index x": ix,
+                         "grid index y": iy})
+            data = {col: src[col] for col in src.columns_innate}
+            data_set.append(nanite.Indentation(data=data, metadata=meta))
+    return data_set
+
+
+def make_fit_settings():
+    """Fit settings for the Hertz model as used in the GUI"""
+    params = nanite.model.models_available["hertz_para"] \
+        .get_parameter_defaults()
+    params["R"].set(value=37.28e-6)
+    return FitSettings.from_kwargs({"model_key": "hertz_para",
+                                    "params_initial": params,
+                                    "range_x": (0, 0),
+                                    "range_type": "absolute",
+                                    "x_axis": "tip position",
+                                    "y_axis": "force",
+                                    "weight_cp": 2e-6,
+                                    "segment": "approach",
+                                    "optimal_fit_edelta": False,
+                                    "optimal_fit_num_samples": 100,
+                                    "gcf_k": 1.0,
+                                    })
+
 
 class MockModelModule:
     def __init__(self, model_key, **kwargs):
@@ -0,0 +1,48 @@
+"""Test of AFM data file discovery"""
+import shutil
+
+import afmformats
+
+from pyjibe import discovery
+
+from helpers import data_dir
+
+
+def test_iter_data_files(tmp_path):
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    (tmp_path / "c").mkdir()
+    shutil.copy2(data_dir / "spot3-0192.jpk-force", tmp_path / "a")
+    shutil.copy2(data_dir / "spot3-0192.jpk-force", tmp_path / "a" / "b")
+    shutil.copy2(data_dir / "map2x2_extracted.jpk-force-map", tmp_path / "c")
+    shutil.copy2(data_dir / "map2x2_extracted.jpk-force-map",
+                 tmp_path / "a" / "z.jpk-force-map")
+    # not AFM data
+    (tmp_path / "c" / "notes.txt").write_text("hello")
+    (tmp_path / "c" / "image.png").write_bytes(b"")
+
+    found = discovery.iter_data_files([tmp_path])
+    # this is a generator
+    assert next(found) == tmp_path / "a" / "b" / "spot3-0192.jpk-force"
+    found = list(discovery.iter_data_files([tmp_path]))
+    assert found == sorted(afmformats.find_data(tmp_path))
+    assert len(found) == 4
+    # duplicates are removed
+    found2 = list(discovery.iter_data_files(
+        [tmp_path / "c", tmp_path, tmp_path / "a" / "spot3-0192.jpk-force"]))
+    assert sorted(found2) == found
+    # suffix matching only
+    found3 = list(discovery.iter_data_files([tmp_path], detect=False))
+    assert tmp_path / "c" / "notes.txt" in found3
+    assert tmp_path / "c" / "image.png" not in found3
+
+
+def test_iter_data_files_order(tmp_path):
+    (tmp_path / "a").mkdir()
+    shutil.copy2(data_dir / "spot3-0192.jpk-force", tmp_path / "a")
+    shutil.copy2(data_dir / "spot3-0192.jpk-force",
+                 tmp_path / "a.jpk-force")
+    found = list(discovery.iter_data_files([tmp_path]))
+    # entries are sorted by name within each directory
+    assert found == [tmp_path / "a" / "spot3-0192.jpk-force",
+                     tmp_path / "a.jpk-force"]
+    assert sorted(found) == sorted(afmformats.find_data(tmp_path))
@@ -0,0 +1,79 @@
+"""Test of the cached computation of ancillary parameters"""
+import threading
+from unittest import mock
+
+import nanite
+import numpy as np
+
+from pyjibe.fd import ancillaries, export
+from pyjibe.head.scheduler import ComputeScheduler
+
+from helpers import (PREPROCESSING, data_dir, make_fit_settings,
+                     make_synthetic_map)
+
+
+def test_ancillaries_cache():
+    fdist = nanite.IndentationGroup(data_dir / "spot3-0192.jpk-force")[0]
+    fdist.apply_preprocessing(PREPROCESSING)
+    with mock.patch.object(ancillaries.nmodel, "compute_anc_parms",
+                           wraps=ancillaries.nmodel.compute_anc_parms
+                           ) as compute:
+        anc = ancillaries.get_ancillary_parameters(fdist)
+        assert np.isnan(anc["max_indent"])
+        assert ancillaries.is_cached(fdist)
+        ancillaries.get_ancillary_parameters(fdist)
+        assert compute.call_count == 1
+        # new initial parameters
+        fit_settings = make_fit_settings()
+        fdist.fit_properties["params_initial"] = fit_settings.get_params()
+        assert not ancillaries.is_cached(fdist)
+        ancillaries.get_ancillary_parameters(fdist)
+        assert compute.call_count == 2
+        # the maximum indentation requires a fit
+        fdist.fit_model(**fit_settings.to_kwargs())
+        anc_fit = ancillaries.get_ancillary_parameters(fdist)
+        assert compute.call_count == 3
+        assert anc_fit["max_indent"] > 0
+        # other preprocessing
+        fdist.apply_preprocessing(["compute_tip_position",
+                                   "correct_tip_offset"])
+        anc = ancillaries.get_ancillary_parameters(fdist)
+        assert compute.call_count == 4
+        assert np.isnan(anc["max_indent"])
+    ancillaries.invalidate(fdist)
+    assert not ancillaries.is_cached(fdist)
+
+
+def test_ancillaries_batch_scheduler(tmp_path):
+    data_set = make_synthetic_map(size=5)
+    for fdist in data_set:
+        fdist.apply_preprocessing(PREPROCESSING)
+        fdist.fit_model(**make_fit_settings().to_kwargs())
+    scheduler = ComputeScheduler(max_workers=2)
+    threads = set()
+    compute_orig = nanite.model.compute_anc_parms
+
+    def compute_anc_parms(*args, **kwargs):
+        threads.add(threading.get_ident())
+        return compute_orig(*args, **kwargs)
+
+    try:
+        with mock.patch.object(ancillaries.nmodel, "compute_anc_parms",
+                               side_effect=compute_anc_parms) as compute:
+            anc_list = ancillaries.compute_ancillary_parameters(
+                data_set, scheduler=scheduler, owner=object())
+            assert compute.call_count == 25
+            assert threading.get_ident() not in threads
+            # the export uses the cached values
+            export.save_tsv_metadata_results(
+                filename=tmp_path / "export.tsv",
+                fdist_list=data_set,
+                which=["params_ancillary"],
+                scheduler=scheduler)
+            assert compute.call_count == 25
+    finally:
+        scheduler.shutdown()
+    for fdist, anc in zip(data_set, anc_list):
+        assert anc == fdist.get_ancillary_parameters()
+    text = (tmp_path / "export.tsv").read_text()
+    assert "Maximum indentation" in text
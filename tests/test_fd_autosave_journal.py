@@ -0,0 +1,141 @@
+"""Test of the append-only journal of the autosaved results"""
+import json
+import os
+import subprocess
+import sys
+import time
+from unittest import mock
+
+from PyQt6 import QtCore
+
+import pyjibe.head
+from pyjibe.fd import autosave_journal, export
+
+from helpers import (PREPROCESSING, make_directory_with_data,
+                     make_fit_settings, make_synthetic_map)
+
+
+def make_fitted_curves(size=2):
+    data_set = make_synthetic_map(size=size)
+    for fdist in data_set:
+        fdist.apply_preprocessing(PREPROCESSING)
+        fdist.fit_model(**make_fit_settings().to_kwargs())
+    return data_set
+
+
+def save_reference(path, fdist_list):
+    export.save_tsv_metadata_results(
+        path, fdist_list, which=autosave_journal.AUTOSAVE_CHOICES)
+    return path.read_bytes()
+
+
+def test_journal_compact(tmp_path):
+    data_set = make_fitted_curves()
+    fname = tmp_path / "pyjibe_fit_results_leaf.tsv"
+    save_reference(fname, data_set[1:3])
+    journal = autosave_journal.AutosaveJournal(
+        fname, model_key="hertz_para", curves=data_set[1:3], indices=[1, 2])
+    assert not journal.path.exists()
+    journal.append(data_set[3], index=3)
+    journal.append(data_set[0], index=0)
+    # one line per record (header and initial curves come first)
+    lines = journal.path.read_text().splitlines()
+    assert len(lines) == 5
+    # unchanged results are not appended again
+    journal.append(data_set[0], index=0)
+    journal.append(data_set[2], index=2, use=False)
+    assert len(journal.path.read_text().splitlines()) == 6
+    journal.compact()
+    assert len(journal.path.read_text().splitlines()) == 5
+    reference = save_reference(tmp_path / "ref.tsv",
+                               [data_set[0], data_set[1], data_set[3]])
+    assert fname.read_bytes() == reference
+    journal.close()
+    assert not journal.path.exists()
+    assert fname.read_bytes() == reference
+
+
+def test_journal_recover(tmp_path):
+    data_set = make_fitted_curves()
+    fname = tmp_path / "pyjibe_fit_results_leaf.tsv"
+    save_reference(fname, data_set[:1])
+    journal = autosave_journal.AutosaveJournal(
+        fname, model_key="hertz_para", curves=data_set[:1], indices=[0])
+    for ii in range(1, 4):
+        journal.append(data_set[ii], index=ii)
+    # journals of running processes are not recovered
+    assert not autosave_journal.recover_journal(journal.path)
+    # simulate a crash (incomplete last line)
+    journal._fd.write('{"key": "incomplete", "ind')
+    journal._fd.close()
+    with mock.patch.object(autosave_journal, "is_process_running",
+                           return_value=False):
+        autosave_journal.recover_journals(tmp_path)
+    assert not journal.path.exists()
+    reference = save_reference(tmp_path / "ref.tsv", data_set)
+    assert fname.read_bytes() == reference
+
+
+def test_journal_other_process(tmp_path):
+    data_set = make_fitted_curves()
+    fname = tmp_path / "pyjibe_fit_results_leaf.tsv"
+    save_reference(fname, data_set[:1])
+    journals = []
+    for _ in range(2):
+        journal = autosave_journal.AutosaveJournal(
+            fname, model_key="hertz_para", curves=data_set[:1], indices=[0])
+        journal.append(data_set[1], index=1)
+        journals.append(journal)
+    # journals for the same results file do not share a file
+    assert journals[0].path != journals[1].path
+    assert journals[0].path.exists() and journals[1].path.exists()
+    # the writer of the journal is another running process
+    proc = subprocess.Popen(
+        [sys.executable, "-c", "import sys; sys.stdin.read()"],
+        stdin=subprocess.PIPE)
+    try:
+        header, _ = autosave_journal.read_journal(journals[0].path)
+        header["pid"] = proc.pid
+        lines = journals[0].path.read_text().splitlines()
+        lines[0] = json.dumps(header)
+        journals[0].path.write_text("\n".join(lines) + "\n")
+        assert not autosave_journal.recover_journal(journals[0].path)
+    finally:
+        proc.communicate()
+    # the writer is not running anymore
+    assert autosave_journal.recover_journal(journals[0].path)
+    assert not journals[0].path.exists()
+    # journal of another host
+    header["host"] = "other-host-" + header["host"]
+    journals[1].path.write_text(json.dumps(header) + "\n")
+    assert not autosave_journal.recover_journal(journals[1].path)
+    stale = time.time() - autosave_journal.STALE_TIME - 1
+    os.utime(journals[1].path, (stale, stale))
+    assert autosave_journal.recover_journal(journals[1].path)
+    for journal in journals:
+        journal._fd.close()
+
+
+def test_journal_gui(qtbot):
+    files = make_directory_with_data(3)
+    fname = files[0].parent / "pyjibe_fit_results_leaf.tsv"
+    mw = pyjibe.head.PyJibe()
+    with mock.patch.object(export, "save_tsv_metadata_results",
+                           wraps=export.save_tsv_metadata_results) as save:
+        mw.load_data(files)
+        war = mw.subwindows[0].widget()
+        war.prefetcher.wait()
+        assert war.cb_autosave.checkState() == QtCore.Qt.CheckState.Checked
+        for ii in [1, 2]:
+            war.list_curves.setCurrentItem(war.list_curves.topLevelItem(ii))
+        war.list_curves.topLevelItem(1).setCheckState(
+            3, QtCore.Qt.CheckState.Unchecked)
+        # the results file is written only once
+        assert save.call_count == 1
+        journal = war._autosave_journals[str(files[0].parent)]
+        assert journal.path.exists()
+        curves = [war.data_set[0], war.data_set[2]]
+    mw.close()
+    assert not journal.path.exists()
+    reference = save_reference(files[0].parent / "ref.tsv", curves)
+    assert fname.read_bytes() == reference
@@ -0,0 +1,103 @@
+"""Test of vectorized fitting of many curves"""
+import pathlib
+import shutil
+import tempfile
+from unittest import mock
+
+import nanite
+import numpy as np
+
+import pyjibe.head
+from pyjibe.fd import batch_fit
+from pyjibe.fd.fit_settings import FitSettings
+
+from helpers import (PREPROCESSING, data_dir, make_fit_settings,
+                     make_synthetic_map)
+
+
+def test_batch_fit_same_as_lmfit():
+    fit_settings = make_fit_settings()
+    single = make_synthetic_map(size=3)
+    batch = make_synthetic_map(size=3)
+    for fdist in single + batch:
+        fdist.apply_preprocessing(PREPROCESSING)
+    for fdist in single:
+        fdist.fit_model(**fit_settings.to_kwargs())
+    assert batch_fit.fit_curves(batch, fit_settings) == 9
+    for fs, fb in zip(single, batch):
+        ps = fs.fit_properties
+        pb = fb.fit_properties
+        assert sorted(ps.keys()) == sorted(pb.keys())
+        # nanite does not fit again
+        assert pb["hash"] == ps["hash"]
+        assert pb["success"]
+        assert np.allclose(pb["params_fitted"]["E"].value,
+                           ps["params_fitted"]["E"].value,
+                           rtol=1e-3, atol=0)
+        assert np.allclose(pb["params_fitted"]["contact_point"].value,
+                           ps["params_fitted"]["contact_point"].value,
+                           rtol=0, atol=1e-9)
+        # the minimum is at least as good as that of lmfit
+        assert pb["chi_sqr"] <= ps["chi_sqr"] * (1 + 1e-6)
+        assert pb["xmin"] == ps["xmin"]
+        assert np.allclose(fb["fit"], fs["fit"], equal_nan=True,
+                           rtol=1e-3, atol=1e-12)
+        assert np.all(fb["fit range"] == fs["fit range"])
+    # already fitted
+    assert batch_fit.fit_curves(batch, fit_settings) == 0
+
+
+def test_batch_fit_gcf_k_range():
+    kwargs = make_fit_settings().to_kwargs()
+    kwargs["gcf_k"] = .8
+    kwargs["range_x"] = (-2e-6, 1e-6)
+    fit_settings = FitSettings.from_kwargs(kwargs)
+    single = make_synthetic_map(size=1)
+    batch = make_synthetic_map(size=1)
+    for fdist in single + batch:
+        fdist.apply_preprocessing(PREPROCESSING)
+    single[0].fit_model(**fit_settings.to_kwargs())
+    assert batch_fit.fit_curves(batch, fit_settings) == 1
+    ps = single[0].fit_properties
+    pb = batch[0].fit_properties
+    assert np.allclose(pb["params_fitted"]["E"].value,
+                       ps["params_fitted"]["E"].value, rtol=1e-3, atol=0)
+    assert np.allclose(pb["params_fitted"]["contact_point"].value,
+                       ps["params_fitted"]["contact_point"].value,
+                       rtol=0, atol=1e-9)
+    assert pb["xmax"] == ps["xmax"]
+
+
+def test_batch_fit_unsupported():
+    kwargs = make_fit_settings().to_kwargs()
+    kwargs["range_type"] = "relative cp"
+    kwargs["range_x"] = (-1e-6, 1e-6)
+    fit_settings = FitSettings.from_kwargs(kwargs)
+    assert not batch_fit.is_supported(fit_settings)
+    data_set = make_synthetic_map(size=1)
+    data_set[0].apply_preprocessing(PREPROCESSING)
+    with mock.patch.object(nanite.Indentation, "fit_model") as fit_model:
+        assert batch_fit.fit_curves(data_set, fit_settings) == 0
+        assert fit_model.call_count == 1
+
+
+def test_batch_fit_gui(qtbot):
+    td = pathlib.Path(tempfile.mkdtemp(prefix="batch_fit_"))
+    shutil.copy2(data_dir / "map2x2_extracted.jpk-force-map", td)
+    mw = pyjibe.head.PyJibe()
+    mw.settings.setValue("advanced/batch fit", 1)
+    try:
+        mw.load_data([td / "map2x2_extracted.jpk-force-map"])
+        war = mw.subwindows[0].widget()
+        war.cb_autosave.setChecked(0)
+        with mock.patch.object(batch_fit, "fit_curves",
+                               wraps=batch_fit.fit_curves) as fit_curves:
+            war.on_fit_all()
+            assert fit_curves.called
+    finally:
+        mw.settings.setValue("advanced/batch fit", 0)
+    for ii, fdist in enumerate(war.data_set):
+        assert fdist.fit_properties["success"]
+        item = war.list_curves.topLevelItem(ii)
+        assert float(item.data(2, 0)) > 0  # rating
+    mw.close()
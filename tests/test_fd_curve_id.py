@@ -0,0 +1,114 @@
+"""Test of the stable identifiers of curves"""
+import pathlib
+import shutil
+import tempfile
+from unittest import mock
+
+import nanite
+
+import pyjibe.head
+from pyjibe.fd import curve_id, lazy
+
+from helpers import data_dir
+
+
+def test_curve_id_stable():
+    path = data_dir / "map2x2_extracted.jpk-force-map"
+    grp1 = nanite.IndentationGroup(path)
+    grp2 = nanite.IndentationGroup(path)
+    ids1 = [curve_id.get_curve_id(fdist) for fdist in grp1]
+    ids2 = [curve_id.get_curve_id(fdist) for fdist in grp2]
+    assert ids1 == ids2
+    assert len(set(ids1)) == 4
+    assert ids1[1].endswith(":1:2x24060")
+    # computed only once
+    with mock.patch.object(curve_id, "compute_curve_id") as compute:
+        assert curve_id.get_curve_id(grp1[1]) == ids1[1]
+        assert not compute.called
+
+
+def test_curve_id_file_content(tmp_path):
+    path = tmp_path / "spot.jpk-force"
+    shutil.copy2(data_dir / "spot3-0192.jpk-force", path)
+    key = curve_id.get_file_key(path)
+    # same content at another location
+    path2 = tmp_path / "copy.jpk-force"
+    shutil.copy2(path, path2)
+    assert curve_id.get_file_key(path2) == key
+    # other content
+    data = bytearray(path.read_bytes())
+    data[100] = (data[100] + 1) % 256
+    path2.write_bytes(bytes(data))
+    assert curve_id.get_file_key(path2) != key
+    # not a file
+    assert curve_id.get_file_key(tmp_path / "nope") != key
+
+
+def test_curve_id_gui_lazy(qtbot):
+    td = pathlib.Path(tempfile.mkdtemp(prefix="curve_id_"))
+    shutil.copy2(data_dir / "map2x2_extracted.jpk-force-map", td)
+    path = td / "map2x2_extracted.jpk-force-map"
+    reference = [curve_id.get_curve_id(fdist)
+                 for fdist in nanite.IndentationGroup(path)]
+    mw = pyjibe.head.PyJibe()
+    mw.settings.setValue("advanced/lazy open", 1)
+    try:
+        with mock.patch.object(lazy.CurveMaterializer, "start"):
+            mw.load_data([path])
+        war = mw.subwindows[0].widget()
+        war.cb_autosave.setChecked(0)
+        # the identifiers are computed from the metadata
+        assert not any(fdist._raw_data.materialized
+                       for fdist in war.data_set[1:])
+        with mock.patch.object(curve_id, "compute_curve_id") as compute:
+            ids = [curve_id.get_curve_id(fdist) for fdist in war.data_set]
+            assert not compute.called
+        assert ids == reference
+        # individual indentation depths
+        war.tab_fit.cb_delta_select.setCurrentIndex(1)
+        war.tab_edelta.delta_spin.setValue(-1)
+        war.tab_fit.fit_approach_retract(war.data_set[0])
+        assert list(war.tab_fit._indentation_depth_individual) == [ids[0]]
+    finally:
+        mw.settings.setValue("advanced/lazy open", 0)
+        mw.close()
+
+
+def test_curve_id_copies(tmp_path):
+    paths = [tmp_path / "a.jpk-force", tmp_path / "b.jpk-force"]
+    for path in paths:
+        shutil.copy2(data_dir / "spot3-0192.jpk-force", path)
+
+    def get_ids():
+        taken = set()
+        ids = []
+        for path in paths:
+            grp = nanite.IndentationGroup(path)
+            curve_id.assign_curve_ids(grp, taken=taken)
+            ids += [curve_id.get_curve_id(fdist) for fdist in grp]
+        return ids
+
+    ids = get_ids()
+    # the repeat gets an ordinal
+    assert ids[1] == ids[0] + "#1"
+    # stable when the files are loaded again
+    assert get_ids() == ids
+
+
+def test_curve_id_copies_gui(qtbot):
+    td = pathlib.Path(tempfile.mkdtemp(prefix="curve_id_"))
+    paths = [td / "a.jpk-force", td / "b.jpk-force"]
+    for path in paths:
+        shutil.copy2(data_dir / "spot3-0192.jpk-force", path)
+    mw = pyjibe.head.PyJibe()
+    mw.load_data(paths)
+    war = mw.subwindows[0].widget()
+    war.cb_autosave.setChecked(0)
+    ids = [curve_id.get_curve_id(fdist) for fdist in war.data_set]
+    assert len(set(ids)) == 2
+    # individual indentation depth of the first copy only
+    war.tab_fit.cb_delta_select.setCurrentIndex(1)
+    war.tab_edelta.delta_spin.setValue(-1)
+    war.tab_fit.fit_approach_retract(war.data_set[0])
+    assert list(war.tab_fit._indentation_depth_individual) == [ids[0]]
+    mw.close()
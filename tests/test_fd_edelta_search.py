@@ -0,0 +1,118 @@
+"""Test of the optimal indentation depth with fewer fits"""
+import dataclasses
+import pathlib
+import shutil
+import tempfile
+from unittest import mock
+
+import nanite
+import numpy as np
+
+import pyjibe.head
+from pyjibe.fd import edelta_search
+
+from helpers import PREPROCESSING, data_dir, make_fit_settings
+
+
+def load_curves():
+    """Two curves of the 2x2 map and a single curve (few data points)"""
+    grp = nanite.IndentationGroup(data_dir / "map2x2_extracted.jpk-force-map")
+    data_set = [grp[0], grp[2]]
+    data_set += list(nanite.IndentationGroup(
+        data_dir / "spot3-0192.jpk-force"))
+    for fdist in data_set:
+        fdist.apply_preprocessing(PREPROCESSING)
+    return data_set
+
+
+def test_edelta_search_same_as_nanite():
+    fit_settings = dataclasses.replace(make_fit_settings(),
+                                       optimal_fit_edelta=True)
+    exhaustive = load_curves()
+    search = load_curves()
+    for fdist in exhaustive:
+        fdist.fit_model(**fit_settings.to_kwargs())
+    report = edelta_search.EDeltaReport()
+    for fdist in search:
+        edelta_search.fit_curve(fdist, fit_settings, report=report)
+    for fe, fs in zip(exhaustive, search):
+        pe = fe.fit_properties
+        ps = fs.fit_properties
+        assert sorted(pe.keys()) == sorted(ps.keys())
+        # nanite does not fit again
+        assert ps["hash"] == pe["hash"]
+        assert ps["optimal_fit_delta"] == pe["optimal_fit_delta"]
+        assert np.all(ps["optimal_fit_E_array"] == pe["optimal_fit_E_array"])
+        assert ps["params_fitted"]["E"].value == pe["params_fitted"]["E"].value
+        assert np.all(fs["fit range"] == fe["fit range"])
+    assert report.num_samples == 300
+    assert report.num_cached == 0
+    # samples of the single curve with identical fitting ranges
+    assert report.num_saved == 35
+    # same as `nanite.Indentation.estimate_optimal_mindelta`
+    fdist = load_curves()[2]
+    fdist.fit_model(**make_fit_settings().to_kwargs())
+    assert edelta_search.estimate_optimal_mindelta(fdist) == \
+        exhaustive[2].fit_properties["optimal_fit_delta"]
+
+
+def test_edelta_search_cache():
+    fit_settings = make_fit_settings()
+    fdist = load_curves()[2]
+    # E(delta) plot with a fixed indentation depth
+    edelta_search.fit_curve(fdist, fit_settings)
+    key = edelta_search.get_edelta_key(fdist, fit_settings)
+    emoduli, _ = edelta_search.compute_emodulus_mindelta(fdist, key=key)
+    # nanite discards the E(delta) curve for other fit settings
+    fit_settings2 = dataclasses.replace(fit_settings,
+                                        optimal_fit_edelta=True)
+    assert edelta_search.get_edelta_key(fdist, fit_settings2) == key
+    report = edelta_search.EDeltaReport()
+    with mock.patch.object(edelta_search, "compute_emodulus_vs_mindelta",
+                           wraps=edelta_search.compute_emodulus_vs_mindelta
+                           ) as compute:
+        edelta_search.fit_curve(fdist, fit_settings2, report=report)
+        assert not compute.called
+        assert report.num_cached == 1
+        assert report.num_saved == 100
+        assert np.all(fdist.fit_properties["optimal_fit_E_array"] == emoduli)
+        # other preprocessing
+        fdist.apply_preprocessing(["compute_tip_position",
+                                   "correct_tip_offset"])
+        edelta_search.fit_curve(fdist, fit_settings2)
+        assert compute.call_count == 1
+    # same result as nanite
+    fdist2 = load_curves()[2]
+    fdist2.fit_model(**fit_settings2.to_kwargs())
+    fdist.apply_preprocessing(PREPROCESSING)
+    edelta_search.fit_curve(fdist, fit_settings2)
+    assert fdist.fit_properties["optimal_fit_delta"] == \
+        fdist2.fit_properties["optimal_fit_delta"]
+    assert fdist.fit_properties["params_fitted"]["E"].value == \
+        fdist2.fit_properties["params_fitted"]["E"].value
+
+
+def test_edelta_search_gui(qtbot):
+    td = pathlib.Path(tempfile.mkdtemp(prefix="edelta_search_"))
+    shutil.copy2(data_dir / "map2x2_extracted.jpk-force-map", td)
+    mw = pyjibe.head.PyJibe()
+    mw.load_data([td / "map2x2_extracted.jpk-force-map"])
+    war = mw.subwindows[0].widget()
+    war.cb_autosave.setChecked(0)
+    fdist = war.data_set[0]
+    with mock.patch.object(edelta_search, "compute_emodulus_vs_mindelta",
+                           wraps=edelta_search.compute_emodulus_vs_mindelta
+                           ) as compute:
+        # show the E(delta) plot
+        war.tabs.setCurrentWidget(war.tab_edelta)
+        war.tab_edelta.mpl_edelta_update()
+        assert compute.call_count == 1
+        # guess the optimal indentation depth
+        war.tab_edelta.on_delta_guess()
+        war.tab_fit.cb_delta_select.setCurrentIndex(2)
+        war.tab_fit.fit_approach_retract(fdist)
+        assert compute.call_count == 1
+    dopt = fdist.fit_properties["optimal_fit_delta"]
+    assert fdist.fit_properties["success"]
+    assert np.allclose(war.tab_edelta.delta_spin.value(), dopt * 1e6)
+    mw.close()
@@ -2,13 +2,16 @@
 import pathlib
 import shutil
 import tempfile
+from unittest import mock
 
+import nanite
 import nanite.model as nmodel
 import numpy as np
 import pytest
 from PyQt6 import QtCore, QtWidgets
 
 import pyjibe.head
+from pyjibe.fd import ancillaries, edelta_search
 
 from helpers import MockModelModule, make_directory_with_data
 
@@ -138,6 +141,79 @@ def test_ancillary_update_preproc_change(qtbot):
         main_window.close()
 
 
+def test_ancillary_prefetch_same_as_gui(qtbot):
+    with MockModelModule(
+        compute_ancillaries=lambda x: {"E": 2345.678912},
+        parameter_anc_keys=["E"],
+        parameter_anc_names=["ancillary E guess"],
+        parameter_anc_units=["Pa"],
+            model_key="test1"):
+
+        main_window = pyjibe.head.PyJibe()
+        qtbot.addWidget(main_window)
+        main_window.load_data(files=make_directory_with_data(2))
+        war = main_window.subwindows[0].widget()
+        war.cb_autosave.setChecked(0)
+        war.tab_preprocess.set_preprocessing(["compute_tip_position"])
+        idx = war.tab_fit.cb_model.findData("test1")
+        war.tab_fit.cb_model.setCurrentIndex(idx)
+        war.on_tab_changed()
+        atab = war.tab_fit.table_parameters_anc
+        # the value is rounded to the precision shown in the table
+        assert atab.item(0, 1).text() == "2345.7"
+        params_gui = war.tab_fit.fit_parameters()
+        assert params_gui["E"].value == 2345.7
+        # a curve processed in the background gets the same parameters
+        fdist = nanite.IndentationGroup(war.data_set[1].path)[0]
+        job = war.get_process_job(
+            anc_checked=war.tab_fit.anc_check_states())
+        job(fdist)
+        params = fdist.fit_properties["params_initial"]
+        assert params["E"].value == params_gui["E"].value
+        # ancillary parameters that are not used
+        atab.item(0, 0).setCheckState(QtCore.Qt.CheckState.Unchecked)
+        fdist = nanite.IndentationGroup(war.data_set[1].path)[0]
+        fdist.apply_preprocessing(["compute_tip_position"])
+        params = war.tab_fit.get_fit_settings().get_params()
+        params["E"].set(1000)
+        assert ancillaries.apply_to_initial_parameters(
+            fdist, "test1", params, [False]) == [
+                ("Young's Modulus [Pa]", "2345.7", False)]
+        assert params["E"].value == 1000
+        main_window.close()
+
+
+def test_ancillary_prefetch_cached(qtbot):
+    with MockModelModule(
+        compute_ancillaries=lambda x: {"E": 2345.678912},
+        parameter_anc_keys=["E"],
+        parameter_anc_names=["ancillary E guess"],
+        parameter_anc_units=["Pa"],
+            model_key="test1"):
+
+        main_window = pyjibe.head.PyJibe()
+        qtbot.addWidget(main_window)
+        main_window.load_data(files=make_directory_with_data(2))
+        war = main_window.subwindows[0].widget()
+        war.cb_autosave.setChecked(0)
+        war.tab_preprocess.set_preprocessing(["compute_tip_position"])
+        idx = war.tab_fit.cb_model.findData("test1")
+        war.tab_fit.cb_model.setCurrentIndex(idx)
+        war.on_tab_changed()
+        war.prefetcher.cancel()
+        war.prefetcher.wait()
+        # process the neighbour in the background
+        job = war.get_process_job(
+            anc_checked=war.tab_fit.anc_check_states())
+        job(war.data_set[1])
+        # the fit tab uses the cached fit
+        with mock.patch.object(edelta_search, "fit_curve") as fit_curve:
+            war.list_curves.setCurrentItem(war.list_curves.topLevelItem(1))
+            war.prefetcher.wait()
+        assert not fit_curve.called
+        main_window.close()
+
+
 @pytest.mark.filterwarnings('ignore::UserWarning')
 def test_apply_and_fit_all_with_bad_data(qtbot, monkeypatch):
     # setup data directory with two good and one invalid file
@@ -234,6 +310,33 @@ def test_remember_initial_params(qtbot):
     main_window.close()
 
 
+def test_params_mirror_matches_table(qtbot):
+    main_window = pyjibe.head.PyJibe()
+    qtbot.addWidget(main_window)
+    main_window.load_data(files=make_directory_with_data(2))
+    war = main_window.subwindows[0].widget()
+    war.cb_autosave.setChecked(0)
+    itab = war.tab_fit.table_parameters_initial
+    itab.item(4, 0).setCheckState(QtCore.Qt.CheckState.Unchecked)
+    itab.item(3, 1).setText(str(18000))
+    itab.item(0, 2).setText(str(100))
+    params = war.tab_fit.fit_parameters()
+    # the initial parameters are identical to the table values
+    for rr in range(itab.rowCount()):
+        label = itab.verticalHeaderItem(rr).text()
+        assert war.tab_fit.params_mirror.labels[rr] == label
+        vary, value, pmin, _ = war.tab_fit.params_mirror.get(label)
+        scale = war.tab_fit.params_mirror.scales[rr]
+        assert vary == (itab.item(rr, 0).checkState()
+                        == QtCore.Qt.CheckState.Unchecked)
+        assert value == float(itab.item(rr, 1).text()) / scale
+        assert pmin == float(itab.item(rr, 2).text()) / scale
+    assert params["baseline"].vary
+    assert np.isclose(params["contact_point"].value, 18000e-9)
+    assert params["E"].min == 100
+    main_window.close()
+
+
 def test_set_indentation_depth_manually_infdoublespinbox(qtbot):
     main_window = pyjibe.head.PyJibe()
     qtbot.addWidget(main_window)
@@ -20,6 +20,9 @@ def test_model_expr_base(qtbot):
         war.cb_autosave.setChecked(0)
         # perform simple filter
         war.tab_preprocess.set_preprocessing(["compute_tip_position"])
+        # no contact point weighting (the expected value below was
+        # determined without it)
+        war.tab_fit.cb_weight_cp.setChecked(False)
         # set mock model
         idx = war.tab_fit.cb_model.findData(mod.model_key)
         war.tab_fit.cb_model.setCurrentIndex(idx)
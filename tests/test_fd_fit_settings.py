@@ -0,0 +1,76 @@
+"""Test of the immutable fit settings"""
+import json
+import pickle
+from unittest import mock
+
+import nanite
+
+import pyjibe.head
+from pyjibe.fd.fit_settings import FitSettings
+
+from helpers import make_directory_with_data
+
+
+def test_fit_settings_snapshot(qtbot):
+    main_window = pyjibe.head.PyJibe()
+    main_window.load_data(files=make_directory_with_data(2))
+    war = main_window.subwindows[0].widget()
+    war.cb_autosave.setChecked(0)
+    settings = war.tab_fit.get_fit_settings()
+    assert settings == war.tab_fit.get_fit_settings()
+    assert hash(settings) == hash(war.tab_fit.get_fit_settings())
+    # serializable for worker processes and batch mode
+    assert pickle.loads(pickle.dumps(settings)) == settings
+    data = json.loads(json.dumps(settings.to_dict()))
+    assert data["model_key"] == "hertz_para"
+    # round trip with the keyword arguments for `fit_model`
+    kwargs = settings.to_kwargs()
+    assert FitSettings.from_kwargs(kwargs) == settings
+    assert list(kwargs["params_initial"].keys()) == \
+        [item[0] for item in settings.params_initial]
+    # changes in the GUI result in different settings
+    war.tab_fit.table_parameters_initial.item(1, 1).setText("5")
+    settings2 = war.tab_fit.get_fit_settings()
+    assert settings2 != settings
+    assert settings2.params_initial[1][1] == 5e-6
+    # the E(delta) curve does not depend on the indentation depth
+    war.tab_fit.sp_range_1.setValue(-1)
+    assert war.tab_fit.get_fit_settings() != settings2
+    assert war.tab_fit.get_fit_settings().edelta_key() == \
+        settings2.edelta_key()
+    main_window.close()
+
+
+def test_fit_settings_fit_cache(qtbot):
+    main_window = pyjibe.head.PyJibe()
+    main_window.load_data(files=make_directory_with_data(2))
+    war = main_window.subwindows[0].widget()
+    war.cb_autosave.setChecked(0)
+    fdist = war.data_set[0]
+    settings = war.tab_fit.get_fit_settings()
+    war.tab_fit.fit_approach_retract(fdist, fit_settings=settings)
+    emod = fdist.fit_properties["params_fitted"]["E"].value
+    with mock.patch.object(nanite.Indentation, "fit_model") as fit_model:
+        war.tab_fit.fit_approach_retract(fdist, fit_settings=settings)
+        assert not fit_model.called
+        # other settings
+        settings2 = settings.with_params(settings.get_params())
+        assert settings2 == settings
+        war.tab_fit.fit_approach_retract(
+            fdist, fit_settings=FitSettings.from_kwargs(
+                dict(settings.to_kwargs(), gcf_k=.5)))
+        assert fit_model.called
+    # the cache is invalidated when the preprocessing changes
+    preprocessing = fdist.preprocessing
+    options = fdist.preprocessing_options
+    fdist.apply_preprocessing(["compute_tip_position"])
+    with mock.patch.object(nanite.Indentation, "fit_model") as fit_model:
+        war.tab_fit.fit_approach_retract(fdist, fit_settings=settings)
+        assert fit_model.called
+    fdist.apply_preprocessing(preprocessing, options=options)
+    with mock.patch.object(nanite.Indentation, "fit_model") as fit_model:
+        war.tab_fit.fit_approach_retract(fdist, fit_settings=settings)
+        assert fit_model.called
+    war.tab_fit.fit_approach_retract(fdist, fit_settings=settings)
+    assert fdist.fit_properties["params_fitted"]["E"].value == emod
+    main_window.close()
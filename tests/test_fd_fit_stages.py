@@ -0,0 +1,91 @@
+"""Test of the stages of the analysis of the current curve"""
+import dataclasses
+from unittest import mock
+
+import nanite
+
+import pyjibe.head
+from pyjibe import instrument
+from pyjibe.fd import fit_stages
+
+from helpers import (PREPROCESSING, data_dir, make_directory_with_data,
+                     make_fit_settings)
+
+
+def test_fit_stages_invalid():
+    fdist, fdist2 = nanite.IndentationGroup(
+        data_dir / "map2x2_extracted.jpk-force-map")[:2]
+    fit_settings = make_fit_settings()
+    keys = fit_stages.get_stage_keys(PREPROCESSING, {}, fit_settings)
+    tracker = fit_stages.StageTracker()
+    assert tracker.get_invalid_stages(fdist, keys) == fit_stages.STAGES
+    tracker.set_keys(fdist, keys)
+    assert tracker.get_invalid_stages(fdist, keys) == ()
+    # only the weights and the fit
+    keys2 = fit_stages.get_stage_keys(
+        PREPROCESSING, {}, dataclasses.replace(fit_settings, weight_cp=1e-6))
+    assert tracker.get_invalid_stages(fdist, keys2) == \
+        ("weights", "optimization")
+    keys3 = fit_stages.get_stage_keys(
+        PREPROCESSING, {}, dataclasses.replace(fit_settings, gcf_k=.5))
+    assert tracker.get_invalid_stages(fdist, keys3) == \
+        ("fit range", "weights", "optimization")
+    keys4 = fit_stages.get_stage_keys(PREPROCESSING[:2], {}, fit_settings)
+    assert tracker.get_invalid_stages(fdist, keys4) == fit_stages.STAGES
+    # other curve
+    assert tracker.get_invalid_stages(fdist2, keys) == fit_stages.STAGES
+    tracker.invalidate()
+    assert tracker.get_invalid_stages(fdist, keys) == fit_stages.STAGES
+
+
+def test_fit_stages_gui(qtbot):
+    main_window = pyjibe.head.PyJibe()
+    main_window.load_data(files=make_directory_with_data(2))
+    war = main_window.subwindows[0].widget()
+    war.cb_autosave.setChecked(0)
+    war.on_params_init()
+    preprocess = mock.patch.object(
+        war.tab_preprocess, "apply_preprocessing",
+        wraps=war.tab_preprocess.apply_preprocessing)
+    fit = mock.patch.object(war.tab_fit, "fit_approach_retract",
+                            wraps=war.tab_fit.fit_approach_retract)
+    plot = mock.patch.object(war.widget_plot_fd, "mpl_curve_update",
+                             wraps=war.widget_plot_fd.mpl_curve_update)
+    instrument.reset()
+    instrument.set_enabled(True)
+    try:
+        with preprocess as mpre, fit as mfit, plot as mplot:
+            # nothing changed
+            war.on_params_init()
+            assert not mpre.called
+            assert not mfit.called
+            assert not mplot.called
+            # new initial parameters (the fit result changes)
+            war.tab_fit.table_parameters_initial.item(0, 1).setText("5")
+            assert not mpre.called
+            assert mfit.call_count == 1
+            assert mplot.call_count == 1
+            # another contact point weight (% of the tip radius)
+            weight_cp = war.tab_fit.get_fit_settings().weight_cp
+            assert weight_cp
+            war.tab_fit.sp_weight_cp_perc.setValue(
+                war.tab_fit.sp_weight_cp_perc.value() * 2)
+            assert war.tab_fit.get_fit_settings().weight_cp != weight_cp
+            assert not mpre.called
+            assert mfit.call_count == 2
+            assert mplot.call_count == 2
+            # another preprocessing
+            war.tab_preprocess.set_preprocessing(
+                ["compute_tip_position", "correct_tip_offset"])
+            war.on_params_init()
+            assert mpre.called
+            assert mfit.call_count == 3
+    finally:
+        instrument.set_enabled(False)
+    stats = instrument.get_statistics()
+    assert stats["stage optimization"]["count"] == 1
+    assert stats["stage weights"]["count"] == 1
+    assert stats["stage preprocessing"]["count"] == 1
+    assert stats["stage display"]["count"] == 3
+    instrument.reset()
+    main_window.close()
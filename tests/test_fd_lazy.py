@@ -0,0 +1,64 @@
+"""Test of lazy curve materialization"""
+import pathlib
+import shutil
+import tempfile
+
+import nanite
+import numpy as np
+
+import pyjibe.head
+from pyjibe.fd import lazy
+
+from helpers import data_dir
+
+
+def test_lazy_materializer():
+    path = data_dir / "map2x2_extracted.jpk-force-map"
+    reference = nanite.IndentationGroup(path)
+    grp = nanite.IndentationGroup(path)
+    lazy.wrap_group(grp)
+    assert all(lazy.is_lazy(fdist) for fdist in grp)
+    assert not any(fdist._raw_data.materialized for fdist in grp)
+    mat = lazy.CurveMaterializer(grp)
+    mat.start()
+    assert mat.wait(timeout=60)
+    for fd_ref, fdist in zip(reference, grp):
+        assert fdist._raw_data.materialized
+        for col in fd_ref.columns_innate:
+            assert np.all(fdist[col] == fd_ref[col])
+
+
+def test_lazy_segments():
+    path = data_dir / "spot3-0192.jpk-force"
+    reference = nanite.IndentationGroup(path)[0]
+    grp = nanite.IndentationGroup(path)
+    lazy.wrap_group(grp)
+    fdist = grp[0]
+    # the segments read through the lazy columns
+    assert fdist.appr._raw_data is fdist._raw_data
+    assert fdist.retr._raw_data is fdist._raw_data
+    assert not fdist._raw_data.materialized
+    assert np.all(fdist.appr["force"] == reference.appr["force"])
+    assert np.all(fdist.retr["height (measured)"]
+                  == reference.retr["height (measured)"])
+    # the parsed columns are cached
+    assert "force" in fdist._raw_data._columns
+    assert "segment" in fdist._raw_data._columns
+
+
+def test_lazy_open_gui(qtbot):
+    td = pathlib.Path(tempfile.mkdtemp(prefix="lazy_")) / "map.jpk-force-map"
+    shutil.copy2(data_dir / "map2x2_extracted.jpk-force-map", td)
+    mw = pyjibe.head.PyJibe()
+    mw.settings.setValue("advanced/lazy open", 1)
+    try:
+        mw.load_data([td])
+        war = mw.subwindows[0].widget()
+        war.cb_autosave.setChecked(0)
+        assert war.list_curves.topLevelItemCount() == 4
+        assert all(lazy.is_lazy(fdist) for fdist in war.data_set)
+        war.on_fit_all()
+        assert war.data_set[0].fit_properties["success"]
+    finally:
+        mw.settings.setValue("advanced/lazy open", 0)
+        mw.close()
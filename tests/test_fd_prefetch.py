@@ -0,0 +1,49 @@
+"""Test of background processing of neighbouring curves"""
+import pathlib
+import shutil
+import tempfile
+
+import nanite
+
+import pyjibe.head
+from pyjibe.fd import prefetch
+
+from helpers import data_dir
+
+
+def test_prefetch_neighbours_grid():
+    grp = nanite.IndentationGroup(data_dir / "map2x2_extracted.jpk-force-map")
+    pf = prefetch.NeighbourPrefetcher(num_neighbours=1)
+    # curve list neighbours come first, then QMap neighbours
+    # (grid positions (0, 0), (9, 0), (9, 9), (0, 9))
+    assert pf.get_neighbours(grp, 0) == [grp[1]]
+    pf.num_neighbours = 9
+    assert pf.get_neighbours(grp, 0) == [grp[1], grp[2], grp[3]]
+
+
+def test_prefetch_gui(qtbot):
+    td = pathlib.Path(tempfile.mkdtemp(prefix="prefetch_"))
+    shutil.copy2(data_dir / "map2x2_extracted.jpk-force-map", td)
+    mw = pyjibe.head.PyJibe()
+    mw.load_data([td / "map2x2_extracted.jpk-force-map"])
+    war = mw.subwindows[0].widget()
+    war.cb_autosave.setChecked(0)
+    # all subwindows share the scheduler of the main window
+    assert war.scheduler is mw.scheduler
+    # the neighbour was fitted in the background
+    assert war.prefetcher.wait(timeout=60)
+    fdist = war.data_set[1]
+    assert fdist.fit_properties["success"]
+    params = fdist.fit_properties["params_fitted"]
+    # selecting the curve does not fit again
+    war.list_curves.setCurrentItem(war.list_curves.topLevelItem(1))
+    assert fdist.fit_properties["params_fitted"] is params
+
+    # changing the settings discards prefetched results
+    assert war.prefetcher.wait(timeout=60)
+    fdist2 = war.data_set[2]
+    assert fdist2.fit_properties["success"]
+    war.tab_fit.sp_range_2.setValue(3)
+    assert war.prefetcher.wait(timeout=60)
+    assert not fdist2.fit_properties
+    mw.close()
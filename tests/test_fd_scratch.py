@@ -0,0 +1,74 @@
+"""Test of the HDF5 scratch store for raw data"""
+import gc
+import weakref
+
+import nanite
+import numpy as np
+
+from pyjibe.fd import scratch
+
+from helpers import data_dir
+
+
+def test_scratch_store_attach(tmp_path):
+    path = data_dir / "map2x2_extracted.jpk-force-map"
+    reference = nanite.IndentationGroup(path)
+    grp = nanite.IndentationGroup(path)
+    store = scratch.ScratchStore(tmp_path / "scratch")
+    spath = store.attach(grp)
+    assert spath.exists()
+    for fd_ref, fdist in zip(reference, grp):
+        assert isinstance(fdist._raw_data, scratch.MemmapColumns)
+        assert fdist.columns_innate == fd_ref.columns_innate
+        for col in fd_ref.columns_innate:
+            assert np.all(fdist[col] == fd_ref[col])
+    store.close()
+    assert not spath.exists()
+
+
+def test_scratch_store_preprocessing(tmp_path):
+    path = data_dir / "spot3-0192.jpk-force"
+    reference = nanite.IndentationGroup(path)[0]
+    grp = nanite.IndentationGroup(path)
+    store = scratch.ScratchStore(tmp_path)
+    store.attach(grp)
+    fdist = grp[0]
+    for idnt in [reference, fdist]:
+        idnt.apply_preprocessing(["compute_tip_position",
+                                  "correct_force_offset"])
+    assert np.allclose(fdist["tip position"], reference["tip position"])
+    assert np.allclose(fdist["force"], reference["force"])
+    # raw data must not be modified
+    assert isinstance(fdist._raw_data["force"], np.ndarray)
+    store.close()
+
+
+def test_scratch_store_release_memory(tmp_path):
+    src = nanite.IndentationGroup(data_dir / "spot3-0192.jpk-force")[0]
+    data = {col: np.array(src[col]) for col in src.columns_innate}
+    reference = {col: data[col].copy() for col in data}
+    refs = [weakref.ref(arr) for arr in data.values()]
+    fdist = nanite.Indentation(data=data, metadata=src.metadata)
+    del data
+    store = scratch.ScratchStore(tmp_path)
+    store.attach([fdist])
+    # the segments read from the scratch file as well
+    assert fdist.appr._raw_data is fdist._raw_data
+    assert fdist.retr._raw_data is fdist._raw_data
+    gc.collect()
+    assert all(ref() is None for ref in refs)
+    assert np.all(fdist.appr["force"]
+                  == reference["force"][reference["segment"] == 0])
+    assert np.all(fdist["force"] == reference["force"])
+    store.close()
+
+
+def test_scratch_store_single_memmap(tmp_path):
+    grp = nanite.IndentationGroup(data_dir / "map2x2_extracted.jpk-force-map")
+    store = scratch.ScratchStore(tmp_path)
+    store.attach(grp)
+    memmap = grp[0]._raw_data.memmap
+    assert all(fdist._raw_data.memmap is memmap for fdist in grp)
+    force = grp[1]._raw_data["force"]
+    assert np.shares_memory(force, memmap)
+    store.close()
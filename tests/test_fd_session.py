@@ -0,0 +1,172 @@
+"""Test of saving and restoring analysis sessions"""
+import dataclasses
+import json
+import pathlib
+import shutil
+import tempfile
+from unittest import mock
+
+import nanite
+import nanite.fit
+import numpy as np
+from PyQt6 import QtCore
+
+import pyjibe.head
+from pyjibe.fd import main as fdmain
+from pyjibe.fd import export, prefetch, session
+from pyjibe.fd.fit_settings import get_cached_fit, set_cached_fit
+
+from helpers import PREPROCESSING, data_dir, make_fit_settings
+
+
+def test_session_encode_parameters():
+    params = make_fit_settings().get_params()
+    params.add("E2", expr="E*2")
+    params["E"].stderr = np.float64(1.5)
+    data = session._encode({"params": params, "array": np.arange(3),
+                            "path": pathlib.Path("a/b")})
+    text = json.dumps(data)
+    decoded = json.loads(text, object_hook=session._decode_hook)
+    assert [p.__getstate__() for p in decoded["params"].values()] == \
+        [p.__getstate__() for p in params.values()]
+    assert decoded["params"]["E2"].value == 2 * params["E"].value
+    assert np.all(decoded["array"] == np.arange(3))
+    assert decoded["path"] == pathlib.Path("a/b")
+
+
+def test_session_restore_without_fit(tmp_path):
+    path = data_dir / "map2x2_extracted.jpk-force-map"
+    fit_settings = make_fit_settings()
+    grp = nanite.IndentationGroup(path)
+    for fdist in grp[:3]:
+        fdist.apply_preprocessing(PREPROCESSING)
+        fdist.fit_model(**fit_settings.to_kwargs())
+        set_cached_fit(fdist, fit_settings)
+        fdist.rate_quality()
+    session.save_session(tmp_path / "test.pjsession", grp,
+                         use=[True, False, True, True], settings={"a": 1})
+    sess = session.load_session(tmp_path / "test.pjsession")
+    assert sess.files == [path.resolve()]
+    assert sess.use == [True, False, True, True]
+    assert sess.settings == {"a": 1}
+    assert sess.states[3] is None
+
+    grp2 = nanite.IndentationGroup(path)
+    with mock.patch.object(nanite.fit.IndentationFitter, "fit") as fit:
+        for fdist, state in zip(grp2, sess.states):
+            if state is not None:
+                session.restore_curve(fdist, state)
+        assert session.is_detached(grp2[0])
+        for fdist in grp2[:3]:
+            assert get_cached_fit(fdist, fit_settings)
+            session.reattach(fdist)
+            fdist.apply_preprocessing(PREPROCESSING, ret_details=True)
+            fdist.fit_model(**fit_settings.to_kwargs())
+        assert not fit.called
+    assert not session.is_detached(grp2[0])
+    for fdist, fdist2 in zip(grp[:3], grp2[:3]):
+        for col in ["force", "tip position", "fit", "fit residuals",
+                    "fit range"]:
+            assert np.array_equal(fdist[col], fdist2[col], equal_nan=True)
+        assert fdist2._rating == fdist._rating
+        assert fdist2.rate_quality() == fdist.rate_quality()
+
+
+def test_session_export_restored_curve():
+    path = data_dir / "map2x2_extracted.jpk-force-map"
+    fdist = nanite.IndentationGroup(path)[0]
+    fdist.apply_preprocessing(PREPROCESSING)
+    fdist.fit_model(**make_fit_settings().to_kwargs())
+    # the ancillary parameters are computed for the session file
+    state = session.get_curve_state(fdist)
+    assert state["ancillaries"]["max_indent"] > 0
+    state = json.loads(json.dumps(session._encode(state)),
+                       object_hook=session._decode_hook)
+
+    def get_export_texts(fd):
+        columns = export.get_tsv_columns([fd])
+        return {label: export.format_content(values[0])
+                for label, values in columns.items()}
+
+    reference = get_export_texts(fdist)
+    fdist2 = nanite.IndentationGroup(path)[0]
+    session.restore_curve(fdist2, state)
+    assert get_export_texts(fdist2) == reference
+    # the stored ancillary parameters are used
+    assert session.is_detached(fdist2)
+    # sessions without ancillary parameters
+    state["ancillaries"] = None
+    fdist3 = nanite.IndentationGroup(path)[0]
+    session.restore_curve(fdist3, state)
+    assert get_export_texts(fdist3) == reference
+    # the curve was preprocessed for computing them
+    assert not session.is_detached(fdist3)
+    session.reattach(fdist3)
+    assert get_export_texts(fdist3) == reference
+
+
+def test_session_gui(qtbot):
+    td = pathlib.Path(tempfile.mkdtemp(prefix="session_"))
+    shutil.copy2(data_dir / "map2x2_extracted.jpk-force-map", td)
+    path = td / "map2x2_extracted.jpk-force-map"
+    mw = pyjibe.head.PyJibe()
+    mw.load_data([path])
+    war = mw.subwindows[0].widget()
+    war.cb_autosave.setChecked(0)
+    war.tab_fit.sp_range_2.setValue(2)
+    war.list_curves.setCurrentItem(war.list_curves.topLevelItem(1))
+    war.list_curves.topLevelItem(3).setCheckState(
+        3, QtCore.Qt.CheckState.Unchecked)
+    war.prefetcher.wait()
+    spath = td / "test.pjsession"
+    war.save_session(spath)
+    fit_settings = war.tab_fit.get_fit_settings()
+    fits = [war.data_set[ii]["fit"] for ii in range(2)]
+    ratings = [war.list_curves.topLevelItem(ii).text(2) for ii in range(2)]
+    mw.close()
+
+    mw2 = pyjibe.head.PyJibe()
+    with mock.patch.object(nanite.fit.IndentationFitter, "fit") as fit, \
+            mock.patch.object(fdmain.UiForceDistance, "autosave"), \
+            mock.patch.object(prefetch.NeighbourPrefetcher, "prefetch"):
+        mw2.load_session(spath)
+        war2 = mw2.subwindows[0].widget()
+        assert war2.tab_fit.get_fit_settings() == fit_settings
+        assert war2.tab_fit.sp_range_2.value() == 2
+        assert [war2.list_curves.topLevelItem(ii).text(2)
+                for ii in range(2)] == ratings
+        assert war2.list_curves.topLevelItem(3).checkState(3) == \
+            QtCore.Qt.CheckState.Unchecked
+        war2.list_curves.setCurrentItem(war2.list_curves.topLevelItem(1))
+        assert not fit.called
+    for ii in range(2):
+        assert np.array_equal(war2.data_set[ii]["fit"], fits[ii],
+                              equal_nan=True)
+    mw2.close()
+
+
+def test_session_restore_weight_cp(qtbot):
+    td = pathlib.Path(tempfile.mkdtemp(prefix="session_"))
+    shutil.copy2(data_dir / "map2x2_extracted.jpk-force-map", td)
+    mw = pyjibe.head.PyJibe()
+    mw.load_data([td / "map2x2_extracted.jpk-force-map"])
+    war = mw.subwindows[0].widget()
+    war.cb_autosave.setChecked(0)
+    war.prefetcher.wait()
+    tab_fit = war.tab_fit
+    fit_settings = tab_fit.get_fit_settings()
+    assert fit_settings.weight_cp
+    # weight that does not match the "% tip radius" spin box
+    weighted = dataclasses.replace(fit_settings,
+                                   weight_cp=fit_settings.weight_cp * 3)
+    tab_fit.set_fit_settings(weighted)
+    assert tab_fit.get_fit_settings() == weighted
+    unweighted = dataclasses.replace(fit_settings, weight_cp=False)
+    tab_fit.set_fit_settings(unweighted)
+    assert not tab_fit.cb_weight_cp.isChecked()
+    assert not tab_fit.widget_res_cp.isVisibleTo(tab_fit)
+    assert tab_fit.get_fit_settings() == unweighted
+    tab_fit.set_fit_settings(weighted)
+    assert tab_fit.cb_weight_cp.isChecked()
+    assert tab_fit.widget_res_cp.isVisibleTo(tab_fit)
+    mw.close()
@@ -0,0 +1,104 @@
+"""Test of warm-started QMap fits"""
+import pathlib
+import shutil
+import tempfile
+
+import nanite.model as nmodel
+import numpy as np
+
+import pyjibe.head
+from pyjibe.fd import prefetch
+from pyjibe.fd.warm_start import WarmStart, fit_counted
+
+from helpers import (PREPROCESSING, data_dir, make_fit_settings,
+                     make_synthetic_map)
+
+
+def test_warm_start_order():
+    data_set = make_synthetic_map(size=5)
+    warm_start = WarmStart(data_set)
+    order = warm_start.get_fit_order()
+    positions = [(fd.metadata["grid index x"], fd.metadata["grid index y"])
+                 for fd in order]
+    assert positions[:4] == [(0, 0), (4, 0), (0, 4), (4, 4)]
+    assert positions[4:6] == [(2, 0), (0, 2)]
+    assert [warm_start.get_level(fd) for fd in order] == \
+        [0] * 4 + [1] * 5 + [2] * 16
+
+
+def test_warm_start_tolerance():
+    fit_settings = make_fit_settings()
+    cold = make_synthetic_map()
+    for fdist in cold:
+        prefetch.process_curve(fdist, PREPROCESSING, {}, fit_settings,
+                               anc_checked=None, rating=(0, ""))
+    warm = make_synthetic_map()
+    warm_start = WarmStart(warm)
+    model = nmodel.models_available["hertz_para"]
+    residual = model.residual
+    for fdist in warm_start.get_fit_order():
+        prefetch.process_curve(fdist, PREPROCESSING, {}, fit_settings,
+                               anc_checked=None, rating=(0, ""),
+                               warm_start=warm_start)
+    # the model is not modified for counting the evaluations
+    assert model.residual is residual
+    report = warm_start.report.to_dict()
+    assert report["cold fits"] == 1
+    assert report["warm fits"] == 15
+    assert report["evaluations warm"] > 0
+    for fc, fw in zip(cold, warm):
+        assert fw.fit_properties["success"]
+        pc = fc.fit_properties["params_fitted"]
+        pw = fw.fit_properties["params_fitted"]
+        assert np.allclose(pw["E"].value, pc["E"].value, rtol=1e-3, atol=0)
+        assert np.allclose(pw["contact_point"].value,
+                           pc["contact_point"].value, rtol=0, atol=1e-9)
+        # the initial parameters from the GUI are stored
+        assert fw.fit_properties["params_initial"]["E"].value == \
+            fc.fit_properties["params_initial"]["E"].value
+        # the counting callback is not stored
+        assert fw.fit_properties["method_kws"] == \
+            fc.fit_properties["method_kws"]
+
+
+def test_warm_start_fit_counted():
+    fit_settings = make_fit_settings()
+    fdist = make_synthetic_map()[0]
+    fdist.apply_preprocessing(PREPROCESSING)
+    evaluations = fit_counted(fdist, fit_settings)
+    assert evaluations > 0
+    assert "iter_cb" not in fdist.fit_properties["method_kws"]
+    # same result as nanite
+    fdist2 = make_synthetic_map()[0]
+    fdist2.apply_preprocessing(PREPROCESSING)
+    fdist2.fit_model(**fit_settings.to_kwargs())
+    assert fdist.fit_properties["hash"] == fdist2.fit_properties["hash"]
+    assert fdist.fit_properties["params_fitted"]["E"].value == \
+        fdist2.fit_properties["params_fitted"]["E"].value
+    assert np.array_equal(fdist["fit"], fdist2["fit"], equal_nan=True)
+    # already fitted
+    assert fit_counted(fdist, fit_settings) == 0
+
+
+def test_warm_start_gui(qtbot):
+    td = pathlib.Path(tempfile.mkdtemp(prefix="warm_start_"))
+    shutil.copy2(data_dir / "map2x2_extracted.jpk-force-map", td)
+    mw = pyjibe.head.PyJibe()
+    mw.settings.setValue("advanced/warm start", 1)
+    try:
+        mw.load_data([td / "map2x2_extracted.jpk-force-map"])
+        war = mw.subwindows[0].widget()
+        war.cb_autosave.setChecked(0)
+        war.on_fit_all()
+    finally:
+        mw.settings.setValue("advanced/warm start", 0)
+    report = war.warm_start_report
+    # the statistics are shown in the status bar
+    assert mw.statusbar.currentMessage() == report.summary()
+    # The grid positions of this map are too far apart (curves
+    # that were prefetched before are not fitted again).
+    assert 0 < report.num_cold <= 4
+    assert report.num_warm == 0
+    for fdist in war.data_set:
+        assert fdist.fit_properties["success"]
+    mw.close()
@@ -0,0 +1,160 @@
+"""Test of the parallel data conversion engine"""
+import os
+import shutil
+import time
+
+import h5py
+import nanite
+import numpy as np
+
+from pyjibe.head import convert_engine
+
+from helpers import data_dir
+
+
+def test_convert_engine_export_file(tmp_path):
+    path = data_dir / "map2x2_extracted.jpk-force-map"
+    bad = tmp_path / "bad.jpk-force"
+    bad.write_text("not AFM data")
+    engine = convert_engine.ConversionEngine(max_workers=2)
+    progress = []
+    jobs = [(path, tmp_path / "out.h5", "hdf5", True),
+            (bad, tmp_path / "bad.h5", "hdf5", True)]
+    errors = engine.run(convert_engine.export_file, jobs,
+                        callback=lambda *args: progress.append(args) or True)
+    assert progress[-1] == (2, 2)
+    # per-file error report
+    assert len(errors) == 1
+    assert errors[0][0] == str(bad)
+    ref = nanite.IndentationGroup(path)
+    grp = nanite.IndentationGroup(tmp_path / "out.h5")
+    assert len(grp) == 4
+    for fd_ref, fdist in zip(ref, grp):
+        assert np.allclose(fd_ref["force"], fdist["force"])
+
+
+def test_convert_engine_cancel():
+    engine = convert_engine.ConversionEngine(max_workers=2)
+    start = time.perf_counter()
+    # slow jobs, conversion is cancelled right away
+    errors = engine.run(time.sleep, [(10,)] * 4,
+                        callback=lambda *args: False)
+    assert not errors
+    assert time.perf_counter() - start < 5
+
+
+def test_convert_engine_no_compression(tmp_path):
+    path = data_dir / "spot3-0192.jpk-force"
+    outputs = convert_engine.export_file(path, tmp_path / "out.h5",
+                                         compression=None)
+    assert outputs == [tmp_path / "out.h5"]
+    with h5py.File(tmp_path / "out.h5") as h5:
+        assert h5["0"]["force"].compression is None
+        assert not h5["0"]["force"].shuffle
+    ref = nanite.IndentationGroup(path)
+    grp = nanite.IndentationGroup(tmp_path / "out.h5")
+    assert np.all(ref[0]["force"] == grp[0]["force"])
+    assert np.all(ref[0]["segment"] == grp[0]["segment"])
+
+
+def test_convert_engine_merge(tmp_path):
+    path = data_dir / "map2x2_extracted.jpk-force-map"
+    engine = convert_engine.ConversionEngine(max_workers=2)
+    out = tmp_path / "merged.h5"
+    with h5py.File(out, "w") as h5:
+        errors = engine.run(
+            convert_engine.read_curves,
+            [(path, False), (path, False), (path, False)],
+            consume=lambda curves: convert_engine.write_curves(h5, curves))
+    assert not errors
+    grp = nanite.IndentationGroup(out)
+    assert len(grp) == 12
+    assert sorted(fdist.enum for fdist in grp) == list(range(12))
+    with h5py.File(out) as h5:
+        # storage metadata were not exported
+        assert "path" not in h5["0"].attrs
+
+
+def modify_input(path_in, out_dir):
+    with open(path_in, "ab") as fd:
+        fd.write(b"modified")
+    return []
+
+
+def test_convert_manifest_modified_during_conversion(tmp_path):
+    path = tmp_path / "spot.jpk-force"
+    shutil.copy2(data_dir / "spot3-0192.jpk-force", path)
+    manifest = convert_engine.ConversionManifest(tmp_path)
+    # the input file changes after it was hashed
+    result = convert_engine.hash_and_run(path, modify_input, tmp_path)
+    manifest.update(*result, settings={})
+    assert not manifest.is_up_to_date(path, settings={})
+    # unchanged input file
+    result = convert_engine.hash_and_run(path, lambda *args: [], tmp_path)
+    manifest.update(*result, settings={})
+    assert manifest.is_up_to_date(path, settings={})
+
+
+def test_convert_dialog_unaltered(qtbot, monkeypatch, tmp_path):
+    from PyQt6 import QtWidgets
+    from pyjibe.head.dlg_tool_convert import ConvertDialog
+
+    parent = QtWidgets.QWidget()
+    qtbot.addWidget(parent)
+    dlg = ConvertDialog(parent)
+    dlg.add_file(str(data_dir / "map2x2_extracted.jpk-force-map"))
+    dlg.add_file(str(data_dir / "spot3-0192.jpk-force"))
+    monkeypatch.setattr(QtWidgets.QFileDialog, "getExistingDirectory",
+                        lambda *args, **kwargs: str(tmp_path))
+    dlg.radioButton_unaltered.setChecked(True)
+    dlg.comboBox_compression.setCurrentText("lzf")
+    assert dlg.convert()
+    assert len(list(tmp_path.glob("*.h5"))) == 2
+    assert "compression ratio" in dlg.report
+    for path in tmp_path.glob("*.h5"):
+        with h5py.File(path) as h5:
+            ds = h5["0"]["force"]
+            assert ds.compression == "lzf"
+            assert ds.shuffle
+            # one chunk per curve
+            assert ds.chunks == ds.shape
+
+
+def test_convert_dialog_incremental(qtbot, monkeypatch, tmp_path):
+    from PyQt6 import QtWidgets
+    from pyjibe.head.dlg_tool_convert import ConvertDialog
+
+    in_dir = tmp_path / "in"
+    in_dir.mkdir()
+    out_dir = tmp_path / "out"
+    out_dir.mkdir()
+    path1 = in_dir / "map.jpk-force-map"
+    path2 = in_dir / "spot.jpk-force"
+    shutil.copy2(data_dir / "map2x2_extracted.jpk-force-map", path1)
+    shutil.copy2(data_dir / "spot3-0192.jpk-force", path2)
+    monkeypatch.setattr(QtWidgets.QFileDialog, "getExistingDirectory",
+                        lambda *args, **kwargs: str(out_dir))
+    parent = QtWidgets.QWidget()
+    qtbot.addWidget(parent)
+
+    def convert():
+        dlg = ConvertDialog(parent)
+        dlg.add_file(str(path1))
+        dlg.add_file(str(path2))
+        dlg.radioButton_unaltered.setChecked(True)
+        dlg.checkBox_incremental.setChecked(True)
+        assert dlg.convert()
+        return dlg.report
+
+    assert "skipped" not in convert()
+    manifest = convert_engine.ConversionManifest(out_dir)
+    assert len(manifest.files) == 2
+    # nothing changed
+    assert "2 up-to-date file(s) were skipped" in convert()
+    # touched, but same content
+    os.utime(path2, (1, 1))
+    assert "2 up-to-date file(s) were skipped" in convert()
+    # missing output
+    for name in manifest.files[str(path1.resolve())]["outputs"]:
+        (out_dir / name).unlink()
+    assert "1 up-to-date file(s) were skipped" in convert()
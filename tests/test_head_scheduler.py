@@ -0,0 +1,99 @@
+"""Test of the application-wide compute scheduler"""
+import threading
+
+import pytest
+
+from pyjibe.head.scheduler import ComputeScheduler
+
+
+class Owner:
+    def __init__(self, name):
+        self.name = name
+
+
+def run_jobs(scheduler, active=None):
+    """Submit three jobs for two owners while the worker is blocked"""
+    order = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def block():
+        started.set()
+        release.wait()
+
+    blocker = scheduler.submit(Owner("x"), block)
+    assert started.wait(timeout=10)
+    owner_a = Owner("a")
+    owner_b = Owner("b")
+    futures = []
+    for ii in range(3):
+        for owner in [owner_a, owner_b]:
+            futures.append(scheduler.submit(
+                owner, order.append, f"{owner.name}{ii}"))
+    if active == "b":
+        scheduler.set_active(owner_b)
+    release.set()
+    blocker.result(timeout=10)
+    for future in futures:
+        future.result(timeout=10)
+    return order
+
+
+def test_scheduler_fair_share():
+    scheduler = ComputeScheduler(max_workers=1)
+    order = run_jobs(scheduler)
+    # owners are served in turns
+    assert order == ["a0", "b0", "a1", "b1", "a2", "b2"]
+    scheduler.shutdown()
+
+
+def test_scheduler_active_first():
+    scheduler = ComputeScheduler(max_workers=1)
+    order = run_jobs(scheduler, active="b")
+    assert order == ["b0", "b1", "b2", "a0", "a1", "a2"]
+    scheduler.shutdown()
+
+
+def test_scheduler_cancel_and_errors():
+    scheduler = ComputeScheduler(max_workers=1)
+    started = threading.Event()
+    release = threading.Event()
+
+    def block():
+        started.set()
+        return release.wait()
+
+    owner = Owner("a")
+    blocker = scheduler.submit(owner, block)
+    assert started.wait(timeout=10)
+    pending = scheduler.submit(owner, lambda: 1)
+    scheduler.cancel(owner)
+    release.set()
+    assert blocker.result(timeout=10)
+    assert pending.cancelled()
+    # exceptions are passed on to the future
+    failing = scheduler.submit(owner, lambda: 1 / 0)
+    with pytest.raises(ZeroDivisionError):
+        failing.result(timeout=10)
+    scheduler.shutdown()
+    with pytest.raises(RuntimeError, match="shutdown"):
+        scheduler.submit(owner, lambda: 1)
+
+
+def test_scheduler_max_workers():
+    scheduler = ComputeScheduler(max_workers=2)
+    barrier = threading.Barrier(2, timeout=10)
+    # two jobs can only pass the barrier if they run in parallel
+    futures = [scheduler.submit(Owner("a"), barrier.wait) for _ in range(2)]
+    for future in futures:
+        future.result(timeout=10)
+    assert scheduler.num_workers == 2
+    scheduler.set_max_workers(1)
+    # surplus workers exit
+    for _ in range(100):
+        if scheduler.num_workers == 1:
+            break
+        threading.Event().wait(.05)
+    assert scheduler.num_workers == 1
+    assert scheduler.submit(Owner("b"), lambda: 2).result(timeout=10) == 2
+    scheduler.shutdown()
@@ -0,0 +1,29 @@
+"""Regression test for the startup time of PyJibe"""
+import subprocess
+import sys
+
+
+def get_import_times(module):
+    """Return cumulative import times [µs] reported by `-X importtime`"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True)
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def test_startup_lazy_imports():
+    times = get_import_times("pyjibe.head.main")
+    assert "pyjibe.head.main" in times
+    # The scientific stack and the analysis GUIs are only imported
+    # when they are needed (e.g. when data are loaded).
+    for name in ["afmformats", "h5py", "lmfit", "nanite", "scipy",
+                 "sklearn", "pyjibe.fd.main",
+                 "pyjibe.head.dlg_tool_convert",
+                 "matplotlib.backends.backend_qtagg"]:
+        assert name not in times, f"'{name}' imported at startup"
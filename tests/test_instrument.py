@@ -0,0 +1,145 @@
+"""Test of the timing instrumentation and profiling"""
+import cProfile
+import json
+import pstats
+import threading
+from unittest import mock
+
+import pyjibe.head
+from pyjibe import instrument, profiler
+from pyjibe.head.dlg_instrument import InstrumentDialog
+
+from helpers import make_directory_with_data
+
+
+def test_instrument_timed(tmp_path):
+    @instrument.timed("my_stage")
+    def func(a, b=1):
+        return a + b
+
+    instrument.reset()
+    instrument.set_enabled(False)
+    assert func(1, b=2) == 3
+    assert instrument.get_statistics() == {}
+    instrument.set_enabled(True)
+    try:
+        for ii in range(3):
+            assert func(ii) == ii + 1
+    finally:
+        instrument.set_enabled(False)
+    stats = instrument.get_statistics()["my_stage"]
+    assert stats["count"] == 3
+    assert sum(stats["histogram"]) == 3
+    assert stats["min [s]"] <= stats["mean [s]"] <= stats["max [s]"]
+    # export
+    instrument.export_json(tmp_path / "timings.json")
+    data = json.loads((tmp_path / "timings.json").read_text())
+    assert data["stages"]["my_stage"]["count"] == 3
+    instrument.export_chrome_trace(tmp_path / "trace.json")
+    trace = json.loads((tmp_path / "trace.json").read_text())
+    assert len(trace["traceEvents"]) == 3
+    assert trace["traceEvents"][0]["name"] == "my_stage"
+    assert trace["traceEvents"][0]["ph"] == "X"
+    instrument.reset()
+    assert instrument.get_statistics() == {}
+
+
+def test_instrument_timing():
+    instrument.reset()
+    instrument.set_enabled(False)
+    with instrument.timing("my_block"):
+        pass
+    assert instrument.get_statistics() == {}
+    instrument.set_enabled(True)
+    try:
+        for ii in range(2):
+            with instrument.timing("my_block"):
+                pass
+    finally:
+        instrument.set_enabled(False)
+    assert instrument.get_statistics()["my_block"]["count"] == 2
+    instrument.reset()
+
+
+def test_instrument_dialog(qtbot, tmp_path):
+    instrument.reset()
+    main_window = pyjibe.head.PyJibe()
+    main_window.settings.setValue("advanced/developer mode", 0)
+    dlg = InstrumentDialog(main_window)
+    dlg.checkBox_record.setChecked(True)
+    assert instrument.is_enabled()
+    try:
+        main_window.load_data(files=make_directory_with_data(2))
+        war = main_window.subwindows[0].widget()
+        war.cb_autosave.setChecked(0)
+        war.on_fit_all()
+    finally:
+        dlg.checkBox_record.setChecked(False)
+    assert not instrument.is_enabled()
+    dlg.refresh()
+    stages = [dlg.tableWidget.item(row, 0).text()
+              for row in range(dlg.tableWidget.rowCount())]
+    for stage in ["load_file", "apply_preprocessing",
+                  "fit_approach_retract", "rate_data", "autosave",
+                  "mpl_curve_update"]:
+        assert stage in stages
+    with mock.patch("PyQt6.QtWidgets.QFileDialog.getSaveFileName",
+                    return_value=(str(tmp_path / "trace.json"), "")):
+        dlg.on_export_trace()
+    assert json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    dlg.on_reset()
+    assert dlg.tableWidget.rowCount() == 0
+    main_window.close()
+
+
+def test_record_profile(qtbot, tmp_path):
+    main_window = pyjibe.head.PyJibe()
+    with mock.patch("PyQt6.QtWidgets.QFileDialog.getExistingDirectory",
+                    return_value=str(tmp_path)):
+        main_window.actionRecordProfile.trigger()
+    assert profiler.is_recording()
+    main_window.load_data(files=make_directory_with_data(2))
+    war = main_window.subwindows[0].widget()
+    war.cb_autosave.setChecked(0)
+    war.on_fit_all()
+    main_window.actionRecordProfile.trigger()
+    assert not profiler.is_recording()
+    path, = tmp_path.glob("pyjibe_profile_*.pstats")
+    stats = pstats.Stats(str(path))
+    functions = [func[2] for func in stats.stats]
+    assert "on_fit_all" in functions
+    # jobs in the worker threads are profiled as well
+    assert "process_curve" in functions
+    main_window.close()
+
+
+def test_profiler_runcall_thread(tmp_path):
+    def profiled_job(a, b=1):
+        return a + b
+
+    result = []
+    profiler.start()
+    try:
+        thread = threading.Thread(
+            target=lambda: result.append(
+                profiler.runcall(profiled_job, 1, b=2)))
+        thread.start()
+        thread.join()
+    finally:
+        stats = profiler.stop(tmp_path / "profile.pstats")
+    assert result == [3]
+    assert "profiled_job" in [func[2] for func in stats.stats]
+
+
+def test_profiler_runcall_other_tool_active(tmp_path):
+    profiler.start()
+    try:
+        with mock.patch.object(profiler, "PROFILE_ALL_THREADS", False), \
+                mock.patch.object(
+                    cProfile.Profile, "enable",
+                    side_effect=ValueError("Another profiling tool is "
+                                           "already active")):
+            # the function is called without profiling
+            assert profiler.runcall(lambda a: a + 1, 1) == 2
+    finally:
+        profiler.stop(tmp_path / "profile.pstats")
@@ -0,0 +1,63 @@
+"""Test of the in-memory settings snapshot"""
+from unittest import mock
+
+from PyQt6 import QtCore, QtWidgets
+
+import pyjibe.head
+from pyjibe import instrument
+from pyjibe.head.preferences import Preferences
+from pyjibe.settings import get_settings
+
+
+def test_settings_snapshot(qtbot):
+    settings = get_settings()
+    assert settings is get_settings()
+    # write-through
+    settings.setValue("test/snapshot", "peter")
+    assert QtCore.QSettings().value("test/snapshot") == "peter"
+    assert settings.value("test/snapshot") == "peter"
+    # changes made with QSettings are only visible after `refresh`
+    QtCore.QSettings().setValue("test/snapshot", "hans")
+    assert settings.value("test/snapshot") == "peter"
+    with qtbot.waitSignal(settings.changed, timeout=1000):
+        settings.refresh()
+    assert settings.value("test/snapshot") == "hans"
+    QtCore.QSettings().remove("test/snapshot")
+    settings.refresh()
+    assert settings.value("test/snapshot", "default") == "default"
+
+
+def test_settings_preferences_apply(qtbot):
+    mw = pyjibe.head.PyJibe()
+    dlg = Preferences(mw)
+    dlg.advanced_compute_workers.setValue(3)
+    with qtbot.waitSignal(mw.settings.changed, timeout=1000):
+        dlg.on_settings_apply()
+    assert int(get_settings().value("advanced/compute workers")) == 3
+    assert mw.scheduler.max_workers == 3
+    dlg.advanced_compute_workers.setValue(0)
+    dlg.on_settings_apply()
+    assert mw.scheduler.max_workers >= 1
+    mw.close()
+
+
+def test_settings_preferences_developer_mode(qtbot):
+    mw = pyjibe.head.PyJibe()
+    mw.settings.setValue("advanced/developer mode", 0)
+    mw.on_settings_changed()
+    assert not mw.actionTimings.isVisible()
+    dlg = Preferences(mw)
+    dlg.advanced_developer_mode.setChecked(True)
+    # skip the restart message; the developer tools are shown right away
+    with mock.patch.object(QtWidgets.QMessageBox, "exec"):
+        try:
+            dlg.on_settings_apply()
+            assert mw.actionTimings.isVisible()
+            assert mw.actionRecordProfile.isVisible()
+            assert instrument.is_enabled()
+        finally:
+            dlg.advanced_developer_mode.setChecked(False)
+            dlg.on_settings_apply()
+    assert not mw.actionTimings.isVisible()
+    assert not instrument.is_enabled()
+    mw.close()
@@ -0,0 +1,41 @@
+"""Test of the cached ui form classes"""
+from PyQt6 import QtWidgets
+
+from pyjibe import uicache
+
+
+def test_uicache_setup_ui(qtbot, tmp_path, monkeypatch):
+    monkeypatch.setattr(uicache, "get_cache_dir", lambda: tmp_path)
+    uicache.get_form_class.cache_clear()
+    widget = QtWidgets.QDialog()
+    qtbot.addWidget(widget)
+    uicache.setup_ui(widget, "pyjibe.fd", "dlg_autosave_design.ui")
+    # child widgets are attributes of the widget (like `uic.loadUi`)
+    assert isinstance(widget.btn_override, QtWidgets.QRadioButton)
+    assert widget.btn_override.parent() is not None
+    cached = list(tmp_path.glob("dlg_autosave_design_*.py"))
+    assert len(cached) == 1
+    # the form class is kept in memory
+    form_class = uicache.get_form_class("pyjibe.fd",
+                                        "dlg_autosave_design.ui")
+    assert form_class is uicache.get_form_class("pyjibe.fd",
+                                                "dlg_autosave_design.ui")
+    # the cached code is used in the next session
+    uicache.get_form_class.cache_clear()
+    mtime = cached[0].stat().st_mtime_ns
+    uicache.get_form_class("pyjibe.fd", "dlg_autosave_design.ui")
+    assert cached[0].stat().st_mtime_ns == mtime
+    uicache.get_form_class.cache_clear()
+
+
+def test_uicache_not_writable(qtbot, tmp_path, monkeypatch):
+    # a file where the cache directory should be
+    blocker = tmp_path / "blocker"
+    blocker.write_text("")
+    monkeypatch.setattr(uicache, "get_cache_dir", lambda: blocker / "ui")
+    uicache.get_form_class.cache_clear()
+    widget = QtWidgets.QDialog()
+    qtbot.addWidget(widget)
+    uicache.setup_ui(widget, "pyjibe.fd", "dlg_autosave_design.ui")
+    assert isinstance(widget.cb_remember, QtWidgets.QCheckBox)
+    uicache.get_form_class.cache_clear()
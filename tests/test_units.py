@@ -0,0 +1,36 @@
+"""Test of the unit conversion helpers"""
+import numpy as np
+import pytest
+
+from pyjibe import units
+
+
+def test_units_get_unit_info():
+    info = units.get_unit_info("Tip radius")
+    assert info.factor == 1e-6
+    assert info.unit == "µm"
+    assert info.label == "Tip radius [µm]"
+    # cached
+    assert units.get_unit_info("Tip radius") is info
+    # default scale of the SI unit
+    assert units.get_unit_info("Piezo speed", "m/s").label == \
+        "Piezo speed [µm/s]"
+    # unknown unit and unitless
+    assert units.get_unit_info("Volume", "m³").factor == 1
+    assert units.get_unit_info("Fit model", "").label == "Fit model"
+
+
+def test_units_si2hr_array():
+    values, unit = units.si2hr_array("Contact point", [1e-9, np.nan, 3e-9])
+    assert unit == "nm"
+    assert np.allclose(values, [1, np.nan, 3], equal_nan=True)
+    hr_value, hr_unit = units.si2hr("Contact point", 3e-9)
+    assert hr_value == values[2]
+    assert hr_unit == unit
+
+
+def test_units_hrscname():
+    assert units.hrscname("Force", "N") == "Force [nN]"
+    assert units.hrscale("Force", "N") == pytest.approx(1e9)
+    with pytest.raises(ValueError, match="Bad `si_unit`"):
+        units.hrscname("Force", "m")